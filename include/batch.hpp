@@ -0,0 +1,56 @@
+// Tank Game (@kennedyengineering)
+
+#pragma once
+
+#include <memory>
+#include <tuple>
+#include <vector>
+
+#include "categories.hpp"
+#include "config.hpp"
+#include "engine.hpp"
+#include "registry.hpp"
+#include "thread_pool.hpp"
+
+namespace TankGame {
+struct BatchEvent {
+  unsigned int engineIndex;
+  CategoryBits categoryBits;
+  RegistryId srcId;
+  RegistryId hitId;
+};
+
+class BatchEngine {
+public:
+  BatchEngine(const Config &config, const BatchConfig &batchConfig);
+  ~BatchEngine() = default;
+
+  size_t getEngineCount();
+  std::shared_ptr<Engine> getEngine(size_t engineIndex);
+  void resetEngine(size_t engineIndex);
+
+  std::tuple<size_t, size_t, size_t> getObservationDimensions();
+
+  void step(const float *actions, float *observations, float *rewards,
+            bool *dones);
+  const std::vector<BatchEvent> &getEvents();
+
+private:
+  void stepEngine(size_t engineIndex, const float *actions, float *observations,
+                  float *rewards, bool *done);
+
+private:
+  struct EngineState {
+    std::shared_ptr<Engine> engine;
+    std::vector<CollisionEvent> events;
+  };
+
+  Config mConfig;
+  BatchConfig mBatchConfig;
+
+  std::vector<EngineState> mEngineStates;
+  std::vector<BatchEvent> mEvents;
+
+  ThreadPool mThreadPool;
+};
+} // namespace TankGame
@@ -38,6 +38,7 @@ struct TankConfig {
   /* Lidar parameters */
   unsigned int lidarPoints = 360; // number of lidar points
   float lidarRange = 20;          // in meters
+  bool lidarCulling = true;       // only cast rays against nearby shapes
 
   /* Gun parameters */
   float gunDensity = 0.001f;
@@ -60,6 +61,25 @@ struct TankConfig {
   float lidarRadius = 3.0f; // in pixels
 };
 
+struct ObservationConfig {
+  /* Normalization ranges */
+  float lidarRange = 20.0f;              // in meters
+  float velocityRange = 20.0f;           // in meters per second
+  float angularVelocityRange = 9.84575f; // in radians per second (empirical)
+  float reloadRange = 1.0f;              // in steps
+};
+
+struct PixelObservationConfig {
+  /* Frame dimensions */
+  int width = 84;  // in pixels
+  int height = 84; // in pixels
+
+  /* Frame contents */
+  bool grayscale = true;   // one luminance channel (instead of RGB)
+  bool egocentric = true;  // centered on, and rotated with, each tank
+  float viewRange = 40.0f; // in meters (egocentric half width)
+};
+
 struct Config {
   /* Arena dimensions */
   float arenaWidth = 100.0f; // in meters
@@ -71,13 +91,43 @@ struct Config {
   /* Simulation parameters */
   float timeStep = 1.0f / 60.0f; // in seconds
   int subStep = 8;               // number of sub-steps
+  unsigned int workerCount = 1;  // number of solver and lidar threads
+
+  /* Lidar parameters */
+  bool analyticLidar = false; // intersect rays analytically (not with box2d)
 
   /* Rendering parameters */
   b2HexColor clearColor = b2_colorBlack; // hex color
 
   float pixelDensity = 8.0f; // pixels per meter
+  bool headless = false;     // defer render surface creation to first render
 
   /* Logging */
   bool verboseOutput = false;
 };
+
+struct GameRulesConfig {
+  /* Game parameters */
+  int reloadDelay = 20;  // steps before a tank can fire (0 for no delay)
+  int maxTimesteps = -1; // steps before truncation (-1 for no truncation)
+
+  /* Reward terms (velocities in % range) */
+  float velocityRange = 20.0f; // in meters per second
+  float timePenalty = 1.0f;    // subtracted every step
+  float speedReward = 0.5f;    // per absolute local velocity X
+  float lateralReward = 0.5f;  // per local velocity Y
+  float hitReward = 100.0f;    // given to the shooter, taken from the hit tank
+};
+
+struct BatchConfig {
+  /* Batch dimensions */
+  unsigned int engineCount = 1; // number of independent arenas
+  unsigned int threadCount = 1; // number of worker threads
+
+  /* Game parameters */
+  GameRulesConfig gameRulesConfig;
+
+  /* Observation parameters */
+  ObservationConfig observationConfig;
+};
 } // namespace TankGame
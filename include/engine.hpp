@@ -3,22 +3,80 @@
 #pragma once
 
 #include <box2d/box2d.h>
+#include <deque>
 #include <filesystem>
+#include <map>
+#include <memory>
+#include <string>
+#include <tuple>
 #include <vector>
 
 #include "categories.hpp"
 #include "config.hpp"
 #include "obstacle.hpp"
+#include "raycast.hpp"
 #include "registry.hpp"
 #include "render.hpp"
 #include "tank.hpp"
+#include "thread_pool.hpp"
 
 namespace TankGame {
+class GameRules;
+
+/* Collision event
+   A projectile (fired by srcId) contacted a shape of the given category.
+   hitId is the hit tank or obstacle id (the firing tank id of a hit
+   projectile), and 0 for walls
+   Note: ids are tagged ids, like the ids taken by the Engine methods
+*/
+struct CollisionEvent {
+  CategoryBits categoryBits;
+  RegistryId srcId;
+  RegistryId hitId;
+
+  bool operator==(const CollisionEvent &other) const {
+    return categoryBits == other.categoryBits && srcId == other.srcId &&
+           hitId == other.hitId;
+  }
+};
+
+/* Lookahead event
+   A collision event predicted for a step of a lookahead, see
+   Engine::simulateLookahead
+*/
+struct LookaheadEvent {
+  unsigned int step;
+  CategoryBits categoryBits;
+  RegistryId srcId;
+  RegistryId hitId;
+};
+
+/* Thread-safety contract
+   An Engine owns an independent physics world and render surface, so distinct
+   Engine instances may be used concurrently from different threads. A single
+   Engine instance is not thread-safe, calls on it must be serialized by the
+   caller. Constructing and destroying engines modifies global physics state,
+   and must not happen concurrently (the Python bindings hold the GIL for both).
+*/
+
+/* Ids
+   Tank and obstacle ids handed out by an Engine are tagged ids (see Registry).
+   Methods taking an id throw std::out_of_range for the id of a removed tank
+   or obstacle, even once another tank or obstacle reuses its slot.
+*/
 class Engine {
 public:
+  // Number of action values per tank (left tread, right tread, fire gun)
+  static constexpr size_t ACTION_SIZE = 3;
+
   Engine(const Config &config);
   ~Engine();
 
+  void reset();
+  void resetTank(RegistryId tankId, const TankConfig &tankConfig);
+  std::vector<RegistryId>
+  updateObstacles(const std::vector<ObstacleConfig> &obstacleConfigs);
+
   RegistryId addObstacle(const ObstacleConfig &obstacleConfig);
   void removeObstacle(RegistryId obstacleId);
 
@@ -29,14 +87,28 @@ public:
   void fireTankGun(RegistryId tankId);
   void moveLeftTankTread(RegistryId tankId, float speed);
   void moveRightTankTread(RegistryId tankId, float speed);
+  void applyActions(const float *actions, float *reloadCounters,
+                    float reloadDelay);
+  std::pair<size_t, size_t> getActionsDimensions();
 
   std::vector<float> scanTankLidar(RegistryId tankId);
+  void scanAllTanksLidar(float *lidarBuffer);
+  std::pair<size_t, size_t> getAllTanksLidarDimensions();
+  std::vector<RegistryId> getTankIds();
+
+  void getAllTankObservations(const ObservationConfig &observationConfig,
+                              const float *reloadCounters,
+                              float *observationBuffer);
+  std::pair<size_t, size_t> getAllTankObservationsDimensions();
+  void getAllTankStates(float *stateBuffer);
+  std::pair<size_t, size_t> getAllTankStatesDimensions();
   float getTankGunAngle(RegistryId tankId);
   std::pair<float, float> getTankPosition(RegistryId tankId);
   float getTankOrientation(RegistryId tankId);
   std::pair<float, float> getTankWorldVelocity(RegistryId tankId);
   std::pair<float, float> getTankLocalVelocity(RegistryId tankId);
   float getTankAngularVelocity(RegistryId tankId);
+  float getTankTreadMaxSpeed(RegistryId tankId);
 
   void clearImage();
 
@@ -44,28 +116,120 @@ public:
   void renderProjectiles();
   void renderTank(RegistryId tankId);
   void renderTankLidar(RegistryId tankId);
+  void renderScene();
+  void renderScene(const std::vector<RegistryId> &tankIds);
 
   std::vector<unsigned char> getImageBuffer();
+  void copyImageToRGB(unsigned char *rgbBuffer);
+  unsigned char *getImageData();
+  int getImageStride();
   std::pair<int, int> getImageDimensions();
   int getImageChannels();
   void writeImageToPng(const std::filesystem::path &filePath);
 
-  std::vector<std::tuple<CategoryBits, RegistryId, RegistryId>> step();
+  void getAllTankPixelObservations(
+      const PixelObservationConfig &pixelObservationConfig,
+      unsigned char *pixelBuffer);
+  std::tuple<size_t, size_t, size_t, size_t>
+  getAllTankPixelObservationsDimensions(
+      const PixelObservationConfig &pixelObservationConfig);
+
+  std::map<std::string, size_t> getMemoryUsage();
+
+  const std::vector<CollisionEvent> &
+  step(uint32_t categoryMask = CategoryBits::ALL, bool unique = false);
+
+  void setGameRules(const GameRulesConfig &gameRulesConfig);
+  GameRules &getGameRules();
+  const std::vector<CollisionEvent> &stepGame(const float *actions,
+                                              float *rewards);
+
+  std::vector<unsigned char> saveState();
+  void restoreState(const std::vector<unsigned char> &state);
+
+  void prepareLookahead();
+  const std::vector<LookaheadEvent> &simulateLookahead(const float *actions,
+                                                       size_t numSteps,
+                                                       float *states,
+                                                       float *rewards);
 
 private:
-  std::vector<std::tuple<CategoryBits, RegistryId, RegistryId>>
-  handleCollisions();
+  struct ProjectileSlot;
+
+  void handleCollisions();
+  void filterCollisionEvents(uint32_t categoryMask, bool unique);
+  ProjectileSlot &acquireProjectileSlot(TankId sourceTankId);
+  void destroyProjectile(uint32_t slotIndex);
+  void destroyProjectiles();
+
+  RenderEngine &getRenderEngine();
+  void drawObstacle(RenderEngine &renderEngine, float scale,
+                    RegistryId obstacleId);
+  void drawProjectiles(RenderEngine &renderEngine, float scale);
+  void drawTank(RenderEngine &renderEngine, float scale, RegistryId tankId);
+
+  const RayCastScene *updateRayCastScene();
+
+  static void *enqueueTask(b2TaskCallback *task, int32_t itemCount,
+                           int32_t minRange, void *taskContext,
+                           void *userContext);
+  static void finishTask(void *userTask, void *userContext);
 
 private:
   Config mConfig;
 
+  std::unique_ptr<ThreadPool> mThreadPool;
+  std::deque<ThreadPool::TaskGroup> mTaskGroups;
+
   b2WorldId mWorldId;
+  std::vector<b2ShapeId> mWallShapeIds;
+
+  RayCastScene mRayCastScene;
 
-  RenderEngine mRenderEngine;
+  std::unique_ptr<RenderEngine> mRenderEngine;
+  std::unique_ptr<RenderEngine> mPixelRenderEngine;
+  bool mBackgroundValid = false;
+  std::vector<b2Vec2> mLidarPixelBuffer;
 
   Registry<Tank> mTankRegistry;
   Registry<Obstacle> mObstacleRegistry;
 
-  std::vector<b2ShapeId> mProjectileShapeIdVector;
+  /* Projectile pool
+     Slots never move, so projectile shapes store a pointer to their slot as
+     user data (sourceTankId is the first member, so the user data also reads
+     as a TankId pointer, like tank shapes)
+     Note: sourceTankId is a tagged id (see Registry), so a projectile of a
+     removed tank is never attributed to a tank reusing its slot
+  */
+  struct ProjectileSlot {
+    TankId sourceTankId;
+    b2ShapeId shapeId;
+    uint32_t slotIndex;
+    uint32_t activeIndex;
+  };
+
+  struct ProjectileContact {
+    b2ShapeId projectileShapeId;
+    b2ShapeId contactShapeId;
+    CategoryBits contactCategoryBits;
+  };
+
+  std::deque<ProjectileSlot> mProjectileSlots;
+  std::vector<uint32_t> mFreeProjectileSlots;
+  std::vector<uint32_t> mActiveProjectiles;
+  std::vector<ProjectileContact> mProjectileContacts;
+
+  std::vector<CollisionEvent> mCollisionEvents;
+
+  std::unique_ptr<GameRules> mGameRules;
+
+  /* Lookahead
+     A scratch engine mirroring the tanks, obstacles and game rules, reused
+     across lookaheads until they change
+  */
+  std::unique_ptr<Engine> mLookaheadEngine;
+  bool mLookaheadValid = false;
+  bool mLookaheadObstaclesValid = false;
+  std::vector<LookaheadEvent> mLookaheadEvents;
 };
 } // namespace TankGame
@@ -0,0 +1,44 @@
+// Tank Game (@kennedyengineering)
+
+#pragma once
+
+#include <vector>
+
+#include "config.hpp"
+#include "engine.hpp"
+#include "registry.hpp"
+
+namespace TankGame {
+/* Game rules
+   Owns the reload timers and the timestep of a game played on an Engine, and
+   turns each step into per-tank rewards and episode done flags
+*/
+class GameRules {
+public:
+  GameRules(const GameRulesConfig &config);
+
+  void reset();
+  void restore(const std::vector<float> &reloadCounters, int timestep,
+               bool terminated, bool truncated);
+
+  const std::vector<CollisionEvent> &step(Engine &engine, const float *actions,
+                                          float *rewards);
+
+  const GameRulesConfig &getConfig();
+  const std::vector<float> &getReloadCounters();
+  int getTimestep();
+  bool isTerminated();
+  bool isTruncated();
+
+private:
+  GameRulesConfig mConfig;
+
+  std::vector<float> mReloadCounters;
+  std::vector<float> mTankStates;
+  std::vector<CollisionEvent> mHits;
+  std::vector<RegistryId> mTankIds;
+  int mTimestep = 0;
+  bool mTerminated = false;
+  bool mTruncated = false;
+};
+} // namespace TankGame
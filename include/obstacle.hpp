@@ -18,6 +18,7 @@ public:
 
   b2Vec2 getPosition();
   float getRadius();
+  const ObstacleConfig &getConfig();
 
   std::vector<std::pair<b2ShapeId, b2HexColor>> getShapeIdsAndColors();
 
@@ -0,0 +1,44 @@
+// Tank Game (@kennedyengineering)
+
+#pragma once
+
+#include <array>
+#include <box2d/box2d.h>
+#include <cstdint>
+#include <vector>
+
+namespace TankGame {
+class RayCastScene {
+public:
+  static constexpr uint32_t NO_OWNER = UINT32_MAX;
+
+  RayCastScene() = default;
+  ~RayCastScene() = default;
+
+  void clear();
+
+  void addCircle(b2Vec2 center, float radius, uint32_t owner = NO_OWNER);
+  void addBox(const b2Polygon &polygon, b2Transform transform,
+              uint32_t owner = NO_OWNER);
+  void addShape(b2ShapeId shapeId, uint32_t owner = NO_OWNER);
+
+  size_t getCircleCount() const;
+  size_t getBoxCount() const;
+
+  float castRay(b2Vec2 origin, b2Vec2 translation,
+                uint32_t excludeOwner = NO_OWNER) const;
+
+private:
+  /* Circles (structure of arrays) */
+  std::vector<float> mCircleX;
+  std::vector<float> mCircleY;
+  std::vector<float> mCircleRadius;
+  std::vector<uint32_t> mCircleOwners;
+
+  /* Boxes as four edge planes (structure of arrays, one array per edge) */
+  std::array<std::vector<float>, 4> mBoxNormalX;
+  std::array<std::vector<float>, 4> mBoxNormalY;
+  std::array<std::vector<float>, 4> mBoxOffset;
+  std::vector<uint32_t> mBoxOwners;
+};
+} // namespace TankGame
@@ -2,23 +2,54 @@
 
 #pragma once
 
-#include <map>
-#include <set>
+#include <deque>
+#include <functional>
+#include <optional>
+#include <queue>
 #include <stdexcept>
+#include <vector>
 
 namespace TankGame {
 using RegistryId = unsigned int;
 
+/* Tagged ids
+   A tagged id holds a slot index in its low bits, and the low bits of the
+   slot generation above them, so a tagged id whose slot was freed or reused is
+   rejected instead of resolving to the object reusing the slot. A slot that
+   was never reused has generation 0, so its tagged id equals its index.
+   Note: generations wrap after REGISTRY_GENERATION_MASK + 1 reuses of a slot
+*/
+constexpr unsigned int REGISTRY_INDEX_BITS = 24;
+constexpr RegistryId REGISTRY_INDEX_MASK = (1u << REGISTRY_INDEX_BITS) - 1;
+constexpr RegistryId REGISTRY_GENERATION_MASK = ~0u >> REGISTRY_INDEX_BITS;
+
+inline RegistryId getRegistryIndex(RegistryId taggedId) {
+  return taggedId & REGISTRY_INDEX_MASK;
+}
+
+/* Slot map of objects, indexed by id
+   Ids are slot indices, so lookups are O(1) and iteration visits objects in
+   ascending id order. Freed ids are reused (lowest first), each slot keeps a
+   generation counter that is incremented when its object is removed, so
+   holders of an id can detect that it has been reused (see getGeneration and
+   the tagged id methods).
+   Objects never move once emplaced (box2d user data points into them).
+*/
 template <typename T> class Registry {
 public:
-  Registry() : mNextId(0) {}
+  Registry() : mSize(0) {}
   ~Registry() = default;
 
   template <typename... Args> RegistryId emplace(Args &&...args) {
     RegistryId id = getNextId();
 
-    mObjectMap.emplace(std::piecewise_construct, std::forward_as_tuple(id),
-                       std::forward_as_tuple(std::forward<Args>(args)...));
+    try {
+      mSlots[id].object.emplace(std::forward<Args>(args)...);
+    } catch (...) {
+      mFreeIds.push(id);
+      throw;
+    }
+    mSize++;
 
     return id;
   }
@@ -26,46 +57,132 @@ public:
   template <typename... Args> RegistryId emplaceWithId(Args &&...args) {
     RegistryId id = getNextId();
 
-    mObjectMap.emplace(std::piecewise_construct, std::forward_as_tuple(id),
-                       std::forward_as_tuple(id, std::forward<Args>(args)...));
+    try {
+      mSlots[id].object.emplace(id, std::forward<Args>(args)...);
+    } catch (...) {
+      mFreeIds.push(id);
+      throw;
+    }
+    mSize++;
 
     return id;
   }
 
-  T &get(RegistryId id) {
-    auto it = mObjectMap.find(id);
-    if (it == mObjectMap.end()) {
+  T &get(RegistryId id) { return *getSlot(id).object; }
+
+  void remove(RegistryId id) {
+    Slot &slot = getSlot(id);
+
+    slot.object.reset();
+    slot.generation++;
+    mSize--;
+
+    mFreeIds.push(id);
+  }
+
+  bool contains(RegistryId id) const {
+    return id < mSlots.size() && mSlots[id].object.has_value();
+  }
+
+  unsigned int getGeneration(RegistryId id) const {
+    // Check id (freed ids keep their generation until reused)
+    if (id >= mSlots.size()) {
       throw std::out_of_range("Invalid RegistryId");
     }
 
-    return it->second;
+    return mSlots[id].generation;
   }
 
-  void remove(RegistryId id) {
-    auto count = mObjectMap.erase(id);
-    if (count == 0) {
+  RegistryId getTaggedId(RegistryId id) const {
+    // Tag an id with the generation of its slot
+    if (!contains(id)) {
       throw std::out_of_range("Invalid RegistryId");
     }
 
-    mFreeIds.insert(id);
+    return id | (mSlots[id].generation & REGISTRY_GENERATION_MASK)
+                    << REGISTRY_INDEX_BITS;
+  }
+
+  bool containsTagged(RegistryId taggedId) const {
+    RegistryId id = getRegistryIndex(taggedId);
+    return contains(id) && getTaggedId(id) == taggedId;
+  }
+
+  RegistryId untagId(RegistryId taggedId) const {
+    // Check tagged id (its slot must not have been freed or reused)
+    if (!containsTagged(taggedId)) {
+      throw std::out_of_range("Invalid or stale RegistryId");
+    }
+
+    return getRegistryIndex(taggedId);
+  }
+
+  T &getTagged(RegistryId taggedId) { return get(untagId(taggedId)); }
+
+  void removeTagged(RegistryId taggedId) { remove(untagId(taggedId)); }
+
+  size_t size() const { return mSize; }
+
+  std::vector<RegistryId> getIds() const {
+    std::vector<RegistryId> ids;
+    ids.reserve(mSize);
+
+    for (RegistryId id = 0; id < mSlots.size(); id++) {
+      if (mSlots[id].object.has_value()) {
+        ids.push_back(id);
+      }
+    }
+
+    return ids;
+  }
+
+  template <typename Function> void forEach(Function &&function) {
+    // Visit objects in ascending id order
+    for (RegistryId id = 0; id < mSlots.size(); id++) {
+      if (mSlots[id].object.has_value()) {
+        function(id, *mSlots[id].object);
+      }
+    }
   }
 
 private:
+  struct Slot {
+    std::optional<T> object;
+    unsigned int generation = 0;
+  };
+
+  Slot &getSlot(RegistryId id) {
+    if (id >= mSlots.size() || !mSlots[id].object.has_value()) {
+      throw std::out_of_range("Invalid RegistryId");
+    }
+
+    return mSlots[id];
+  }
+
   RegistryId getNextId() {
     RegistryId id;
     if (mFreeIds.empty()) {
-      id = mNextId++;
+      // Check that the index fits a tagged id
+      if (mSlots.size() > REGISTRY_INDEX_MASK) {
+        throw std::length_error("Registry is full");
+      }
+
+      id = mSlots.size();
+      mSlots.emplace_back();
     } else {
-      id = *mFreeIds.begin();
-      mFreeIds.erase(mFreeIds.begin());
+      id = mFreeIds.top();
+      mFreeIds.pop();
     }
 
     return id;
   }
 
 private:
-  std::map<RegistryId, T> mObjectMap;
-  RegistryId mNextId;
-  std::set<RegistryId> mFreeIds;
+  // Deque storage keeps objects at stable addresses as the registry grows
+  std::deque<Slot> mSlots;
+  size_t mSize;
+  std::priority_queue<RegistryId, std::vector<RegistryId>,
+                      std::greater<RegistryId>>
+      mFreeIds;
 };
 } // namespace TankGame
@@ -16,14 +16,29 @@ public:
 
   void clearImage(b2HexColor color);
 
+  void saveBackground();
+  void restoreBackground();
+
+  void setTransform(b2Vec2 center, float scale, float angle);
+  void resetTransform();
+
   void renderPolygon(std::vector<b2Vec2> vertices, b2HexColor color);
   void renderCircle(b2Vec2 center, float radius, b2HexColor color);
+  void renderCircles(const std::vector<b2Vec2> &centers, float radius,
+                     b2HexColor color);
 
   void writeToPng(const std::filesystem::path &filePath);
 
   std::vector<unsigned char> getBuffer();
+  void copyToRGB(unsigned char *rgbBuffer);
+  void copyToGray(unsigned char *grayBuffer);
+  unsigned char *getData();
+  int getStride();
   std::pair<int, int> getDimensions();
-  int getChannels();
+  static int getChannels();
+
+  size_t getSurfaceSize();
+  size_t getBackgroundSize();
 
 private:
   using RGB_t = std::array<float, 3>;
@@ -32,5 +47,7 @@ private:
 private:
   cairo_surface_t *mSurface;
   cairo_t *mContext;
+
+  std::vector<unsigned char> mBackground;
 };
 } // namespace TankGame
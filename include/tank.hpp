@@ -6,44 +6,96 @@
 #include <vector>
 
 #include "config.hpp"
+#include "raycast.hpp"
+#include "thread_pool.hpp"
 
 namespace TankGame {
 using TankId = unsigned int;
 
+/* Dynamic state of a rigid body */
+struct BodyState {
+  b2Vec2 position;
+  b2Rot rotation;
+  b2Vec2 linearVelocity;
+  float angularVelocity;
+};
+
+BodyState getBodyState(b2BodyId bodyId);
+void setBodyState(b2BodyId bodyId, const BodyState &bodyState);
+
+/* Dynamic state of a tank (see Tank::getState) */
+struct TankState {
+  BodyState tankBody;
+  BodyState gunBody;
+  BodyState leftTreadBody;
+  BodyState rightTreadBody;
+  float gunAngleOffset; // gun motor target (in radians)
+};
+
 class Tank {
 public:
   Tank(TankId tankId, const TankConfig &tankConfig, b2WorldId worldId);
   ~Tank();
 
+  void reset();
+  void reset(const TankConfig &tankConfig);
+
+  const TankConfig &getConfig();
+  TankState getState();
+  void setState(const TankState &tankState);
+
   void rotateGun(float angle);
-  b2ShapeId fireGun();
+  b2ShapeId fireGun(void *projectileUserData);
+  b2ShapeId spawnProjectile(void *projectileUserData,
+                            const BodyState &projectileState);
   void moveLeftTread(float speed);
   void moveRightTread(float speed);
 
-  void scanLidar();
-  void scanLidar(float range);
+  void scanLidar(ThreadPool *threadPool = nullptr,
+                 const RayCastScene *rayCastScene = nullptr);
+  void scanLidar(float range, ThreadPool *threadPool = nullptr,
+                 const RayCastScene *rayCastScene = nullptr);
 
-  std::vector<b2Vec2> getLidarData();
+  const std::vector<b2Vec2> &getLidarData();
+  unsigned int getLidarPoints();
+  size_t getLidarMemoryUsage();
   b2Vec2 getPosition();
   float getOrientation();
   b2Vec2 getWorldVelocity();
   b2Vec2 getLocalVelocity();
   float getAngularVelocity();
   float getGunAngle();
+  float getTreadMaxSpeed();
   b2HexColor getProjectileColor();
   b2HexColor getLidarColor();
   float getLidarRadius();
   std::vector<std::pair<b2ShapeId, b2HexColor>> getShapeIdsAndColors();
 
 private:
+  void cullLidarShapes(b2Transform transform, float range);
+
+private:
+  struct LidarShape {
+    b2Transform transform;
+    b2ShapeType type;
+    b2Circle circle;
+    b2Polygon polygon;
+  };
+
   TankId mTankId;
 
   TankConfig mTankConfig;
 
   b2WorldId mWorldId;
 
+  std::vector<b2Rot> mLidarRotations;
   std::vector<b2Vec2> mLidarData;
 
+  std::vector<LidarShape> mLidarWalls;
+  std::vector<LidarShape> mLidarCandidates;
+  std::vector<uint32_t> mLidarSectorOffsets;
+  std::vector<uint32_t> mLidarSectorCandidates;
+
   b2BodyId mTankBodyId;
   b2ShapeId mTankShapeId;
 
@@ -0,0 +1,53 @@
+// Tank Game (@kennedyengineering)
+
+#pragma once
+
+#include <condition_variable>
+#include <deque>
+#include <exception>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+namespace TankGame {
+class ThreadPool {
+public:
+  using Task = std::function<void(unsigned int workerIndex)>;
+  using RangeTask = std::function<void(size_t startIndex, size_t endIndex,
+                                       unsigned int workerIndex)>;
+
+  struct TaskGroup {
+    size_t pendingTasks = 0;
+    std::exception_ptr exception;
+  };
+
+  ThreadPool(unsigned int threadCount);
+  ~ThreadPool();
+
+  ThreadPool(const ThreadPool &) = delete;
+  ThreadPool &operator=(const ThreadPool &) = delete;
+
+  unsigned int getThreadCount();
+
+  void submit(TaskGroup &taskGroup, Task task);
+  void wait(TaskGroup &taskGroup);
+
+  void parallelFor(size_t itemCount, size_t minRange,
+                   const RangeTask &rangeTask);
+
+private:
+  void workerLoop(unsigned int workerIndex);
+
+private:
+  std::vector<std::thread> mThreads;
+
+  std::deque<std::pair<TaskGroup *, Task>> mTaskQueue;
+
+  std::mutex mMutex;
+  std::condition_variable mTaskCondition;
+  std::condition_variable mFinishedCondition;
+
+  bool mStopping;
+};
+} // namespace TankGame
@@ -0,0 +1,76 @@
+# Tank Game (@kennedyengineering)
+
+from tank_game_environment.env.tank_game_replay import load_replay, render_replay
+
+from tank_game_agent.video.video_stream_writer import VideoStreamWriter
+
+from concurrent.futures import ProcessPoolExecutor
+
+import os
+import pathlib
+import argparse
+
+
+def render(replay_path, output_dir, pixel_density, frame_skip):
+    """Re-simulate a replay, and encode it into a video file."""
+
+    replay = load_replay(replay_path)
+
+    video_path = os.path.join(output_dir, pathlib.Path(replay_path).stem + ".mp4")
+    writer = VideoStreamWriter(
+        video_path, fps=replay.metadata["metadata"]["render_fps"] / frame_skip
+    )
+
+    for frame in render_replay(
+        replay, pixel_density=pixel_density, frame_skip=frame_skip
+    ):
+        writer.write(frame)
+
+    writer.close()
+
+    return video_path
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Render replays into videos.")
+
+    parser.add_argument(
+        "replay_paths", type=str, nargs="+", help="Paths to the replay files."
+    )
+    parser.add_argument(
+        "--output-dir", type=str, default="videos/", help="Directory to save videos in."
+    )
+    parser.add_argument(
+        "--pixel-density",
+        type=float,
+        default=None,
+        help="Pixels per meter (defaults to the recorded value).",
+    )
+    parser.add_argument(
+        "--frame-skip", type=int, default=1, help="Render one of every N steps."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Number of worker processes."
+    )
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Render replays across worker processes
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(
+                render,
+                replay_path,
+                args.output_dir,
+                args.pixel_density,
+                args.frame_skip,
+            )
+            for replay_path in args.replay_paths
+        ]
+
+        for future in futures:
+            print(f"Rendered {future.result()}")
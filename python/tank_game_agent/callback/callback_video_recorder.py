@@ -2,16 +2,21 @@
 
 # adapted from https://stable-baselines3.readthedocs.io/en/master/guide/tensorboard.html#logging-videos
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import gymnasium as gym
 import torch as th
 import numpy as np
 
+import os
+
 from stable_baselines3.common.callbacks import BaseCallback
 from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.logger import Video
 
+from ..video.video_frame_buffer import StridedFrameBuffer
+from ..video.video_stream_writer import VideoStreamWriter
+
 
 class VideoRecorderCallback(BaseCallback):
     def __init__(
@@ -20,38 +25,66 @@ class VideoRecorderCallback(BaseCallback):
         render_freq: int,
         n_eval_episodes: int = 1,
         deterministic: bool = True,
+        frame_skip: int = 1,
+        video_dir: Optional[str] = None,
+        log_tensorboard_video: bool = True,
+        max_tensorboard_frames: int = 128,
     ):
         """
-        Records a video of an agent's trajectory traversing ``eval_env`` and logs it to TensorBoard
+        Records a video of an agent's trajectory traversing ``eval_env``, saves it as a compressed video file
+        (encoded in the background with bounded memory), and logs it to TensorBoard
 
         :param eval_env: A gym environment from which the trajectory is recorded
         :param render_freq: Render the agent's trajectory every eval_freq call of the callback.
         :param n_eval_episodes: Number of episodes to render
         :param deterministic: Whether to use deterministic or stochastic policy
+        :param frame_skip: Record one of every ``frame_skip`` frames
+        :param video_dir: Directory to save videos in (defaults to a ``videos`` directory in the log directory)
+        :param log_tensorboard_video: Whether to also log the video to TensorBoard
+        :param max_tensorboard_frames: Frames kept for the TensorBoard video, evenly subsampled over the whole
+            trajectory (bounds memory)
         """
         super().__init__()
         self._eval_env = eval_env
         self._render_freq = render_freq
         self._n_eval_episodes = n_eval_episodes
         self._deterministic = deterministic
+        self._frame_skip = frame_skip
+        self._video_dir = video_dir
+        self._log_tensorboard_video = log_tensorboard_video
+        self._max_tensorboard_frames = max_tensorboard_frames
+        self._writers = []
 
     def _on_step(self) -> bool:
         if self.n_calls % self._render_freq == 0:
-            screens = []
+            # Start a new video (earlier videos may still be encoding)
+            video_dir = self._video_dir
+            if video_dir is None:
+                video_dir = os.path.join(self.logger.get_dir() or ".", "videos")
+            os.makedirs(video_dir, exist_ok=True)
+
+            video_path = os.path.join(video_dir, f"trajectory_{self.num_timesteps}.mp4")
+            fps = self._eval_env.unwrapped.metadata["render_fps"]
+            writer = VideoStreamWriter(video_path, fps=fps, frame_skip=self._frame_skip)
+            self._close_finished_writers()
+            self._writers.append(writer)
+
+            screens = StridedFrameBuffer(self._max_tensorboard_frames, self._frame_skip)
 
             def grab_screens(_locals: Dict[str, Any], _globals: Dict[str, Any]) -> None:
                 """
-                Renders the environment in its current state, recording the screen in the captured `screens` list
+                Renders the environment in its current state, streaming the screen to the video writer
 
                 :param _locals: A dictionary containing all local variables of the callback's scope
                 :param _globals: A dictionary containing all global variables of the callback's scope
                 """
-                # We expect `render()` to return a uint8 array with values in [0, 255] or a float array
-                # with values in [0, 1], as described in
-                # https://pytorch.org/docs/stable/tensorboard.html#torch.utils.tensorboard.writer.SummaryWriter.add_video
+                # We expect `render()` to return a freshly allocated uint8 array with values in [0, 255]
                 screen = self._eval_env.render()
+                writer.write(screen)
+
                 # PyTorch uses CxHxW vs HxWxC gym (and tensorflow) image convention
-                screens.append(screen.transpose(2, 0, 1))
+                if self._log_tensorboard_video:
+                    screens.append(screen.transpose(2, 0, 1))
 
             evaluate_policy(
                 self.model,
@@ -60,12 +93,37 @@ class VideoRecorderCallback(BaseCallback):
                 n_eval_episodes=self._n_eval_episodes,
                 deterministic=self._deterministic,
             )
+
+            # Finish encoding without blocking training
+            writer.close(wait=False)
+
+            if self._log_tensorboard_video:
+                self.logger.record(
+                    "trajectory/video",
+                    Video(
+                        th.from_numpy(screens.get_frames()[np.newaxis]),
+                        fps=fps / screens.stride,
+                    ),
+                    exclude=("stdout", "log", "json", "csv"),
+                )
+
             self.logger.record(
-                "trajectory/video",
-                Video(
-                    th.from_numpy(np.asarray([screens])),
-                    fps=self._eval_env.unwrapped.metadata["render_fps"],
-                ),
+                "trajectory/video_path",
+                video_path,
                 exclude=("stdout", "log", "json", "csv"),
             )
         return True
+
+    def _close_finished_writers(self) -> None:
+        # Close videos that have finished encoding (raising any encoding error)
+        finished = [w for w in self._writers if not w.is_encoding()]
+        self._writers = [w for w in self._writers if w not in finished]
+
+        for writer in finished:
+            writer.close()
+
+    def _on_training_end(self) -> None:
+        # Wait for videos still being encoded
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
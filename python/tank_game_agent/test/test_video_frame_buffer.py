@@ -0,0 +1,32 @@
+# Tank Game (@kennedyengineering)
+
+from ..video.video_frame_buffer import StridedFrameBuffer
+
+import numpy as np
+import pytest
+
+
+class TestStridedFrameBuffer:
+    def test_frame_skip(self):
+        buffer = StridedFrameBuffer(max_frames=8, frame_skip=3)
+        for i in range(20):
+            buffer.append(np.array([i]))
+
+        assert buffer.stride == 3
+        np.testing.assert_array_equal(buffer.get_frames()[:, 0], range(0, 20, 3))
+
+    def test_bounded_subsample(self):
+        # a long stream keeps an evenly strided subsample of the whole stream
+        buffer = StridedFrameBuffer(max_frames=8)
+        for i in range(1000):
+            buffer.append(np.array([i]))
+            assert len(buffer) <= 8
+
+        assert buffer.stride == 128
+        np.testing.assert_array_equal(
+            buffer.get_frames()[:, 0], range(0, 1000, buffer.stride)
+        )
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            StridedFrameBuffer(max_frames=1)
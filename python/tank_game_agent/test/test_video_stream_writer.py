@@ -0,0 +1,41 @@
+# Tank Game (@kennedyengineering)
+
+from ..video.video_stream_writer import VideoStreamWriter
+
+import imageio_ffmpeg
+import numpy as np
+import pytest
+
+
+class TestVideoStreamWriter:
+    def write_clip(self, path, frame_count, frame_skip=1):
+        writer = VideoStreamWriter(str(path), fps=10, frame_skip=frame_skip)
+        for i in range(frame_count):
+            writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+        writer.close()
+
+        assert not writer.is_encoding()
+        return imageio_ffmpeg.count_frames_and_secs(str(path))
+
+    def test_write_clip(self, tmp_path):
+        frames, secs = self.write_clip(tmp_path / "clip.mp4", 20)
+        assert frames == 20
+        assert secs == pytest.approx(2.0, abs=0.1)
+
+    def test_frame_skip(self, tmp_path):
+        # one of every 3 frames is kept, at a third of the frame rate
+        frames, secs = self.write_clip(tmp_path / "clip.mp4", 20, frame_skip=3)
+        assert frames == 7
+        assert secs == pytest.approx(2.1, abs=0.1)
+
+    def test_encoder_error(self, tmp_path):
+        # the encoder fails to open a file in a missing directory
+        writer = VideoStreamWriter(str(tmp_path / "missing" / "clip.mp4"), fps=10)
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+
+        with pytest.raises(OSError):
+            writer.close()
+
+        assert not writer.is_encoding()
+        with pytest.raises(OSError):
+            writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
@@ -0,0 +1,55 @@
+# Tank Game (@kennedyengineering)
+
+import numpy as np
+
+
+class StridedFrameBuffer:
+    def __init__(self, max_frames: int, frame_skip: int = 1):
+        """
+        Keeps an evenly strided subsample of a stream of frames in bounded memory
+
+        Every ``frame_skip`` frame is kept until the buffer is full, then every other kept frame is discarded and
+        the stride doubles, so the buffer always spans the whole stream
+
+        :param max_frames: Maximum number of frames kept (at least 2)
+        :param frame_skip: Initial stride, keeping one of every ``frame_skip`` frames
+        """
+        if max_frames < 2:
+            raise ValueError("max_frames must be at least 2.")
+
+        self._max_frames = max_frames
+        self._stride = frame_skip
+        self._frame_count = 0
+        self._frames = []
+
+    @property
+    def stride(self) -> int:
+        """
+        Number of source frames between kept frames
+        """
+        return self._stride
+
+    def append(self, frame: np.ndarray) -> None:
+        """
+        Offer a frame to the buffer
+
+        :param frame: A frame, which must not be modified afterwards
+        """
+        if self._frame_count % self._stride == 0:
+            # Halve the kept frames (and double the stride) when full
+            if len(self._frames) == self._max_frames:
+                self._frames = self._frames[::2]
+                self._stride *= 2
+
+            if self._frame_count % self._stride == 0:
+                self._frames.append(frame)
+        self._frame_count += 1
+
+    def get_frames(self) -> np.ndarray:
+        """
+        Stack the kept frames into a single (frames, ...) array
+        """
+        return np.asarray(self._frames)
+
+    def __len__(self) -> int:
+        return len(self._frames)
@@ -0,0 +1,102 @@
+# Tank Game (@kennedyengineering)
+
+import numpy as np
+
+import queue
+import threading
+
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+
+class VideoStreamWriter:
+    def __init__(
+        self,
+        filename: str,
+        fps: float,
+        frame_skip: int = 1,
+        max_queued_frames: int = 64,
+    ):
+        """
+        Encodes frames into a compressed video file on a background thread, as they are produced
+
+        :param filename: Path of the video file to write
+        :param fps: Frame rate of the written frames
+        :param frame_skip: Encode one of every ``frame_skip`` written frames (the video frame rate is lowered to match)
+        :param max_queued_frames: Frames waiting to be encoded before write blocks (bounds memory)
+        """
+        self._filename = filename
+        self._fps = fps / frame_skip
+        self._frame_skip = frame_skip
+        self._frame_count = 0
+        self._frames = queue.Queue(maxsize=max_queued_frames)
+        self._error = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def write(self, frame: np.ndarray) -> None:
+        """
+        Queue a frame for encoding
+
+        :param frame: A (height, width, 3) uint8 RGB frame, which must not be modified afterwards
+        """
+        if self._error is not None:
+            raise self._error
+
+        # Decimate frames
+        if self._frame_count % self._frame_skip == 0:
+            self._frames.put(frame)
+        self._frame_count += 1
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Finish the video file once every queued frame is encoded
+
+        :param wait: Whether to block until encoding has finished
+        """
+        if not self._closed:
+            self._frames.put(None)
+            self._closed = True
+
+        if wait:
+            self._thread.join()
+
+            if self._error is not None:
+                raise self._error
+
+    def is_encoding(self) -> bool:
+        """
+        Whether frames are still being encoded
+        """
+        return self._thread.is_alive()
+
+    def _encode(self) -> None:
+        writer = None
+
+        try:
+            while (frame := self._frames.get()) is not None:
+                # Open the file once the frame size is known
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = FFMPEG_VideoWriter(
+                        self._filename, (width, height), self._fps
+                    )
+
+                writer.write_frame(np.ascontiguousarray(frame))
+        except Exception as error:
+            self._error = error
+
+            # Drain the queue so producers are never blocked
+            while frame is not None:
+                frame = self._frames.get()
+        finally:
+            if writer is not None:
+                # ffmpeg may only fail once its input is closed
+                process = writer.proc
+                writer.close()
+
+                if process.returncode != 0 and self._error is None:
+                    self._error = IOError(
+                        f"ffmpeg failed to encode {self._filename} (exit code {process.returncode})"
+                    )
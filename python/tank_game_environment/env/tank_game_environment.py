@@ -2,6 +2,8 @@
 import python_bindings as tank_game
 
 from .tank_game_util import TankData
+from .tank_game_replay import Replay, save_replay
+from .tank_game_viewer import HumanViewer
 
 from ..map.map_registry import registry as map_registry
 
@@ -18,9 +20,9 @@ from copy import copy
 
 import functools
 import numpy as np
-import pathlib
-
-from contextlib import redirect_stdout
+import os
+import time
+import uuid
 
 
 def aec_env_fn(**kwargs):
@@ -47,16 +49,30 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
     - render_fps : for "human" rendering mode
     - max_timesteps : how many steps before truncation (-1 for no truncation)
     - reload_delay : how many steps before tank can fire (0 for no delay)
+    - time_penalty : reward subtracted every step
+    - speed_reward : reward per absolute local velocity X (% range)
+    - lateral_reward : reward per local velocity Y (% range)
+    - hit_reward : reward for hitting a tank (subtracted from the hit tank)
 
     The engine_metadata holds engine constants.
     - pixel_density : pixels per meters (for rendering)
     - verbose_output : enable engine stdout messages
+    - worker_count : number of physics solver and lidar threads
+    - analytic_lidar : intersect lidar rays analytically (instead of with Box2D)
 
     The tank_metadata holds tank constants.
     - tread_max_speed : maximum linear velocity of an agent (meters / second)
     - lidar_range : range of the lidar (meters)
     - lidar_points : number of points in a lidar scan
     - lidar_pixel_radius : radius in pixels (for rendering)
+
+    The pixel_observation_metadata holds pixel observation constants (used when
+    observation_mode is "pixel").
+    - width : frame width in pixels
+    - height : frame height in pixels
+    - grayscale : one luminance channel (instead of RGB)
+    - egocentric : centered on, and rotated with, each tank (instead of top-down)
+    - view_range : half width of an egocentric frame (meters)
     """
 
     metadata = {
@@ -65,11 +81,17 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
         "render_fps": 30,
         "max_timesteps": 1000,
         "reload_delay": 20,
+        "time_penalty": 1.0,
+        "speed_reward": 0.5,
+        "lateral_reward": 0.5,
+        "hit_reward": 100.0,
     }
 
     engine_metadata = {
         "pixel_density": 2.0,
         "verbose_output": False,
+        "worker_count": 1,
+        "analytic_lidar": False,
     }
 
     tank_metadata = {
@@ -79,52 +101,124 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
         "lidar_pixel_radius": 1.0,
     }
 
-    def __init__(self, render_mode: str = None, map_id: str = "Random"):
+    pixel_observation_metadata = {
+        "width": 84,
+        "height": 84,
+        "grayscale": True,
+        "egocentric": True,
+        "view_range": 40.0,
+    }
+
+    def __init__(
+        self,
+        render_mode: str = None,
+        map_id: str = "Random",
+        observation_mode: str = "lidar",
+        replay_dir: str = None,
+        throttle_render: bool = True,
+    ):
         """The init method takes in environment arguments.
         These attributes should not be changed after initialization.
+
+        When replay_dir is set, every episode is recorded into a replay file in that directory,
+        see tank_game_replay.render_replay for rendering it offline.
+
+        In "human" render mode, frames are displayed in a window owned by the thread calling render (SDL only
+        supports this on the main thread on some platforms, such as macOS). When throttle_render is set, the
+        simulation is paced to render_fps, otherwise it runs at full speed and the viewer drops frames.
         """
 
-        EzPickle.__init__(self, render_mode=render_mode, map_id=map_id)
+        EzPickle.__init__(
+            self,
+            render_mode=render_mode,
+            map_id=map_id,
+            observation_mode=observation_mode,
+            replay_dir=replay_dir,
+            throttle_render=throttle_render,
+        )
 
         # load map class
         if map_id not in map_registry:
             error("Invalid map id.")
         self.map_cls = map_registry[map_id]
 
+        # check observation mode
+        if observation_mode not in ["lidar", "pixel"]:
+            error("Invalid observation mode.")
+        self.observation_mode = observation_mode
+        self.map_id = map_id
+
         # define engine variables
         self.engine = None
+        self.engine_key = None
         self.agent_data = None
         self.obstacle_ids = None
+        self.observation_config = None
+        self.pixel_observation_config = None
+        self.observations = None
+        self.reload_counters = None
+        self.actions = None
+        self.rewards = None
 
         # define rendering variables
         self.render_mode = render_mode
-        self.screen = None
-        self.clock = None
+        self.throttle_render = throttle_render
+        self.viewer = None
 
         # define environment variables
         self.possible_agents = [
             f"tank_{i}" for i in range(self.map_cls.get_num_tanks())
         ]
         self.agents = None
-        self.timestep = None
 
-    def __construct_map(self):
-        """Configures the arena according to the specification defined in the map."""
+        # define replay recording variables
+        self.replay_dir = replay_dir
+        self.replay = None
+        self.replay_actions = None
 
-        # initialize map
-        map_inst = self.map_cls()
+    def __construct_map(self, map_inst, seed=None):
+        """Configures the arena according to the specification defined in the map.
 
-        # construct engine
-        engine_config = tank_game.Config()
-        engine_config.arenaWidth = map_inst.arena_map_data.width
-        engine_config.arenaHeight = map_inst.arena_map_data.height
-        engine_config.pixelDensity = self.engine_metadata["pixel_density"]
-        engine_config.verboseOutput = self.engine_metadata["verbose_output"]
+        On unseeded resets, the engine (world, walls and render surface) is reused when the arena and tanks are
+        unchanged, only tank poses and differing obstacles are updated. A reused world is not bit-identical to a
+        fresh one (solver state depends on its history), so seeded resets and episodes recorded as replays
+        always rebuild the engine to stay exactly reproducible.
+        """
 
-        self.engine = tank_game.Engine(engine_config)
+        # define engine
+        engine_key = (
+            map_inst.arena_map_data.width,
+            map_inst.arena_map_data.height,
+            len(map_inst.tank_map_data),
+            tuple(self.engine_metadata.items()),
+            tuple(self.tank_metadata.items()),
+            self.render_mode is None,
+        )
+        reuse_engine = (
+            self.engine is not None
+            and self.engine_key == engine_key
+            and seed is None
+            and self.replay_dir is None
+        )
+        self.engine_key = engine_key
+
+        # construct engine
+        if reuse_engine:
+            self.engine.reset()
+        else:
+            engine_config = tank_game.Config()
+            engine_config.arenaWidth = map_inst.arena_map_data.width
+            engine_config.arenaHeight = map_inst.arena_map_data.height
+            engine_config.pixelDensity = self.engine_metadata["pixel_density"]
+            engine_config.verboseOutput = self.engine_metadata["verbose_output"]
+            engine_config.workerCount = self.engine_metadata["worker_count"]
+            engine_config.analyticLidar = self.engine_metadata["analytic_lidar"]
+            engine_config.headless = self.render_mode is None
+
+            self.engine = tank_game.Engine(engine_config)
 
         # construct agents
-        self.agent_data = dict()
+        agent_data = dict()
         for agent_data_key, tank_map_data in zip(
             self.possible_agents, map_inst.tank_map_data
         ):
@@ -137,38 +231,113 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
             tank_config.lidarRange = self.tank_metadata["lidar_range"]
             tank_config.lidarRadius = self.tank_metadata["lidar_pixel_radius"]
 
-            tank_id = self.engine.addTank(tank_config)
+            if reuse_engine:
+                tank_id = self.agent_data[agent_data_key].id
+                self.engine.resetTank(tank_id, tank_config)
+            else:
+                tank_id = self.engine.addTank(tank_config)
+
+            agent_data[agent_data_key] = TankData(tank_id, 0)
+
+        self.agent_data = agent_data
+
+        # map agents to rows of batched engine queries (ordered by tank id)
+        tank_ids = self.engine.getTankIds()
+        for tank_data in self.agent_data.values():
+            tank_data.index = tank_ids.index(tank_data.id)
+
+        self.reload_counters = np.zeros(len(tank_ids), dtype=np.float32)
+        self.actions = np.zeros((len(tank_ids), 3), dtype=np.float32)
+        self.rewards = np.zeros(len(tank_ids), dtype=np.float32)
+
+        # construct game rules (reload, termination, truncation and rewards)
+        game_rules_config = tank_game.GameRulesConfig()
+        game_rules_config.reloadDelay = self.metadata["reload_delay"]
+        game_rules_config.maxTimesteps = self.metadata["max_timesteps"]
+        game_rules_config.velocityRange = self.tank_metadata["tread_max_speed"]
+        game_rules_config.timePenalty = self.metadata["time_penalty"]
+        game_rules_config.speedReward = self.metadata["speed_reward"]
+        game_rules_config.lateralReward = self.metadata["lateral_reward"]
+        game_rules_config.hitReward = self.metadata["hit_reward"]
+        self.engine.setGameRules(game_rules_config)
+
+        # construct observation normalization
+        self.observation_config = tank_game.ObservationConfig()
+        self.observation_config.lidarRange = self.tank_metadata["lidar_range"]
+        self.observation_config.velocityRange = self.tank_metadata["tread_max_speed"]
+        self.observation_config.reloadRange = self.metadata["reload_delay"]
+
+        # construct pixel observation rendering
+        self.pixel_observation_config = tank_game.PixelObservationConfig()
+        self.pixel_observation_config.width = self.pixel_observation_metadata["width"]
+        self.pixel_observation_config.height = self.pixel_observation_metadata["height"]
+        self.pixel_observation_config.grayscale = self.pixel_observation_metadata[
+            "grayscale"
+        ]
+        self.pixel_observation_config.egocentric = self.pixel_observation_metadata[
+            "egocentric"
+        ]
+        self.pixel_observation_config.viewRange = self.pixel_observation_metadata[
+            "view_range"
+        ]
 
-            self.agent_data[agent_data_key] = TankData(tank_id, 0)
+        # allocate a fresh observation buffer, so views handed out during the previous episode stay valid
+        self.observations = None
 
-        # construct obstacles
-        self.obstacle_ids = list()
+        # construct obstacles (only obstacles that differ from the previous episode are replaced)
+        obstacle_configs = list()
         for obstacle_map_data in map_inst.obstacle_map_data:
             obstacle_config = tank_game.ObstacleConfig()
             obstacle_config.positionX = obstacle_map_data.position_x
             obstacle_config.positionY = obstacle_map_data.position_y
             obstacle_config.radius = obstacle_map_data.radius
 
-            obstacle_id = self.engine.addObstacle(obstacle_config)
+            obstacle_configs.append(obstacle_config)
 
-            self.obstacle_ids.append(obstacle_id)
+        self.obstacle_ids = self.engine.updateObstacles(obstacle_configs)
 
     def reset(self, seed=None, options=None):
-        """Reset the environment to a starting point."""
+        """Reset the environment to a starting point.
+
+        options["map_data"] may hold a MapData instance to play on (instead of generating the map).
+        """
+
+        # save an unfinished replay
+        self.__save_replay()
 
         # set seed
         if seed is not None:
             np.random.seed(seed=seed)
 
+        # initialize map
+        if options is not None and "map_data" in options:
+            map_inst = options["map_data"]
+        else:
+            map_inst = self.map_cls()
+
         # reset engine variables
-        self.__construct_map()
+        self.__construct_map(map_inst, seed=seed)
 
         # reset environment variables
         self.possible_agents = list(self.agent_data.keys())
         self.agents = copy(self.possible_agents)
-        self.timestep = 0
+
+        # start recording a replay (optional)
+        if self.replay_dir is not None:
+            self.replay = Replay(
+                map_id=self.map_id,
+                seed=seed,
+                metadata={
+                    "metadata": dict(self.metadata),
+                    "engine_metadata": dict(self.engine_metadata),
+                    "tank_metadata": dict(self.tank_metadata),
+                },
+                map_data=map_inst,
+            )
+            self.replay_actions = list()
 
         # get initial observations
+        self.__update_observations()
         observations = {a: self.get_observation(a) for a in self.agents}
 
         # get dummy infos (necessary for proper parallel_to_aec conversion)
@@ -180,116 +349,69 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
 
         return observations, infos
 
-    def __get_agent_from_id(self, id):
-        """Search for matching TankData.id in agent_data."""
-
-        agents = [key for key, value in self.agent_data.items() if value.id == id]
-
-        if len(agents) == 0:
-            error("Invalid agent id.")
+    def __record_actions(self, actions):
+        """Append a step's actions to the replay (NaN rows for agents without an action)."""
 
-        if len(agents) > 1:
-            error("Multiple matches for agent id.")
+        step_actions = np.full((len(self.possible_agents), 3), np.nan, dtype=np.float32)
+        for row, agent in enumerate(self.possible_agents):
+            if agent in actions and agent in self.agents:
+                step_actions[row] = actions[agent]
 
-        agent = agents[0]
+        self.replay_actions.append(step_actions)
 
-        return agent
+    def __save_replay(self):
+        """Write the replay being recorded (if any) into the replay directory."""
 
-    def __shape_agent_reward(self, observation):
-        """Shapes agent reward."""
-
-        # TODO: add metadata for simple reward shaping configuration
-
-        reward = 0
-
-        # penalize every timestep
-        reward -= 1
+        if self.replay is None:
+            return
 
-        # reward movement
-        reward += abs(observation[360]) * 0.5
-        reward += observation[361] * 0.5
+        self.replay.actions = np.array(self.replay_actions, dtype=np.float32).reshape(
+            -1, len(self.possible_agents), 3
+        )
 
-        # punish rotation
-        # reward -= abs(observation[362])*0.2
+        os.makedirs(self.replay_dir, exist_ok=True)
+        replay_name = (
+            f"replay_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}.npz"
+        )
+        save_replay(os.path.join(self.replay_dir, replay_name), self.replay)
 
-        return reward
+        self.replay = None
+        self.replay_actions = None
 
     def step(self, actions):
         """Takes in actions for the agents."""
 
-        # Execute actions
+        # Record actions (optional)
+        if self.replay is not None:
+            self.__record_actions(actions)
+
+        # Execute actions (rows of agents without an action hold NaN, and are skipped)
+        self.actions.fill(np.nan)
         for a in actions:
             if a not in self.agents:
                 warn(f"You are trying to assign actions to an invalid agent {a}.")
                 continue
 
-            action = actions[a]
-
-            self.engine.moveLeftTankTread(
-                self.agent_data[a].id,
-                action[0] * self.tank_metadata["tread_max_speed"],
-            )
-            self.engine.moveRightTankTread(
-                self.agent_data[a].id,
-                action[1] * self.tank_metadata["tread_max_speed"],
-            )
-
-            if action[2] > 0.0 and self.agent_data[a].reload_counter == 0:
-                self.engine.fireTankGun(self.agent_data[a].id)
+            self.actions[self.agent_data[a].index] = actions[a]
 
-        # Handle reload counter
-        for a in self.agents:
-            if self.agent_data[a].reload_counter == 0:
-                self.agent_data[a].reload_counter = self.metadata["reload_delay"]
-            else:
-                self.agent_data[a].reload_counter -= 1
-
-        # Step the engine
-        projectile_events = self.engine.step()
+        # Step the game (reload, termination, truncation and rewards are handled by the engine)
+        rewards, terminated, truncated = self.engine.stepGame(
+            self.actions, out=self.rewards
+        )
+        self.reload_counters = self.engine.getGameRules().getReloadCounters()
 
         # Get observations
+        self.__update_observations()
         observations = {a: self.get_observation(a) for a in self.agents}
 
         # Assign rewards
-        rewards = {a: self.__shape_agent_reward(observations[a]) for a in self.agents}
-
-        # Check termination conditions
-        terminations = {a: False for a in self.agents}
-
-        filtered_events = [
-            x for x in projectile_events if x[0] == tank_game.CategoryBits.TANK_BODY
-        ]
-        unique_events = list(
-            set(filtered_events)
-        )  # Account for a tank being hit multiple times
+        # FIXME: if both get shot at same time, give both negative reward instead of tie?
+        rewards = {a: float(rewards[self.agent_data[a].index]) for a in self.agents}
 
+        # Check termination and truncation conditions
         # FIXME: only give termination to the tank that was shot?
-        if unique_events:
-            terminations = {a: True for a in self.agents}
-
-        # FIXME: if both get shot at same time, give both negative reward instead of tie?
-        # FIXME: what if tank hits itself?
-        for event in unique_events:
-            src_agent_id = event[1]
-            src_agent = self.__get_agent_from_id(src_agent_id)
-            if src_agent not in self.agents:
-                error("Rewarding an invalid agent.")
-            rewards[src_agent] += 100
-
-            hit_agent_id = event[2]
-            hit_agent = self.__get_agent_from_id(hit_agent_id)
-            if hit_agent not in self.agents:
-                error("Rewarding an invalid agent.")
-            rewards[hit_agent] -= 100
-
-        # Check truncation conditions
-        truncations = {a: False for a in self.agents}
-        if (
-            self.timestep > self.metadata["max_timesteps"]
-            and self.metadata["max_timesteps"] != -1
-        ):
-            truncations = {a: True for a in self.agents}
-        self.timestep += 1
+        terminations = {a: terminated for a in self.agents}
+        truncations = {a: truncated for a in self.agents}
 
         # Get dummy infos (not used)
         infos = {a: {} for a in self.agents}
@@ -297,6 +419,9 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
         if any(terminations.values()) or all(truncations.values()):
             self.agents = []
 
+            # Finish the replay (optional)
+            self.__save_replay()
+
         if self.render_mode == "human":
             self.render()
 
@@ -311,99 +436,48 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
             warn("You are calling render method without specifying any render mode.")
             return
 
-        # Setup PyGame
-        with redirect_stdout(None):
-            global pygame
-            import pygame
-
-        if self.screen is None and self.render_mode == "human":
-            pygame.init()
-
+        # Setup viewer
+        if self.viewer is None and self.render_mode == "human":
             screen_width, screen_height = self.engine.getImageDimensions()
-            self.screen = pygame.display.set_mode((screen_width, screen_height))
-            pygame.display.set_caption("Tank Game Environment")
-
-            icon_path = (
-                pathlib.Path(__file__).parent.parent.resolve() / "asset/tank_icon.png"
+            self.viewer = HumanViewer(
+                screen_width,
+                screen_height,
+                self.metadata["render_fps"],
+                throttle=self.throttle_render,
             )
-            pygame.display.set_icon(pygame.image.load(icon_path))
-
-        if self.clock is None and self.render_mode == "human":
-            self.clock = pygame.time.Clock()
 
         # Render frame
-        self.engine.clearImage()
-
-        for id in self.obstacle_ids:
-            self.engine.renderObstacle(id)
-
-        for a in self.agents:
-            id = self.agent_data[a].id
-            self.engine.renderTank(id)
-            self.engine.renderTankLidar(id)
+        self.engine.renderScene([self.agent_data[a].id for a in self.agents])
 
-        self.engine.renderProjectiles()
-
-        # Retrieve frame
+        # Retrieve frame (freshly allocated, so it may be handed to the viewer or kept by callers)
         frame = self.engine.getImageBuffer()
 
         # Display frame
         if self.render_mode == "human":
-            surface = pygame.surfarray.make_surface(np.swapaxes(frame, 0, 1))
-            self.screen.blit(surface, (0, 0))
-
-            pygame.event.pump()
-            pygame.display.update()
-            self.clock.tick(self.metadata["render_fps"])
+            self.viewer.show(frame)
 
         return frame if self.render_mode == "rgb_array" else None
 
-    def get_observation(self, agent):
-        """Get observation for agent."""
-
-        # FIXME: remove clipping to account for brief moments when values are beyond defined ranges?
-
-        id = self.agent_data[agent].id
-
-        # obtain lidar observation
-        lidar_scan = self.engine.scanTankLidar(id)
-        lidar_range = self.tank_metadata["lidar_range"]
-
-        lidar_scan = np.clip(
-            lidar_scan, 0.0, lidar_range
-        )  # Due to precision errors in simulator, returned distance may be slightly larger than lidar_range
-        lidar_scan /= lidar_range  # Normalize between 0.0 and 1.0
-
-        # obtain velocity observation
-        velocity = self.engine.getTankLocalVelocity(id)
-        velocity_range = self.tank_metadata["tread_max_speed"]
-
-        velocity = np.clip(
-            velocity, -velocity_range, velocity_range
-        )  # Due to precision errors in simulator, returned velocity may be slightly larger than lidar_range
-        velocity /= velocity_range  # Normalize between -1.0 and 1.0
+    def __update_observations(self):
+        """Compute every agent's observation in one engine call, reusing the observation buffer."""
 
-        # obtain angular velocity observation
-        angular_velocity = self.engine.getTankAngularVelocity(id)
-        angular_velocity_range = 9.84575  # Empirically determined
+        if self.observation_mode == "pixel":
+            self.observations = self.engine.getAllTankPixelObservations(
+                self.pixel_observation_config, out=self.observations
+            )
+            return
 
-        angular_velocity = np.clip(
-            angular_velocity, -angular_velocity_range, angular_velocity_range
+        self.observations = self.engine.getAllTankObservations(
+            self.observation_config, self.reload_counters, out=self.observations
         )
-        angular_velocity /= angular_velocity_range  # Normalize between -1.0 and 1.0
 
-        # obtain reload counter observation
-        reload_counter = self.agent_data[agent].reload_counter
-        reload_counter /= max(
-            self.metadata["reload_delay"], 1
-        )  # Normalize between 0.0 and 1.0
+    def get_observation(self, agent):
+        """Get observation for agent.
 
-        # return observations
-        observations = np.append(
-            lidar_scan, (velocity[0], velocity[1], angular_velocity, reload_counter)
-        ).astype(np.float32)
+        Returns a view into the shared observation buffer, which is overwritten by the next step.
+        """
 
-        return observations
+        return self.observations[self.agent_data[agent].index]
 
     @functools.lru_cache(maxsize=None)
     def observation_space(self, agent):
@@ -413,7 +487,20 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
         [361] - local velocity Y axis (% range)
         [362] - local angular velocity (% range)
         [363] - reload counter (% range)
+
+        In pixel observation mode, a (height, width, channels) frame rendered
+        around the agent (or of the whole arena), see pixel_observation_metadata.
         """
+        if self.observation_mode == "pixel":
+            channels = 1 if self.pixel_observation_metadata["grayscale"] else 3
+            shape = (
+                self.pixel_observation_metadata["height"],
+                self.pixel_observation_metadata["width"],
+                channels,
+            )
+
+            return Box(0, 255, shape=shape, dtype=np.uint8)
+
         lidar_points = self.tank_metadata["lidar_points"]
 
         return Box(-1.0, 1.0, shape=(lidar_points + 4,), dtype=np.float32)
@@ -431,6 +518,8 @@ class TankGameEnvironment(ParallelEnv, EzPickle):
     def close(self):
         """Uninitialize components."""
 
-        if self.screen is not None:
-            pygame.quit()
-            self.screen = None
+        self.__save_replay()
+
+        if self.viewer is not None:
+            self.viewer.close()
+            self.viewer = None
@@ -0,0 +1,131 @@
+# Tank Game (@kennedyengineering)
+
+from ..map.map_base import MapData, ArenaMapData, TankMapData, ObstacleMapData
+
+from dataclasses import dataclass, field
+
+import json
+import numpy as np
+
+
+@dataclass
+class Replay:
+    """
+    Holds everything needed to re-simulate an episode.
+    - map_id : map the episode was played on
+    - seed : seed passed to reset (None if unseeded)
+    - metadata : environment, engine and tank metadata dicts
+    - map_data : arena, tank and obstacle placement
+    - actions : per step actions of shape (steps, num_agents, 3), NaN rows for inactive agents
+    """
+
+    map_id: str
+    seed: int
+    metadata: dict
+    map_data: MapData
+    actions: np.ndarray = field(
+        default_factory=lambda: np.zeros((0, 0, 3), dtype=np.float32)
+    )
+
+
+def save_replay(path, replay):
+    """Write a replay into a compressed binary log."""
+
+    header = {
+        "map_id": replay.map_id,
+        "seed": replay.seed,
+        "metadata": replay.metadata,
+        "arena": [
+            replay.map_data.arena_map_data.width,
+            replay.map_data.arena_map_data.height,
+        ],
+    }
+
+    tanks = np.array(
+        [[t.position_x, t.position_y, t.angle] for t in replay.map_data.tank_map_data],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    obstacles = np.array(
+        [
+            [o.position_x, o.position_y, o.radius]
+            for o in replay.map_data.obstacle_map_data
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+
+    with open(path, "wb") as file:
+        np.savez_compressed(
+            file,
+            header=np.array(json.dumps(header)),
+            tanks=tanks,
+            obstacles=obstacles,
+            actions=np.asarray(replay.actions, dtype=np.float32),
+        )
+
+
+def load_replay(path):
+    """Read a replay from a binary log written by save_replay."""
+
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data["header"]))
+        tanks = data["tanks"]
+        obstacles = data["obstacles"]
+        actions = data["actions"]
+
+    width, height = header["arena"]
+    map_data = MapData(
+        arena_map_data=ArenaMapData(height=height, width=width),
+        tank_count=len(tanks),
+        tank_map_data=[
+            TankMapData(position_x=x, position_y=y, angle=angle)
+            for x, y, angle in tanks.tolist()
+        ],
+        obstacle_map_data=[
+            ObstacleMapData(position_x=x, position_y=y, radius=radius)
+            for x, y, radius in obstacles.tolist()
+        ],
+    )
+
+    return Replay(
+        map_id=header["map_id"],
+        seed=header["seed"],
+        metadata=header["metadata"],
+        map_data=map_data,
+        actions=actions,
+    )
+
+
+def render_replay(replay, pixel_density=None, frame_skip=1):
+    """Re-simulate a replay, and yield rendered frames (the initial frame, then one per step).
+
+    The pixel density (resolution) may differ from the recorded one, the simulation does not depend on it.
+    """
+
+    from .tank_game_environment import TankGameEnvironment
+
+    env = TankGameEnvironment(render_mode="rgb_array", map_id=replay.map_id)
+
+    # restore recorded metadata (keys added since recording keep their defaults)
+    env.metadata = env.metadata | replay.metadata["metadata"]
+    env.engine_metadata = replay.metadata["engine_metadata"]
+    env.tank_metadata = replay.metadata["tank_metadata"]
+
+    if pixel_density is not None:
+        env.engine_metadata = env.engine_metadata | {"pixel_density": pixel_density}
+
+    # re-simulate the episode
+    env.reset(seed=replay.seed, options={"map_data": replay.map_data})
+    yield env.render()
+
+    for step, step_actions in enumerate(replay.actions):
+        actions = {
+            agent: action
+            for agent, action in zip(env.possible_agents, step_actions)
+            if agent in env.agents and not np.isnan(action).any()
+        }
+        env.step(actions)
+
+        if (step + 1) % frame_skip == 0:
+            yield env.render()
+
+    env.close()
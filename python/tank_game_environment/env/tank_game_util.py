@@ -8,8 +8,8 @@ class TankData:
     """
     Holds information about an agent.
     - id : engine assigned ID
-    - reload_counter : number of steps until tank can fire
+    - index : row of the agent in batched engine queries
     """
 
     id: int
-    reload_counter: int
+    index: int
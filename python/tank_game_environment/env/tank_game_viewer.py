@@ -0,0 +1,114 @@
+# Tank Game (@kennedyengineering)
+
+from contextlib import redirect_stdout
+
+import numpy as np
+import pathlib
+import threading
+import time
+
+
+class HumanViewer:
+    """
+    Displays frames in a PyGame window.
+
+    The window is created, updated and pumped for events on the thread that creates the viewer, as SDL only supports
+    its display and event functions on the main thread on some platforms (such as macOS). Using the viewer from
+    another thread raises a RuntimeError.
+
+    When throttle is set, show paces the caller to the display rate. Otherwise show never waits, and a frame arriving
+    before the next frame is due is dropped, so the caller runs at full speed.
+
+    The clock paces the display with tick(fps), and defaults to a PyGame clock. The timer returns the current time
+    in seconds, and defaults to time.perf_counter.
+    """
+
+    def __init__(
+        self,
+        width,
+        height,
+        fps,
+        throttle=True,
+        caption="Tank Game Environment",
+        clock=None,
+        timer=time.perf_counter,
+    ):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.throttle = throttle
+        self.caption = caption
+        self.timer = timer
+
+        self.presented_frames = 0
+        self.dropped_frames = 0
+        self.next_frame_time = None
+        self.closed = False
+
+        # Setup PyGame (on the creating thread)
+        self.thread = threading.current_thread()
+
+        with redirect_stdout(None):
+            import pygame
+        self.pygame = pygame
+
+        pygame.init()
+
+        self.screen = pygame.display.set_mode((self.width, self.height))
+        pygame.display.set_caption(self.caption)
+
+        icon_path = (
+            pathlib.Path(__file__).parent.parent.resolve() / "asset/tank_icon.png"
+        )
+        pygame.display.set_icon(pygame.image.load(icon_path))
+
+        self.clock = clock if clock is not None else pygame.time.Clock()
+
+    def show(self, frame):
+        """Display a (height, width, 3) frame."""
+
+        self.__check_thread()
+
+        if self.closed:
+            raise RuntimeError("The viewer is closed.")
+
+        # Keep the window responsive
+        self.pygame.event.pump()
+
+        # Drop frames arriving before the next frame is due
+        if not self.throttle:
+            now = self.timer()
+
+            if self.next_frame_time is not None and now < self.next_frame_time:
+                self.dropped_frames += 1
+                return
+
+            self.next_frame_time = now + 1.0 / self.fps
+
+        # Display frame
+        surface = self.pygame.surfarray.make_surface(np.swapaxes(frame, 0, 1))
+        self.screen.blit(surface, (0, 0))
+        self.pygame.display.update()
+        self.presented_frames += 1
+
+        # Pace the caller to the display rate
+        if self.throttle:
+            self.clock.tick(self.fps)
+
+    def close(self):
+        """Close the window."""
+
+        self.__check_thread()
+
+        if not self.closed:
+            self.pygame.quit()
+            self.closed = True
+
+    def __check_thread(self):
+        # PyGame display and event functions must stay on the creating thread
+        if threading.current_thread() is not self.thread:
+            raise RuntimeError(
+                "The viewer must be used from the thread that created it "
+                f"({self.thread.name}), as SDL does not support display and event "
+                "functions on other threads on some platforms (such as macOS)."
+            )
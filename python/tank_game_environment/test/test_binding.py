@@ -2,12 +2,443 @@
 
 import python_bindings as tank_game
 
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pickle
 import pytest
 
 
+def simulate_engine(num_steps):
+    """Build an engine with two dueling tanks, and return its final observations."""
+
+    config = tank_game.Config()
+    engine = tank_game.Engine(config)
+
+    tank_ids = []
+    for position_x, angle in (
+        (config.arenaWidth / 3, -np.pi / 2),
+        (2 * config.arenaWidth / 3, np.pi / 2),
+    ):
+        tank_config = tank_game.TankConfig()
+        tank_config.positionX = position_x
+        tank_config.positionY = config.arenaHeight / 2
+        tank_config.angle = angle
+        tank_ids.append(engine.addTank(tank_config))
+
+    observation_config = tank_game.ObservationConfig()
+    reload_counters = np.zeros(len(tank_ids), dtype=np.float32)
+
+    for step in range(num_steps):
+        for tank_id in tank_ids:
+            engine.moveLeftTankTread(tank_id, 5.0)
+            engine.moveRightTankTread(tank_id, 10.0)
+            if step % 20 == 0:
+                engine.fireTankGun(tank_id)
+        engine.step()
+        engine.getAllTankObservations(observation_config, reload_counters)
+
+    return engine.getAllTankObservations(observation_config, reload_counters)
+
+
 class TestBinding:
     def test_engine_destroy(self):
         config = tank_game.Config()
 
         for i in range(100000):
             engine = tank_game.Engine(config)
+
+    def test_engine_scan_all_tanks_lidar(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+            tank_config = tank_game.TankConfig()
+            tank_config.positionX = position_x
+            tank_config.positionY = config.arenaHeight / 2
+            engine.addTank(tank_config)
+
+        scans = engine.scanAllTanksLidar()
+        assert scans.shape == (2, tank_game.TankConfig().lidarPoints)
+        assert scans.dtype == np.float32
+
+        for row, tank_id in enumerate(engine.getTankIds()):
+            np.testing.assert_array_equal(scans[row], engine.scanTankLidar(tank_id))
+
+        out = np.zeros_like(scans)
+        assert engine.scanAllTanksLidar(out=out) is out
+        np.testing.assert_array_equal(out, scans)
+
+        with pytest.raises(TypeError):
+            engine.scanAllTanksLidar(out=np.zeros(scans.shape, dtype=np.float64))
+
+        with pytest.raises(ValueError):
+            engine.scanAllTanksLidar(
+                out=np.zeros((1, scans.shape[1]), dtype=np.float32)
+            )
+
+    def test_engine_get_all_tank_observations(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+            tank_config = tank_game.TankConfig()
+            tank_config.positionX = position_x
+            tank_config.positionY = config.arenaHeight / 2
+            engine.addTank(tank_config)
+
+        observation_config = tank_game.ObservationConfig()
+        observation_config.reloadRange = 20
+        reload_counters = np.array([0, 10], dtype=np.float32)
+
+        observations = engine.getAllTankObservations(
+            observation_config, reload_counters
+        )
+        assert observations.shape == (2, tank_game.TankConfig().lidarPoints + 4)
+        assert observations.dtype == np.float32
+        assert np.all((observations >= -1.0) & (observations <= 1.0))
+        np.testing.assert_array_equal(observations[:, -1], [0.0, 0.5])
+
+        out = np.zeros_like(observations)
+        assert (
+            engine.getAllTankObservations(observation_config, reload_counters, out=out)
+            is out
+        )
+        np.testing.assert_array_equal(out, observations)
+
+        with pytest.raises(ValueError):
+            engine.getAllTankObservations(observation_config, reload_counters[:1])
+
+    def test_engine_get_all_tank_states(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+            tank_config = tank_game.TankConfig()
+            tank_config.positionX = position_x
+            tank_config.positionY = config.arenaHeight / 2
+            tank_id = engine.addTank(tank_config)
+
+        for _ in range(30):
+            engine.moveLeftTankTread(tank_id, 10.0)
+            engine.moveRightTankTread(tank_id, 5.0)
+            engine.step()
+
+        states = engine.getAllTankStates()
+        assert states.shape == (2, len(tank_game.TANK_STATE_FIELDS))
+        assert states.dtype == np.float32
+
+        for row, tank_id in enumerate(engine.getTankIds()):
+            state = dict(zip(tank_game.TANK_STATE_FIELDS, states[row]))
+            assert (state["position_x"], state["position_y"]) == pytest.approx(
+                engine.getTankPosition(tank_id)
+            )
+            assert state["orientation"] == pytest.approx(
+                engine.getTankOrientation(tank_id)
+            )
+            assert (
+                state["world_velocity_x"],
+                state["world_velocity_y"],
+            ) == pytest.approx(engine.getTankWorldVelocity(tank_id))
+            assert (
+                state["local_velocity_x"],
+                state["local_velocity_y"],
+            ) == pytest.approx(engine.getTankLocalVelocity(tank_id))
+            assert state["angular_velocity"] == pytest.approx(
+                engine.getTankAngularVelocity(tank_id)
+            )
+            assert state["gun_angle"] == pytest.approx(engine.getTankGunAngle(tank_id))
+
+        out = np.zeros_like(states)
+        assert engine.getAllTankStates(out=out) is out
+        np.testing.assert_array_equal(out, states)
+
+    def test_engine_apply_actions(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+            tank_config = tank_game.TankConfig()
+            tank_config.positionX = position_x
+            tank_config.positionY = config.arenaHeight / 2
+            engine.addTank(tank_config)
+
+        actions = np.array([[1.0, 1.0, 1.0], [np.nan, np.nan, np.nan]])
+        reload_counters = np.array([0, 3], dtype=np.float32)
+
+        engine.applyActions(actions, reload_counters, 20)
+        np.testing.assert_array_equal(reload_counters, [20, 2])
+
+        for _ in range(30):
+            engine.step()
+
+        # only the first tank moved
+        states = engine.getAllTankStates()
+        assert states[0, 5] > 0.0
+        assert states[1, 5] == 0.0
+
+        with pytest.raises(ValueError):
+            engine.applyActions(actions[:1], reload_counters, 20)
+
+        with pytest.raises(TypeError):
+            engine.applyActions(actions, reload_counters.astype(np.float64), 20)
+
+    def test_engine_step_game(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+            tank_config = tank_game.TankConfig()
+            tank_config.positionX = position_x
+            tank_config.positionY = config.arenaHeight / 2
+            engine.addTank(tank_config)
+
+        actions = np.zeros((2, 3), dtype=np.float32)
+
+        with pytest.raises(RuntimeError):
+            engine.stepGame(actions)
+
+        game_rules_config = tank_game.GameRulesConfig()
+        game_rules_config.reloadDelay = 5
+        game_rules_config.maxTimesteps = 0
+        engine.setGameRules(game_rules_config)
+        game_rules = engine.getGameRules()
+
+        actions[0, 2] = 1.0
+        rewards, terminated, truncated = engine.stepGame(actions)
+        assert rewards.shape == (2,)
+        np.testing.assert_allclose(rewards, -1.0)
+        assert not terminated and not truncated
+        np.testing.assert_array_equal(game_rules.getReloadCounters(), [5, 5])
+
+        out = np.zeros(2, dtype=np.float32)
+        assert engine.stepGame(actions, out=out)[0] is out
+        assert game_rules.isTruncated()
+        assert game_rules.getTimestep() == 2
+
+        engine.reset()
+        assert game_rules.getTimestep() == 0
+
+    def test_engine_save_restore_state(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+            tank_config = tank_game.TankConfig()
+            tank_config.positionX = position_x
+            tank_config.positionY = config.arenaHeight / 2
+            engine.addTank(tank_config)
+        engine.setGameRules(tank_game.GameRulesConfig())
+
+        actions = np.array([[1.0, 0.5, 1.0], [0.5, 1.0, 1.0]], dtype=np.float32)
+        for _ in range(10):
+            engine.stepGame(actions)
+
+        state = pickle.loads(pickle.dumps(engine.saveState()))
+        assert isinstance(state, bytes)
+        saved_states = engine.getAllTankStates()
+
+        for _ in range(10):
+            engine.stepGame(actions)
+
+        engine.restoreState(state)
+        np.testing.assert_array_equal(engine.getAllTankStates(), saved_states)
+        assert engine.getGameRules().getTimestep() == 10
+
+        with pytest.raises(ValueError):
+            engine.restoreState(state[:-1])
+
+    def test_engine_simulate_lookahead(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+            tank_config = tank_game.TankConfig()
+            tank_config.positionX = position_x
+            tank_config.positionY = config.arenaHeight / 2
+            engine.addTank(tank_config)
+        engine.setGameRules(tank_game.GameRulesConfig())
+
+        actions = np.tile(
+            np.array([[1.0, 0.5, 1.0], [0.5, 1.0, 1.0]], dtype=np.float32),
+            (200, 1, 1),
+        )
+        state = engine.saveState()
+
+        states, rewards, events = engine.simulateLookahead(actions)
+        assert states.shape == (200, 2, len(tank_game.TANK_STATE_FIELDS))
+        assert rewards.shape == (200, 2)
+        assert events.dtype.names == ("step", "category", "src_id", "hit_id")
+        assert len(events) > 0
+        assert np.all(np.diff(events["step"].astype(np.int64)) >= 0)
+
+        # the engine is untouched, and playing the actions follows the prediction
+        assert engine.saveState() == state
+
+        for step in range(10):
+            step_rewards, _, _ = engine.stepGame(actions[step])
+            np.testing.assert_allclose(
+                engine.getAllTankStates(), states[step], atol=1e-3
+            )
+            np.testing.assert_allclose(step_rewards, rewards[step], atol=1e-3)
+
+        with pytest.raises(ValueError):
+            engine.simulateLookahead(actions[0])
+
+    def test_engine_step_events(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        tank_config = tank_game.TankConfig()
+        tank_config.positionX = config.arenaWidth / 2
+        tank_config.positionY = config.arenaHeight / 2
+        tank_id = engine.addTank(tank_config)
+
+        # steps without events share one empty array
+        empty_events = engine.step()
+        assert empty_events.shape == (0,)
+        assert empty_events.dtype.names == ("category", "src_id", "hit_id")
+        assert not empty_events.flags.writeable
+        assert engine.step() is empty_events
+
+        # two overlapping projectiles report hitting each other
+        engine.fireTankGun(tank_id)
+        engine.fireTankGun(tank_id)
+
+        events = engine.step(unique=True)
+        while len(events) == 0:
+            events = engine.step(unique=True)
+
+        assert len(events) == 1
+        assert events[0]["category"] == tank_game.CategoryBits.PROJECTILE
+        assert events[0]["src_id"] == tank_id
+        assert events[0]["hit_id"] == tank_id
+
+        # events outside the category mask are removed
+        engine.fireTankGun(tank_id)
+        engine.fireTankGun(tank_id)
+
+        for _ in range(1000):
+            events = engine.step(categoryMask=tank_game.CategoryBits.TANK_BODY)
+            assert len(events) == 0
+
+    def test_engine_threaded_step(self):
+        num_engines = 8
+        num_steps = 200
+
+        serial_results = [simulate_engine(num_steps) for _ in range(num_engines)]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            threaded_results = list(
+                executor.map(simulate_engine, [num_steps] * num_engines)
+            )
+
+        for serial_result, threaded_result in zip(serial_results, threaded_results):
+            np.testing.assert_array_equal(serial_result, threaded_result)
+
+    def test_batch_engine_step(self):
+        config = tank_game.Config()
+        batch_config = tank_game.BatchConfig()
+        batch_config.engineCount = 3
+        batch_config.threadCount = 2
+        batch_engine = tank_game.BatchEngine(config, batch_config)
+        assert batch_engine.getEngineCount() == 3
+
+        for engine_index in range(batch_engine.getEngineCount()):
+            engine = batch_engine.getEngine(engine_index)
+            for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+                tank_config = tank_game.TankConfig()
+                tank_config.positionX = position_x
+                tank_config.positionY = config.arenaHeight / 2
+                engine.addTank(tank_config)
+
+        actions = np.zeros((3, 2, 3), dtype=np.float32)
+        actions[:, :, 0] = 0.5
+        observations, events, dones, rewards = batch_engine.step(actions)
+        assert observations.shape == (3, 2, tank_game.TankConfig().lidarPoints + 4)
+        assert observations.dtype == np.float32
+        assert events.shape[1] == 4
+        assert dones.shape == (3,)
+        assert not np.any(dones)
+        assert rewards.shape == (3, 2)
+        assert rewards.dtype == np.float32
+
+        out = np.zeros_like(observations)
+        assert batch_engine.step(actions, out=out)[0] is out
+
+        with pytest.raises(ValueError):
+            batch_engine.step(actions[:2])
+
+    def test_engine_image_view(self):
+        config = tank_game.Config()
+        engine = tank_game.Engine(config)
+
+        tank_config = tank_game.TankConfig()
+        tank_config.positionX = config.arenaWidth / 2
+        tank_config.positionY = config.arenaHeight / 2
+        engine.addTank(tank_config)
+        engine.renderTank(engine.getTankIds()[0])
+
+        image_width, image_height = engine.getImageDimensions()
+        frame = engine.getImageBuffer()
+        assert frame.shape == (image_height, image_width, 3)
+
+        view = engine.getImageView()
+        assert view.shape == (image_height, image_width, 4)
+        assert not view.flags.writeable
+        np.testing.assert_array_equal(view[:, :, 2::-1], frame)
+
+        out = np.zeros_like(frame)
+        assert engine.getImageBuffer(out=out) is out
+        np.testing.assert_array_equal(out, frame)
+
+        # The view keeps the engine (and its surface) alive
+        del engine
+        np.testing.assert_array_equal(view[:, :, 2::-1], frame)
+
+    def test_engine_headless(self):
+        config = tank_game.Config()
+        config.headless = True
+        engine = tank_game.Engine(config)
+
+        memory_usage = engine.getMemoryUsage()
+        assert memory_usage["render_surface"] == 0
+        assert memory_usage["total"] == sum(
+            size for name, size in memory_usage.items() if name != "total"
+        )
+
+        engine.renderScene()
+        image_width, image_height = engine.getImageDimensions()
+        assert engine.getMemoryUsage()["render_surface"] >= (
+            image_width * image_height * 4
+        )
+
+    def test_engine_get_all_tank_pixel_observations(self):
+        config = tank_game.Config()
+        config.headless = True
+        engine = tank_game.Engine(config)
+
+        for position_x in (config.arenaWidth / 3, 2 * config.arenaWidth / 3):
+            tank_config = tank_game.TankConfig()
+            tank_config.positionX = position_x
+            tank_config.positionY = config.arenaHeight / 2
+            engine.addTank(tank_config)
+
+        pixel_observation_config = tank_game.PixelObservationConfig()
+        observations = engine.getAllTankPixelObservations(pixel_observation_config)
+        assert observations.shape == (2, 84, 84, 1)
+        assert observations.dtype == np.uint8
+
+        pixel_observation_config.grayscale = False
+        pixel_observation_config.egocentric = False
+        out = np.zeros((2, 84, 84, 3), dtype=np.uint8)
+        assert (
+            engine.getAllTankPixelObservations(pixel_observation_config, out=out) is out
+        )
+        np.testing.assert_array_equal(out[0], out[1])
+        assert engine.getMemoryUsage()["render_surface"] == 0
+
+        with pytest.raises(ValueError):
+            engine.getAllTankPixelObservations(
+                pixel_observation_config, out=np.zeros((2, 84, 84, 1), dtype=np.uint8)
+            )
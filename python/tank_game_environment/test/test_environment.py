@@ -1,6 +1,7 @@
 # Tank Game (@kennedyengineering)
 
 from .. import tank_game_environment_v0
+from ..env.tank_game_environment import TankGameEnvironment
 
 from pettingzoo.test import (
     parallel_api_test,
@@ -11,6 +12,7 @@ from pettingzoo.test import (
     performance_benchmark,
 )
 
+import numpy as np
 import pytest
 
 
@@ -21,6 +23,11 @@ class TestParallelEnvironment:
     def test_pettingzoo_parallel_seed(self):
         parallel_seed_test(tank_game_environment_v0.parallel_env_fn)
 
+    def test_pettingzoo_parallel_api_pixel_observations(self):
+        parallel_api_test(
+            tank_game_environment_v0.parallel_env_fn(observation_mode="pixel")
+        )
+
 
 class TestAECEnvironment:
     def test_pettingzoo_api(self):
@@ -34,3 +41,55 @@ class TestAECEnvironment:
 
     def test_pettingzoo_performance(self):
         performance_benchmark(tank_game_environment_v0.aec_env_fn())
+
+
+class TestEnvironmentReset:
+    def test_reset_reuses_engine(self, tmp_path):
+        env = TankGameEnvironment()
+
+        env.reset(seed=0)
+        engine = env.engine
+        env.step({a: env.action_space(a).sample() for a in env.agents})
+
+        # unseeded resets reset the engine in place, and match the new map
+        np.random.seed(1)
+        observations, _ = env.reset()
+        assert env.engine is engine
+        assert len(env.obstacle_ids) == len(set(env.obstacle_ids))
+
+        fresh_env = TankGameEnvironment()
+        fresh_observations, _ = fresh_env.reset(seed=1)
+        for agent in observations:
+            np.testing.assert_allclose(
+                observations[agent], fresh_observations[agent], atol=1e-6
+            )
+
+        # seeded resets rebuild the engine
+        env.reset(seed=2)
+        assert env.engine is not engine
+
+        # recording replays rebuilds the engine
+        env = TankGameEnvironment(replay_dir=str(tmp_path))
+        env.reset(seed=0)
+        engine = env.engine
+        env.reset()
+        assert env.engine is not engine
+
+
+class TestEnvironmentRules:
+    def test_rewards_and_truncation(self):
+        env = TankGameEnvironment()
+        env.metadata = env.metadata | {"max_timesteps": 5, "time_penalty": 2.0}
+        env.reset(seed=0)
+
+        # idle tanks only pay the time penalty
+        idle_actions = {a: np.zeros(3, dtype=np.float32) for a in env.agents}
+
+        for step in range(7):
+            _, rewards, terminations, truncations, _ = env.step(idle_actions)
+
+            assert rewards == pytest.approx({a: -2.0 for a in rewards})
+            assert not any(terminations.values())
+            assert all(truncations.values()) == (step == 6)
+
+        assert env.agents == []
@@ -0,0 +1,82 @@
+# Tank Game (@kennedyengineering)
+
+from ..env.tank_game_environment import TankGameEnvironment
+from ..env.tank_game_replay import load_replay, render_replay
+
+import numpy as np
+
+
+def play_episode(env, seed=None, options=None, actions=None):
+    """Play an episode (random actions, unless given), and return every step's observations."""
+
+    # observations are views into a buffer the env reuses, so copy them
+    observations, _ = env.reset(seed=seed, options=options)
+    history = [{a: o.copy() for a, o in observations.items()}]
+
+    step = 0
+    while env.agents:
+        if actions is None:
+            step_actions = {a: env.action_space(a).sample() for a in env.agents}
+        else:
+            step_actions = {
+                a: action
+                for a, action in zip(env.possible_agents, actions[step])
+                if a in env.agents and not np.isnan(action).any()
+            }
+        step += 1
+
+        observations, _, _, _, _ = env.step(step_actions)
+        history.append({a: o.copy() for a, o in observations.items()})
+
+    return history
+
+
+class TestReplay:
+    def test_replay_resimulation(self, tmp_path):
+        env = TankGameEnvironment(replay_dir=str(tmp_path))
+        env.metadata = env.metadata | {"max_timesteps": 50}
+        for agent in env.possible_agents:
+            env.action_space(agent).seed(0)
+
+        history = play_episode(env, seed=0)
+        env.close()
+
+        # one replay is written per episode
+        replay_paths = list(tmp_path.iterdir())
+        assert len(replay_paths) == 1
+
+        replay = load_replay(replay_paths[0])
+        assert replay.seed == 0
+        assert replay.metadata["metadata"]["max_timesteps"] == 50
+        assert replay.actions.shape == (len(history) - 1, 2, 3)
+
+        # re-simulating the replay reproduces every observation
+        env = TankGameEnvironment()
+        env.metadata = replay.metadata["metadata"]
+        replayed_history = play_episode(
+            env, options={"map_data": replay.map_data}, actions=replay.actions
+        )
+        env.close()
+
+        assert len(replayed_history) == len(history)
+        for observations, replayed_observations in zip(history, replayed_history):
+            for agent in observations:
+                np.testing.assert_array_equal(
+                    observations[agent], replayed_observations[agent]
+                )
+
+    def test_render_replay(self, tmp_path):
+        env = TankGameEnvironment(replay_dir=str(tmp_path))
+        env.metadata = env.metadata | {"max_timesteps": 10}
+        play_episode(env, seed=1)
+        env.close()
+
+        replay = load_replay(next(tmp_path.iterdir()))
+        frames = list(render_replay(replay, pixel_density=1.0, frame_skip=2))
+
+        assert len(frames) == 1 + len(replay.actions) // 2
+        assert frames[0].shape == (
+            replay.map_data.arena_map_data.height,
+            replay.map_data.arena_map_data.width,
+            3,
+        )
@@ -0,0 +1,91 @@
+# Tank Game (@kennedyengineering)
+
+from ..env.tank_game_viewer import HumanViewer
+
+import numpy as np
+import pytest
+import threading
+
+
+class RecordingClock:
+    """A display clock that records its ticks instead of waiting."""
+
+    def __init__(self):
+        self.ticks = []
+
+    def tick(self, fps):
+        self.ticks.append(fps)
+
+
+class SteppedTimer:
+    """A timer returning the given times, one per call."""
+
+    def __init__(self, times):
+        self.times = iter(times)
+
+    def __call__(self):
+        return next(self.times)
+
+
+def make_frame(i):
+    return np.full((48, 64, 3), i, dtype=np.uint8)
+
+
+class TestViewer:
+    def test_viewer_throttles(self):
+        clock = RecordingClock()
+        viewer = HumanViewer(64, 48, fps=10, throttle=True, clock=clock)
+
+        # every frame is presented, pacing the caller to the display rate
+        for i in range(5):
+            viewer.show(make_frame(i))
+
+        assert viewer.presented_frames == 5
+        assert viewer.dropped_frames == 0
+        assert clock.ticks == [10] * 5
+
+        viewer.close()
+
+    def test_viewer_drops_frames(self):
+        clock = RecordingClock()
+        timer = SteppedTimer([0.0, 0.125, 0.25, 0.375, 0.5])
+        viewer = HumanViewer(64, 48, fps=4, throttle=False, clock=clock, timer=timer)
+
+        # frames arriving before the next frame is due are dropped, without waiting
+        for i in range(5):
+            viewer.show(make_frame(i))
+
+        assert viewer.presented_frames == 3
+        assert viewer.dropped_frames == 2
+        assert clock.ticks == []
+
+        viewer.close()
+
+    def test_viewer_thread(self):
+        viewer = HumanViewer(64, 48, fps=10, clock=RecordingClock())
+        errors = []
+
+        def show_frame():
+            try:
+                viewer.show(make_frame(0))
+            except RuntimeError as error:
+                errors.append(error)
+
+        # the viewer rejects other threads
+        thread = threading.Thread(target=show_frame)
+        thread.start()
+        thread.join()
+
+        assert len(errors) == 1
+        assert "thread that created it" in str(errors[0])
+        assert viewer.presented_frames == 0
+
+        viewer.close()
+
+    def test_viewer_closed(self):
+        viewer = HumanViewer(64, 48, fps=10, clock=RecordingClock())
+        viewer.close()
+        viewer.close()
+
+        with pytest.raises(RuntimeError, match="closed"):
+            viewer.show(make_frame(0))
@@ -203,7 +203,7 @@ def eval(model_path, opponent_model_path, map_name):
         tank_game_environment_v1.env_fn,
         n_envs=1,
         seed=seed,
-        env_kwargs=dict(render_mode="human", map_id=map_name),
+        env_kwargs=dict(render_mode="human", map_id=map_name, throttle_render=False),
         vec_env_cls=TankVecEnv,
         vec_env_kwargs=dict(
             opponent_model=opponent_model,
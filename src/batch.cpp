@@ -0,0 +1,142 @@
+// Tank Game (@kennedyengineering)
+
+#include <algorithm>
+#include <stdexcept>
+
+#include "batch.hpp"
+#include "game_rules.hpp"
+
+using namespace TankGame;
+
+BatchEngine::BatchEngine(const Config &config, const BatchConfig &batchConfig)
+    : mConfig(config), mBatchConfig(batchConfig),
+      mThreadPool(batchConfig.threadCount) {
+  /* Create the batch of engines */
+
+  // Check input
+  if (mBatchConfig.engineCount == 0) {
+    throw std::invalid_argument("Batch must have at least one engine.");
+  }
+
+  // Create the engines
+  mEngineStates.resize(mBatchConfig.engineCount);
+
+  for (EngineState &state : mEngineStates) {
+    state.engine = std::make_shared<Engine>(mConfig);
+    state.engine->setGameRules(mBatchConfig.gameRulesConfig);
+  }
+}
+
+size_t BatchEngine::getEngineCount() {
+  /* Get the number of engines in the batch */
+
+  // Return engine count
+  return mEngineStates.size();
+}
+
+std::shared_ptr<Engine> BatchEngine::getEngine(size_t engineIndex) {
+  /* Get an engine (to add tanks and obstacles, or query state) */
+
+  // Return engine
+  return mEngineStates.at(engineIndex).engine;
+}
+
+void BatchEngine::resetEngine(size_t engineIndex) {
+  /* Reset an engine for a new episode, see Engine::reset
+     Note: tanks and obstacles are kept, use getEngine to change them
+  */
+
+  // Reset engine state
+  EngineState &state = mEngineStates.at(engineIndex);
+
+  state.engine->reset();
+  state.events.clear();
+}
+
+std::tuple<size_t, size_t, size_t> BatchEngine::getObservationDimensions() {
+  /* Get the dimensions of batched observations
+     (num_engines, num_tanks, observation_size)
+  */
+
+  // Every engine must produce the same observation dimensions
+  std::pair<size_t, size_t> dimensions =
+      mEngineStates.front().engine->getAllTankObservationsDimensions();
+
+  for (EngineState &state : mEngineStates) {
+    if (state.engine->getAllTankObservationsDimensions() != dimensions) {
+      throw std::runtime_error("Engines have differing observation sizes.");
+    }
+  }
+
+  // Return dimensions
+  return std::make_tuple(mEngineStates.size(), dimensions.first,
+                         dimensions.second);
+}
+
+void BatchEngine::step(const float *actions, float *observations,
+                       float *rewards, bool *dones) {
+  /* Apply actions, and step every engine forward in parallel
+     Input: actions of shape (num_engines, num_tanks, 3) in action space units
+     [left tread (% speed), right tread (% speed), fire gun (if positive)],
+     observation buffer of shape (num_engines, num_tanks, observation_size),
+     reward buffer of shape (num_engines, num_tanks), done buffer of shape
+     (num_engines)
+     Note: tank rows are ordered by ascending tank id within each engine
+  */
+
+  // Validate dimensions
+  auto [numEngines, numTanks, observationSize] = getObservationDimensions();
+
+  // Step engines across the worker threads
+  mThreadPool.parallelFor(
+      numEngines, 1,
+      [&, numTanks = numTanks, observationSize = observationSize](
+          size_t startIndex, size_t endIndex, unsigned int workerIndex) {
+        for (size_t engineIndex = startIndex; engineIndex < endIndex;
+             engineIndex++) {
+          stepEngine(engineIndex,
+                     actions + engineIndex * numTanks * Engine::ACTION_SIZE,
+                     observations + engineIndex * numTanks * observationSize,
+                     rewards + engineIndex * numTanks, dones + engineIndex);
+        }
+      });
+
+  // Gather collision events in engine order
+  mEvents.clear();
+
+  for (size_t engineIndex = 0; engineIndex < numEngines; engineIndex++) {
+    for (const auto &[categoryBits, srcId, hitId] :
+         mEngineStates[engineIndex].events) {
+      mEvents.push_back(BatchEvent{static_cast<unsigned int>(engineIndex),
+                                   categoryBits, srcId, hitId});
+    }
+  }
+}
+
+const std::vector<BatchEvent> &BatchEngine::getEvents() {
+  /* Get the collision events produced by the latest step */
+
+  // Return events
+  return mEvents;
+}
+
+void BatchEngine::stepEngine(size_t engineIndex, const float *actions,
+                             float *observations, float *rewards, bool *done) {
+  /* Apply actions to, and step forward, a single engine under its game rules
+   */
+
+  EngineState &state = mEngineStates[engineIndex];
+  Engine &engine = *state.engine;
+  GameRules &gameRules = engine.getGameRules();
+
+  // Step the game (rewards, reload counters and done flags are handled
+  // natively)
+  state.events = engine.stepGame(actions, rewards);
+
+  *done = gameRules.isTerminated() || gameRules.isTruncated();
+
+  // Compute observations
+  engine.getAllTankObservations(mBatchConfig.observationConfig,
+                                gameRules.getReloadCounters().data(),
+                                observations);
+}
@@ -1,16 +1,66 @@
 // Tank Game (@kennedyengineering)
 
+#include <pybind11/gil_safe_call_once.h>
 #include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "batch.hpp"
 #include "engine.hpp"
+#include "game_rules.hpp"
 
 namespace py = pybind11;
 
+template <typename T>
+py::array_t<T> getOutputArray(const py::object &out,
+                              const std::vector<py::ssize_t> &shape) {
+  /* Allocate an output array, or validate a caller-provided one
+     Note: a provided array is written to in place, so it must match the
+     dtype and shape exactly and be C-contiguous and writeable
+  */
+
+  // Allocate a new array
+  if (out.is_none()) {
+    return py::array_t<T>(shape);
+  }
+
+  // Validate the provided array
+  if (!py::isinstance<py::array>(out)) {
+    throw py::type_error("Output must be a numpy array.");
+  }
+
+  py::array array = py::reinterpret_borrow<py::array>(out);
+
+  if (!array.dtype().is(py::dtype::of<T>())) {
+    throw py::type_error("Output array has an incorrect dtype.");
+  }
+
+  if (!(array.flags() & py::array::c_style) || !array.writeable()) {
+    throw py::value_error("Output array must be C-contiguous and writeable.");
+  }
+
+  if (std::vector<py::ssize_t>(array.shape(), array.shape() + array.ndim()) !=
+      shape) {
+    throw py::value_error("Output array has an incorrect shape.");
+  }
+
+  return py::reinterpret_borrow<py::array_t<T>>(array);
+}
+
 PYBIND11_MODULE(python_bindings, handle) {
   handle.doc() = "Tank Game Python Bindings";
 
+  // Column names of getAllTankStates
+  handle.attr("TANK_STATE_FIELDS") =
+      py::make_tuple("position_x", "position_y", "orientation",
+                     "world_velocity_x", "world_velocity_y", "local_velocity_x",
+                     "local_velocity_y", "angular_velocity", "gun_angle");
+
+  PYBIND11_NUMPY_DTYPE_EX(TankGame::CollisionEvent, categoryBits, "category",
+                          srcId, "src_id", hitId, "hit_id");
+  PYBIND11_NUMPY_DTYPE_EX(TankGame::LookaheadEvent, step, "step", categoryBits,
+                          "category", srcId, "src_id", hitId, "hit_id");
+
   py::enum_<TankGame::CategoryBits>(handle, "CategoryBits")
       .value("OBSTACLE", TankGame::CategoryBits::OBSTACLE)
       .value("PROJECTILE", TankGame::CategoryBits::PROJECTILE)
@@ -33,17 +83,88 @@ PYBIND11_MODULE(python_bindings, handle) {
       .def_readwrite("treadMaxSpeed", &TankGame::TankConfig::treadMaxSpeed)
       .def_readwrite("lidarPoints", &TankGame::TankConfig::lidarPoints)
       .def_readwrite("lidarRange", &TankGame::TankConfig::lidarRange)
+      .def_readwrite("lidarCulling", &TankGame::TankConfig::lidarCulling)
       .def_readwrite("lidarRadius", &TankGame::TankConfig::lidarRadius);
 
+  py::class_<TankGame::ObservationConfig>(handle, "ObservationConfig")
+      .def(py::init<>())
+      .def_readwrite("lidarRange", &TankGame::ObservationConfig::lidarRange)
+      .def_readwrite("velocityRange",
+                     &TankGame::ObservationConfig::velocityRange)
+      .def_readwrite("angularVelocityRange",
+                     &TankGame::ObservationConfig::angularVelocityRange)
+      .def_readwrite("reloadRange", &TankGame::ObservationConfig::reloadRange);
+
+  py::class_<TankGame::PixelObservationConfig>(handle, "PixelObservationConfig")
+      .def(py::init<>())
+      .def_readwrite("width", &TankGame::PixelObservationConfig::width)
+      .def_readwrite("height", &TankGame::PixelObservationConfig::height)
+      .def_readwrite("grayscale", &TankGame::PixelObservationConfig::grayscale)
+      .def_readwrite("egocentric",
+                     &TankGame::PixelObservationConfig::egocentric)
+      .def_readwrite("viewRange", &TankGame::PixelObservationConfig::viewRange);
+
+  py::class_<TankGame::GameRulesConfig>(handle, "GameRulesConfig")
+      .def(py::init<>())
+      .def_readwrite("reloadDelay", &TankGame::GameRulesConfig::reloadDelay)
+      .def_readwrite("maxTimesteps", &TankGame::GameRulesConfig::maxTimesteps)
+      .def_readwrite("velocityRange", &TankGame::GameRulesConfig::velocityRange)
+      .def_readwrite("timePenalty", &TankGame::GameRulesConfig::timePenalty)
+      .def_readwrite("speedReward", &TankGame::GameRulesConfig::speedReward)
+      .def_readwrite("lateralReward", &TankGame::GameRulesConfig::lateralReward)
+      .def_readwrite("hitReward", &TankGame::GameRulesConfig::hitReward);
+
+  py::class_<TankGame::GameRules>(handle, "GameRules")
+      .def("reset", &TankGame::GameRules::reset)
+      .def("getConfig", &TankGame::GameRules::getConfig)
+      .def("getReloadCounters",
+           [](TankGame::GameRules &self) {
+             // Copy reload counters into a numpy array
+             const std::vector<float> &reloadCounters =
+                 self.getReloadCounters();
+             return py::array_t<float>(
+                 static_cast<py::ssize_t>(reloadCounters.size()),
+                 reloadCounters.data());
+           })
+      .def("getTimestep", &TankGame::GameRules::getTimestep)
+      .def("isTerminated", &TankGame::GameRules::isTerminated)
+      .def("isTruncated", &TankGame::GameRules::isTruncated);
+
   py::class_<TankGame::Config>(handle, "Config")
       .def(py::init<>())
       .def_readwrite("arenaWidth", &TankGame::Config::arenaWidth)
       .def_readwrite("arenaHeight", &TankGame::Config::arenaHeight)
       .def_readwrite("pixelDensity", &TankGame::Config::pixelDensity)
+      .def_readwrite("headless", &TankGame::Config::headless)
+      .def_readwrite("workerCount", &TankGame::Config::workerCount)
+      .def_readwrite("analyticLidar", &TankGame::Config::analyticLidar)
       .def_readwrite("verboseOutput", &TankGame::Config::verboseOutput);
 
-  py::class_<TankGame::Engine>(handle, "Engine")
+  // Note: long-running methods release the GIL, see Engine for the
+  // thread-safety contract
+  py::class_<TankGame::Engine, std::shared_ptr<TankGame::Engine>>(handle,
+                                                                  "Engine")
       .def(py::init<const TankGame::Config &>())
+      /* Reset */
+      .def("reset", &TankGame::Engine::reset)
+      .def("resetTank", &TankGame::Engine::resetTank)
+      .def("updateObstacles", &TankGame::Engine::updateObstacles)
+      /* Snapshot & Restore */
+      .def("saveState",
+           [](TankGame::Engine &self) {
+             // Return the state as bytes (which pickle cheaply)
+             std::vector<unsigned char> state = self.saveState();
+             return py::bytes(reinterpret_cast<const char *>(state.data()),
+                              state.size());
+           })
+      .def(
+          "restoreState",
+          [](TankGame::Engine &self, const py::bytes &state) {
+            std::string_view stateView = state;
+            self.restoreState(
+                std::vector<unsigned char>(stateView.begin(), stateView.end()));
+          },
+          py::arg("state"))
       /* Add & Remove Obstacles */
       .def("addObstacle", &TankGame::Engine::addObstacle)
       .def("removeObstacle", &TankGame::Engine::removeObstacle)
@@ -55,15 +176,158 @@ PYBIND11_MODULE(python_bindings, handle) {
       .def("fireTankGun", &TankGame::Engine::fireTankGun)
       .def("moveLeftTankTread", &TankGame::Engine::moveLeftTankTread)
       .def("moveRightTankTread", &TankGame::Engine::moveRightTankTread)
+      .def(
+          "applyActions",
+          [](TankGame::Engine &self,
+             py::array_t<float, py::array::c_style | py::array::forcecast>
+                 actions,
+             py::object reloadCounters, float reloadDelay) {
+            // Get action dimensions
+            auto [numTanks, actionSize] = self.getActionsDimensions();
+
+            // Validate actions
+            if (actions.ndim() != 2 ||
+                actions.shape(0) != static_cast<py::ssize_t>(numTanks) ||
+                actions.shape(1) != static_cast<py::ssize_t>(actionSize)) {
+              throw py::value_error(
+                  "Expected actions of shape (num_tanks, 3).");
+            }
+
+            // Validate reload counters (which are updated in place)
+            if (reloadCounters.is_none()) {
+              throw py::type_error("Reload counters must be a numpy array.");
+            }
+
+            py::array_t<float> reloadArray = getOutputArray<float>(
+                reloadCounters, {static_cast<py::ssize_t>(numTanks)});
+
+            // Apply actions (without holding the GIL)
+            const float *actionBuffer = actions.data();
+            float *reloadBuffer = reloadArray.mutable_data();
+            {
+              py::gil_scoped_release release;
+              self.applyActions(actionBuffer, reloadBuffer, reloadDelay);
+            }
+          },
+          py::arg("actions"), py::arg("reloadCounters"), py::arg("reloadDelay"))
       /* Tank Sensors */
       .def("scanTankLidar",
            [](TankGame::Engine &self, TankGame::RegistryId tankId) {
-             // Get scan data
-             std::vector<float> scanData = self.scanTankLidar(tankId);
+             // Get scan data (without holding the GIL)
+             std::vector<float> scanData;
+             {
+               py::gil_scoped_release release;
+               scanData = self.scanTankLidar(tankId);
+             }
 
              // Return numpy array
              return py::array_t<float>(scanData.size(), scanData.data());
            })
+      .def(
+          "scanAllTanksLidar",
+          [](TankGame::Engine &self, py::object out) {
+            // Get scan dimensions
+            auto [numTanks, lidarPoints] = self.getAllTanksLidarDimensions();
+
+            // Get output array
+            py::array_t<float> scanData = getOutputArray<float>(
+                out, {static_cast<py::ssize_t>(numTanks),
+                      static_cast<py::ssize_t>(lidarPoints)});
+
+            // Scan directly into numpy array (without holding the GIL)
+            float *scanBuffer = scanData.mutable_data();
+            {
+              py::gil_scoped_release release;
+              self.scanAllTanksLidar(scanBuffer);
+            }
+
+            return scanData;
+          },
+          py::arg("out") = py::none())
+      .def("getTankIds", &TankGame::Engine::getTankIds)
+      .def(
+          "getAllTankObservations",
+          [](TankGame::Engine &self,
+             const TankGame::ObservationConfig &observationConfig,
+             py::array_t<float, py::array::c_style | py::array::forcecast>
+                 reloadCounters,
+             py::object out) {
+            // Get observation dimensions
+            auto [numTanks, observationSize] =
+                self.getAllTankObservationsDimensions();
+
+            // Validate reload counters
+            if (reloadCounters.ndim() != 1 ||
+                reloadCounters.shape(0) != static_cast<py::ssize_t>(numTanks)) {
+              throw py::value_error("Expected one reload counter per tank.");
+            }
+
+            // Get output array
+            py::array_t<float> observations = getOutputArray<float>(
+                out, {static_cast<py::ssize_t>(numTanks),
+                      static_cast<py::ssize_t>(observationSize)});
+
+            // Compute observations directly into numpy array (without
+            // holding the GIL)
+            const float *reloadBuffer = reloadCounters.data();
+            float *observationBuffer = observations.mutable_data();
+            {
+              py::gil_scoped_release release;
+              self.getAllTankObservations(observationConfig, reloadBuffer,
+                                          observationBuffer);
+            }
+
+            return observations;
+          },
+          py::arg("observationConfig"), py::arg("reloadCounters"),
+          py::arg("out") = py::none())
+      .def(
+          "getAllTankStates",
+          [](TankGame::Engine &self, py::object out) {
+            // Get state dimensions
+            auto [numTanks, stateSize] = self.getAllTankStatesDimensions();
+
+            // Get output array
+            py::array_t<float> states = getOutputArray<float>(
+                out, {static_cast<py::ssize_t>(numTanks),
+                      static_cast<py::ssize_t>(stateSize)});
+
+            // Write states directly into numpy array
+            self.getAllTankStates(states.mutable_data());
+
+            return states;
+          },
+          py::arg("out") = py::none())
+      .def(
+          "getAllTankPixelObservations",
+          [](TankGame::Engine &self,
+             const TankGame::PixelObservationConfig &pixelObservationConfig,
+             py::object out) {
+            // Get observation dimensions
+            auto [numTanks, height, width, channels] =
+                self.getAllTankPixelObservationsDimensions(
+                    pixelObservationConfig);
+
+            // Get output array
+            py::array_t<unsigned char> observations =
+                getOutputArray<unsigned char>(
+                    out, {static_cast<py::ssize_t>(numTanks),
+                          static_cast<py::ssize_t>(height),
+                          static_cast<py::ssize_t>(width),
+                          static_cast<py::ssize_t>(channels)});
+
+            // Render observations directly into numpy array (without
+            // holding the GIL)
+            unsigned char *pixelBuffer = observations.mutable_data();
+            {
+              py::gil_scoped_release release;
+              self.getAllTankPixelObservations(pixelObservationConfig,
+                                               pixelBuffer);
+            }
+
+            return observations;
+          },
+          py::arg("pixelObservationConfig"), py::arg("out") = py::none())
       .def("getTankGunAngle", &TankGame::Engine::getTankGunAngle)
       .def("getTankPosition", &TankGame::Engine::getTankPosition)
       .def("getTankOrientation", &TankGame::Engine::getTankOrientation)
@@ -71,28 +335,265 @@ PYBIND11_MODULE(python_bindings, handle) {
       .def("getTankLocalVelocity", &TankGame::Engine::getTankLocalVelocity)
       .def("getTankAngularVelocity", &TankGame::Engine::getTankAngularVelocity)
       /* Obstacle Rendering */
-      .def("renderObstacle", &TankGame::Engine::renderObstacle)
+      .def("renderObstacle", &TankGame::Engine::renderObstacle,
+           py::call_guard<py::gil_scoped_release>())
       /* Tank Rendering */
-      .def("renderProjectiles", &TankGame::Engine::renderProjectiles)
-      .def("renderTank", &TankGame::Engine::renderTank)
-      .def("renderTankLidar", &TankGame::Engine::renderTankLidar)
+      .def("renderProjectiles", &TankGame::Engine::renderProjectiles,
+           py::call_guard<py::gil_scoped_release>())
+      .def("renderTank", &TankGame::Engine::renderTank,
+           py::call_guard<py::gil_scoped_release>())
+      .def("renderTankLidar", &TankGame::Engine::renderTankLidar,
+           py::call_guard<py::gil_scoped_release>())
+      /* Scene Rendering */
+      .def("renderScene", py::overload_cast<>(&TankGame::Engine::renderScene),
+           py::call_guard<py::gil_scoped_release>())
+      .def("renderScene",
+           py::overload_cast<const std::vector<TankGame::RegistryId> &>(
+               &TankGame::Engine::renderScene),
+           py::arg("tankIds"), py::call_guard<py::gil_scoped_release>())
       /* Image Handling */
-      .def("clearImage", &TankGame::Engine::clearImage)
+      .def("clearImage", &TankGame::Engine::clearImage,
+           py::call_guard<py::gil_scoped_release>())
       .def("getImageDimensions", &TankGame::Engine::getImageDimensions)
       .def("getImageChannels", &TankGame::Engine::getImageChannels)
-      .def("getImageBuffer",
-           [](TankGame::Engine &self) {
+      .def(
+          "getImageBuffer",
+          [](TankGame::Engine &self, py::object out) {
+            // Get image dimensions
+            auto [imageWidth, imageHeight] = self.getImageDimensions();
+            int imageChannels = self.getImageChannels();
+
+            // Get output array
+            py::array_t<unsigned char> imageBuffer =
+                getOutputArray<unsigned char>(
+                    out, {imageHeight, imageWidth, imageChannels});
+
+            // Convert image directly into the array (without holding the GIL)
+            unsigned char *buffer = imageBuffer.mutable_data();
+            {
+              py::gil_scoped_release release;
+              self.copyImageToRGB(buffer);
+            }
+
+            // Return numpy array
+            return imageBuffer;
+          },
+          py::arg("out") = py::none())
+      .def("getImageView",
+           [](std::shared_ptr<TankGame::Engine> self) {
              // Get image dimensions
-             auto [imageWidth, imageHeight] = self.getImageDimensions();
-             int imageChannels = self.getImageChannels();
+             auto [imageWidth, imageHeight] = self->getImageDimensions();
+             py::ssize_t imageStride = self->getImageStride();
 
-             // Get image buffer
-             std::vector<unsigned char> imageBuffer = self.getImageBuffer();
+             // Wrap the surface memory as a read-only (H, W, 4) BGRX view,
+             // which keeps the engine alive
+             py::array_t<unsigned char> imageView(
+                 {static_cast<py::ssize_t>(imageHeight),
+                  static_cast<py::ssize_t>(imageWidth),
+                  static_cast<py::ssize_t>(4)},
+                 {imageStride, static_cast<py::ssize_t>(4),
+                  static_cast<py::ssize_t>(1)},
+                 self->getImageData(), py::cast(self));
+             imageView.attr("flags").attr("writeable") = false;
 
-             // Return numpy array
-             return py::array_t<unsigned char>(
-                 {imageHeight, imageWidth, imageChannels}, imageBuffer.data());
+             return imageView;
            })
+      /* Diagnostics */
+      .def("getMemoryUsage", &TankGame::Engine::getMemoryUsage)
       /* Simulation Step */
-      .def("step", &TankGame::Engine::step);
+      .def(
+          "step",
+          [](TankGame::Engine &self, uint32_t categoryMask, bool unique) {
+            // Step the engine (without holding the GIL)
+            const std::vector<TankGame::CollisionEvent> *eventVector;
+            {
+              py::gil_scoped_release release;
+              eventVector = &self.step(categoryMask, unique);
+            }
+
+            // Share one read-only empty array across steps without events
+            if (eventVector->empty()) {
+              PYBIND11_CONSTINIT static py::gil_safe_call_once_and_store<
+                  py::array_t<TankGame::CollisionEvent>>
+                  emptyEvents;
+
+              return emptyEvents
+                  .call_once_and_store_result([]() {
+                    py::array_t<TankGame::CollisionEvent> events(0);
+                    events.attr("flags").attr("writeable") = false;
+                    return events;
+                  })
+                  .get_stored();
+            }
+
+            // Copy events into a structured array of (category, src_id,
+            // hit_id)
+            return py::array_t<TankGame::CollisionEvent>(
+                static_cast<py::ssize_t>(eventVector->size()),
+                eventVector->data());
+          },
+          py::arg("categoryMask") =
+              static_cast<uint32_t>(TankGame::CategoryBits::ALL),
+          py::arg("unique") = false)
+      /* Lookahead */
+      .def(
+          "simulateLookahead",
+          [](TankGame::Engine &self,
+             py::array_t<float, py::array::c_style | py::array::forcecast>
+                 actions) {
+            // Get dimensions
+            auto [numTanks, actionSize] = self.getActionsDimensions();
+            size_t stateSize = self.getAllTankStatesDimensions().second;
+
+            // Validate actions
+            if (actions.ndim() != 3 ||
+                actions.shape(1) != static_cast<py::ssize_t>(numTanks) ||
+                actions.shape(2) != static_cast<py::ssize_t>(actionSize)) {
+              throw py::value_error(
+                  "Expected actions of shape (num_steps, num_tanks, 3).");
+            }
+
+            py::ssize_t numSteps = actions.shape(0);
+
+            // Build the scratch engine (while holding the GIL, as it may
+            // create a physics world)
+            self.prepareLookahead();
+
+            // Simulate into numpy arrays (without holding the GIL)
+            py::array_t<float> states({numSteps,
+                                       static_cast<py::ssize_t>(numTanks),
+                                       static_cast<py::ssize_t>(stateSize)});
+            py::array_t<float> rewards(
+                {numSteps, static_cast<py::ssize_t>(numTanks)});
+
+            const float *actionBuffer = actions.data();
+            float *stateBuffer = states.mutable_data();
+            float *rewardBuffer = rewards.mutable_data();
+            const std::vector<TankGame::LookaheadEvent> *eventVector;
+            {
+              py::gil_scoped_release release;
+              eventVector = &self.simulateLookahead(actionBuffer, numSteps,
+                                                    stateBuffer, rewardBuffer);
+            }
+
+            // Copy events into a structured array of (step, category,
+            // src_id, hit_id)
+            py::array_t<TankGame::LookaheadEvent> events(
+                static_cast<py::ssize_t>(eventVector->size()),
+                eventVector->data());
+
+            return py::make_tuple(states, rewards, events);
+          },
+          py::arg("actions"))
+      /* Game Rules */
+      .def("setGameRules", &TankGame::Engine::setGameRules)
+      .def("getGameRules", &TankGame::Engine::getGameRules,
+           py::return_value_policy::reference_internal)
+      .def(
+          "stepGame",
+          [](TankGame::Engine &self,
+             py::array_t<float, py::array::c_style | py::array::forcecast>
+                 actions,
+             py::object out) {
+            // Get action dimensions
+            auto [numTanks, actionSize] = self.getActionsDimensions();
+
+            // Validate actions
+            if (actions.ndim() != 2 ||
+                actions.shape(0) != static_cast<py::ssize_t>(numTanks) ||
+                actions.shape(1) != static_cast<py::ssize_t>(actionSize)) {
+              throw py::value_error(
+                  "Expected actions of shape (num_tanks, 3).");
+            }
+
+            // Get output array
+            py::array_t<float> rewards = getOutputArray<float>(
+                out, {static_cast<py::ssize_t>(numTanks)});
+
+            // Step the game (without holding the GIL)
+            const float *actionBuffer = actions.data();
+            float *rewardBuffer = rewards.mutable_data();
+            TankGame::GameRules &gameRules = self.getGameRules();
+            {
+              py::gil_scoped_release release;
+              self.stepGame(actionBuffer, rewardBuffer);
+            }
+
+            return py::make_tuple(rewards, gameRules.isTerminated(),
+                                  gameRules.isTruncated());
+          },
+          py::arg("actions"), py::arg("out") = py::none());
+
+  py::class_<TankGame::BatchConfig>(handle, "BatchConfig")
+      .def(py::init<>())
+      .def_readwrite("engineCount", &TankGame::BatchConfig::engineCount)
+      .def_readwrite("threadCount", &TankGame::BatchConfig::threadCount)
+      .def_readwrite("gameRulesConfig", &TankGame::BatchConfig::gameRulesConfig)
+      .def_readwrite("observationConfig",
+                     &TankGame::BatchConfig::observationConfig);
+
+  py::class_<TankGame::BatchEngine>(handle, "BatchEngine")
+      .def(py::init<const TankGame::Config &, const TankGame::BatchConfig &>())
+      /* Engine Access */
+      .def("getEngineCount", &TankGame::BatchEngine::getEngineCount)
+      .def("getEngine", &TankGame::BatchEngine::getEngine)
+      .def("resetEngine", &TankGame::BatchEngine::resetEngine)
+      /* Simulation Step */
+      .def(
+          "step",
+          [](TankGame::BatchEngine &self,
+             py::array_t<float, py::array::c_style | py::array::forcecast>
+                 actions,
+             py::object out) {
+            // Get batch dimensions
+            auto [numEngines, numTanks, observationSize] =
+                self.getObservationDimensions();
+
+            // Validate actions
+            if (actions.ndim() != 3 ||
+                actions.shape(0) != static_cast<py::ssize_t>(numEngines) ||
+                actions.shape(1) != static_cast<py::ssize_t>(numTanks) ||
+                actions.shape(2) != 3) {
+              throw py::value_error(
+                  "Expected actions of shape (num_engines, num_tanks, 3).");
+            }
+
+            // Get output arrays
+            py::array_t<float> observations = getOutputArray<float>(
+                out, {static_cast<py::ssize_t>(numEngines),
+                      static_cast<py::ssize_t>(numTanks),
+                      static_cast<py::ssize_t>(observationSize)});
+            py::array_t<float> rewards({static_cast<py::ssize_t>(numEngines),
+                                        static_cast<py::ssize_t>(numTanks)});
+            py::array_t<bool> dones(static_cast<py::ssize_t>(numEngines));
+
+            // Step all engines (without holding the GIL)
+            const float *actionBuffer = actions.data();
+            float *observationBuffer = observations.mutable_data();
+            float *rewardBuffer = rewards.mutable_data();
+            bool *doneBuffer = dones.mutable_data();
+            {
+              py::gil_scoped_release release;
+              self.step(actionBuffer, observationBuffer, rewardBuffer,
+                        doneBuffer);
+            }
+
+            // Convert events into rows of (engine, category, src, hit)
+            const std::vector<TankGame::BatchEvent> &eventVector =
+                self.getEvents();
+            py::array_t<uint32_t> events(
+                {static_cast<py::ssize_t>(eventVector.size()),
+                 static_cast<py::ssize_t>(4)});
+            auto eventView = events.mutable_unchecked<2>();
+
+            for (size_t i = 0; i < eventVector.size(); i++) {
+              eventView(i, 0) = eventVector[i].engineIndex;
+              eventView(i, 1) = eventVector[i].categoryBits;
+              eventView(i, 2) = eventVector[i].srcId;
+              eventView(i, 3) = eventVector[i].hitId;
+            }
+
+            return py::make_tuple(observations, events, dones, rewards);
+          },
+          py::arg("actions"), py::arg("out") = py::none());
 }
@@ -1,27 +1,85 @@
 // Tank Game (@kennedyengineering)
 
 #include <algorithm>
+#include <cmath>
+#include <cstring>
 #include <iostream>
+#include <map>
+#include <stdexcept>
 
 #include "categories.hpp"
 #include "engine.hpp"
+#include "game_rules.hpp"
 
 using namespace TankGame;
 
+// Number of projectile slots preallocated by each engine
+static constexpr uint32_t PROJECTILE_RESERVE = 64;
+
+// Header of engine state blobs ("TGS" and the format version)
+static constexpr uint32_t STATE_MAGIC = 0x54475301;
+
+template <typename T>
+static void writeState(std::vector<unsigned char> &state, const T &value) {
+  /* Append a value to an engine state blob */
+
+  const unsigned char *bytes = reinterpret_cast<const unsigned char *>(&value);
+  state.insert(state.end(), bytes, bytes + sizeof(T));
+}
+
+template <typename T>
+static T readState(const std::vector<unsigned char> &state, size_t &offset) {
+  /* Read the next value of an engine state blob */
+
+  if (offset + sizeof(T) > state.size()) {
+    throw std::invalid_argument("Engine state is truncated.");
+  }
+
+  T value;
+  std::memcpy(&value, state.data() + offset, sizeof(T));
+  offset += sizeof(T);
+
+  return value;
+}
+
 // TODO: check for valid config values
 // TODO: add option for adding noise to lidar readings
 
-Engine::Engine(const Config &config)
-    : mConfig(config),
-      mRenderEngine(std::ceil(config.arenaWidth * config.pixelDensity),
-                    std::ceil(config.arenaHeight * config.pixelDensity)) {
+Engine::Engine(const Config &config) : mConfig(config) {
   /* Create the engine */
 
+  // Initialize render engine (headless engines defer this to the first render)
+  if (!mConfig.headless) {
+    getRenderEngine();
+  }
+
   // Initialize box2d world
   b2WorldDef worldDef = b2DefaultWorldDef();
   worldDef.gravity = (b2Vec2){0.0f, 0.0f};
+
+  // Initialize box2d task system (one pool thread per solver worker, the pool
+  // is also used to split lidar scans)
+  if (mConfig.workerCount > 1) {
+    mThreadPool = std::make_unique<ThreadPool>(mConfig.workerCount);
+
+    worldDef.workerCount = mConfig.workerCount;
+    worldDef.enqueueTask = &Engine::enqueueTask;
+    worldDef.finishTask = &Engine::finishTask;
+    worldDef.userTaskContext = this;
+  }
+
   mWorldId = b2CreateWorld(&worldDef);
 
+  // Preallocate projectile slots and contact scratch buffers
+  mProjectileSlots.resize(PROJECTILE_RESERVE);
+  mFreeProjectileSlots.reserve(PROJECTILE_RESERVE);
+  mActiveProjectiles.reserve(PROJECTILE_RESERVE);
+  mProjectileContacts.reserve(PROJECTILE_RESERVE);
+
+  for (uint32_t slotIndex = PROJECTILE_RESERVE; slotIndex > 0; slotIndex--) {
+    mFreeProjectileSlots.push_back(slotIndex - 1);
+  }
+
   // Create arena boundaries
   b2BodyDef boundaryBodyDef = b2DefaultBodyDef();
   boundaryBodyDef.type = b2_staticBody;
@@ -36,21 +94,24 @@ Engine::Engine(const Config &config)
       mConfig.arenaWallThickness / 2.0f, mConfig.arenaHeight / 2.0f,
       (b2Vec2){-mConfig.arenaWallThickness / 2.0f, mConfig.arenaHeight / 2.0f},
       0); // left wall
-  b2CreatePolygonShape(boundaryBodyId, &boundaryShapeDef, &boundaryPolygon);
+  mWallShapeIds.push_back(b2CreatePolygonShape(
+      boundaryBodyId, &boundaryShapeDef, &boundaryPolygon));
 
   boundaryPolygon = b2MakeOffsetBox(
       mConfig.arenaWallThickness / 2.0f, mConfig.arenaHeight / 2.0f,
       (b2Vec2){mConfig.arenaWidth + mConfig.arenaWallThickness / 2.0f,
                mConfig.arenaHeight / 2.0f},
       0); // right wall
-  b2CreatePolygonShape(boundaryBodyId, &boundaryShapeDef, &boundaryPolygon);
+  mWallShapeIds.push_back(b2CreatePolygonShape(
+      boundaryBodyId, &boundaryShapeDef, &boundaryPolygon));
 
   boundaryPolygon = b2MakeOffsetBox(
       mConfig.arenaWidth / 2.0f + mConfig.arenaWallThickness,
       mConfig.arenaWallThickness / 2.0f,
       (b2Vec2){mConfig.arenaWidth / 2.0f, -mConfig.arenaWallThickness / 2.0f},
       0); // top wall
-  b2CreatePolygonShape(boundaryBodyId, &boundaryShapeDef, &boundaryPolygon);
+  mWallShapeIds.push_back(b2CreatePolygonShape(
+      boundaryBodyId, &boundaryShapeDef, &boundaryPolygon));
 
   boundaryPolygon = b2MakeOffsetBox(
       mConfig.arenaWidth / 2.0f + mConfig.arenaWallThickness,
@@ -58,107 +119,465 @@ Engine::Engine(const Config &config)
       (b2Vec2){mConfig.arenaWidth / 2.0f,
                mConfig.arenaHeight + mConfig.arenaWallThickness / 2.0f},
       0); // bottom wall
-  b2CreatePolygonShape(boundaryBodyId, &boundaryShapeDef, &boundaryPolygon);
+  mWallShapeIds.push_back(b2CreatePolygonShape(
+      boundaryBodyId, &boundaryShapeDef, &boundaryPolygon));
 }
 
 Engine::~Engine() {
   /* Destroy the engine */
 
-  // Deallocate userData from projectile shape
-  for (const b2ShapeId &projectileShapeId : mProjectileShapeIdVector) {
-    delete static_cast<TankId *>(b2Shape_GetUserData(projectileShapeId));
+  // Destroy the physics engine (and every projectile body)
+  b2DestroyWorld(mWorldId);
+}
+
+void Engine::reset() {
+  /* Clear dynamic state for a new episode, keeping the world and static
+     geometry (walls and obstacles)
+     Note: projectiles are destroyed, and tanks return to their spawn pose,
+     see resetTank to move them elsewhere
+  */
+
+  // Destroy projectiles
+  destroyProjectiles();
+
+  // Reset tanks
+  mTankRegistry.forEach([](RegistryId tankId, Tank &tank) { tank.reset(); });
+
+  // Reset game rules
+  if (mGameRules) {
+    mGameRules->reset();
   }
+}
 
-  // Destroy the physics engine
-  b2DestroyWorld(mWorldId);
+void Engine::resetTank(RegistryId tankId, const TankConfig &tankConfig) {
+  /* Move a tank to a new spawn pose, at rest
+     Note: only the pose (position and angle) is applied, other parameters
+     are kept
+  */
+
+  // Retrieve tank and apply method
+  mTankRegistry.getTagged(tankId).reset(tankConfig);
+}
+
+std::vector<RegistryId>
+Engine::updateObstacles(const std::vector<ObstacleConfig> &obstacleConfigs) {
+  /* Replace the obstacles with a new set, only adding and removing the
+     obstacles that differ
+     Returns the obstacle ids, in the order of the configs
+  */
+
+  // Define matching (identical configs are interchangeable)
+  auto isMatch = [](const ObstacleConfig &a, const ObstacleConfig &b) {
+    return a.positionX == b.positionX && a.positionY == b.positionY &&
+           a.radius == b.radius && a.color == b.color;
+  };
+
+  // Match existing obstacles to the new configs
+  std::vector<RegistryId> obstacleIds(obstacleConfigs.size());
+  std::vector<bool> matched(obstacleConfigs.size(), false);
+  std::vector<RegistryId> unmatchedIds;
+
+  mObstacleRegistry.forEach([&](RegistryId obstacleId, Obstacle &obstacle) {
+    for (size_t configNum = 0; configNum < obstacleConfigs.size();
+         configNum++) {
+      if (!matched[configNum] &&
+          isMatch(obstacle.getConfig(), obstacleConfigs[configNum])) {
+        obstacleIds[configNum] = mObstacleRegistry.getTaggedId(obstacleId);
+        matched[configNum] = true;
+        return;
+      }
+    }
+
+    unmatchedIds.push_back(obstacleId);
+  });
+
+  // Remove obstacles that are no longer present
+  for (RegistryId obstacleId : unmatchedIds) {
+    mObstacleRegistry.remove(obstacleId);
+  }
+
+  if (!unmatchedIds.empty()) {
+    mBackgroundValid = false;
+    mLookaheadObstaclesValid = false;
+  }
+
+  // Add obstacles that are new
+  for (size_t configNum = 0; configNum < obstacleConfigs.size(); configNum++) {
+    if (!matched[configNum]) {
+      obstacleIds[configNum] = addObstacle(obstacleConfigs[configNum]);
+    }
+  }
+
+  // Return obstacle ids
+  return obstacleIds;
 }
 
 RegistryId Engine::addObstacle(const ObstacleConfig &obstacleConfig) {
   /* Add a obstacle */
 
+  // Invalidate the cached background and lookahead obstacles
+  mBackgroundValid = false;
+  mLookaheadObstaclesValid = false;
+
   // Create a new obstacle in registry with id as argument
-  return mObstacleRegistry.emplaceWithId(obstacleConfig, mWorldId);
+  return mObstacleRegistry.getTaggedId(
+      mObstacleRegistry.emplaceWithId(obstacleConfig, mWorldId));
 }
 
 void Engine::removeObstacle(RegistryId obstacleId) {
   /* Remove a obstacle */
-  mObstacleRegistry.remove(obstacleId);
+  mObstacleRegistry.removeTagged(obstacleId);
+
+  // Invalidate the cached background and lookahead obstacles
+  mBackgroundValid = false;
+  mLookaheadObstaclesValid = false;
 }
 
 RegistryId Engine::addTank(const TankConfig &tankConfig) {
   /* Add a tank */
 
+  // Invalidate the lookahead engine
+  mLookaheadValid = false;
+
   // Create a new tank in registry with id as argument
-  return mTankRegistry.emplaceWithId(tankConfig, mWorldId);
+  return mTankRegistry.getTaggedId(
+      mTankRegistry.emplaceWithId(tankConfig, mWorldId));
 }
 
 void Engine::removeTank(RegistryId tankId) {
   /* Remove a tank */
-  mTankRegistry.remove(tankId);
+  mTankRegistry.removeTagged(tankId);
+
+  // Invalidate the lookahead engine
+  mLookaheadValid = false;
 }
 
 void Engine::rotateTankGun(RegistryId tankId, float angle) {
   /* Rotate a tank gun */
 
   // Retrieve tank and apply method
-  mTankRegistry.get(tankId).rotateGun(angle);
+  mTankRegistry.getTagged(tankId).rotateGun(angle);
 }
 
 void Engine::fireTankGun(RegistryId tankId) {
   /* Fire a tank gun */
 
-  // Retrieve tank and apply method, track projectile shapeId
-  mProjectileShapeIdVector.push_back(mTankRegistry.get(tankId).fireGun());
+  // Retrieve tank
+  Tank &tank = mTankRegistry.getTagged(tankId);
+
+  // Apply method, the projectile shape user data points to its slot (which
+  // holds the tagged tank id)
+  ProjectileSlot &slot = acquireProjectileSlot(tankId);
+  slot.shapeId = tank.fireGun(&slot);
+}
+
+Engine::ProjectileSlot &Engine::acquireProjectileSlot(TankId sourceTankId) {
+  /* Acquire a projectile slot (growing the pool when exhausted), and mark it
+     active
+  */
+
+  if (mFreeProjectileSlots.empty()) {
+    mFreeProjectileSlots.push_back(mProjectileSlots.size());
+    mProjectileSlots.emplace_back();
+  }
+
+  uint32_t slotIndex = mFreeProjectileSlots.back();
+  mFreeProjectileSlots.pop_back();
+
+  ProjectileSlot &slot = mProjectileSlots[slotIndex];
+  slot.sourceTankId = sourceTankId;
+  slot.slotIndex = slotIndex;
+  slot.activeIndex = mActiveProjectiles.size();
+  mActiveProjectiles.push_back(slotIndex);
+
+  return slot;
 }
 
 void Engine::moveLeftTankTread(RegistryId tankId, float speed) {
   /* Move a tank left tread */
 
   // Retrieve tank and apply method
-  mTankRegistry.get(tankId).moveLeftTread(speed);
+  mTankRegistry.getTagged(tankId).moveLeftTread(speed);
 }
 
 void Engine::moveRightTankTread(RegistryId tankId, float speed) {
   /* Move a tank right tread */
 
   // Retrieve tank and apply method
-  mTankRegistry.get(tankId).moveRightTread(speed);
+  mTankRegistry.getTagged(tankId).moveRightTread(speed);
+}
+
+void Engine::applyActions(const float *actions, float *reloadCounters,
+                          float reloadDelay) {
+  /* Apply an action to every tank, and advance the reload counters
+     Input: actions of shape (num_tanks, 3) in action space units [left tread
+     (% speed), right tread (% speed), fire gun (if positive)], reload counter
+     of each tank (in steps), reload delay (in steps)
+     Note: rows are ordered by ascending tank id, see getTankIds
+     Note: rows holding a NaN are skipped (the tank keeps its previous tread
+     speeds), a tank only fires when its reload counter is 0
+  */
+
+  // Apply each row of actions
+  const float *action = actions;
+  float *reloadCounter = reloadCounters;
+
+  mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+    if (!std::isnan(action[0]) && !std::isnan(action[1]) &&
+        !std::isnan(action[2])) {
+      // Scale tread speeds from action space units
+      float treadMaxSpeed = tank.getTreadMaxSpeed();
+
+      tank.moveLeftTread(std::clamp(action[0], -1.0f, 1.0f) * treadMaxSpeed);
+      tank.moveRightTread(std::clamp(action[1], -1.0f, 1.0f) * treadMaxSpeed);
+
+      // Fire when reloaded
+      if (action[2] > 0.0f && *reloadCounter == 0.0f) {
+        fireTankGun(mTankRegistry.getTaggedId(tankId));
+      }
+    }
+
+    // Handle reload counter
+    if (*reloadCounter == 0.0f) {
+      *reloadCounter = reloadDelay;
+    } else {
+      *reloadCounter -= 1.0f;
+    }
+
+    action += ACTION_SIZE;
+    reloadCounter++;
+  });
+}
+
+std::pair<size_t, size_t> Engine::getActionsDimensions() {
+  /* Get the dimensions of batched actions (num_tanks, 3) */
+
+  // Return dimensions
+  return std::make_pair(mTankRegistry.size(), ACTION_SIZE);
 }
 
 std::vector<float> Engine::scanTankLidar(RegistryId tankId) {
   /* Scan a tank lidar, and get vector of distances */
 
   // Get the tank
-  Tank &tank = mTankRegistry.get(tankId);
+  Tank &tank = mTankRegistry.getTagged(tankId);
 
   // Get tank body position
   b2Vec2 position = tank.getPosition();
 
   // Perform a lidar scan
-  tank.scanLidar();
+  tank.scanLidar(mThreadPool.get(), updateRayCastScene());
 
   // Populate the vector
-  std::vector<float> lidarData;
+  const std::vector<b2Vec2> &lidarPoints = tank.getLidarData();
+  std::vector<float> lidarData(lidarPoints.size());
 
-  for (const b2Vec2 &point : tank.getLidarData()) {
-    lidarData.push_back(b2Distance(position, point));
+  for (size_t pointNum = 0; pointNum < lidarPoints.size(); pointNum++) {
+    lidarData[pointNum] = b2Distance(position, lidarPoints[pointNum]);
   }
 
   // Return the vector
   return lidarData;
 }
 
+void Engine::scanAllTanksLidar(float *lidarBuffer) {
+  /* Scan every tank lidar, and write distances into a buffer
+     Input: buffer of shape (num_tanks, lidar_points), see
+     getAllTanksLidarDimensions
+     Note: rows are ordered by ascending tank id, see getTankIds
+  */
+
+  // Validate dimensions
+  size_t lidarPoints = getAllTanksLidarDimensions().second;
+
+  // Scan each tank directly into its row of the buffer
+  const RayCastScene *rayCastScene = updateRayCastScene();
+  float *row = lidarBuffer;
+
+  mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+    // Get tank body position
+    b2Vec2 position = tank.getPosition();
+
+    // Perform a lidar scan
+    tank.scanLidar(mThreadPool.get(), rayCastScene);
+
+    // Populate the row
+    const std::vector<b2Vec2> &lidarData = tank.getLidarData();
+
+    for (size_t pointNum = 0; pointNum < lidarPoints; pointNum++) {
+      row[pointNum] = b2Distance(position, lidarData[pointNum]);
+    }
+
+    row += lidarPoints;
+  });
+}
+
+std::pair<size_t, size_t> Engine::getAllTanksLidarDimensions() {
+  /* Get the dimensions of a batched lidar scan (num_tanks, lidar_points) */
+
+  // Every tank must produce the same number of points
+  size_t lidarPoints = 0;
+  bool first = true;
+
+  mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+    if (first) {
+      lidarPoints = tank.getLidarPoints();
+      first = false;
+    } else if (lidarPoints != tank.getLidarPoints()) {
+      throw std::runtime_error("Tanks have differing lidar point counts.");
+    }
+  });
+
+  // Return dimensions
+  return std::make_pair(mTankRegistry.size(), lidarPoints);
+}
+
+void Engine::getAllTankObservations(const ObservationConfig &observationConfig,
+                                    const float *reloadCounters,
+                                    float *observationBuffer) {
+  /* Scan every tank and write normalized observations into a buffer
+     Input: reload counter of each tank (in steps), buffer of shape
+     (num_tanks, lidar_points + 4), see getAllTankObservationsDimensions
+     Note: rows are ordered by ascending tank id, see getTankIds
+     Note: each row holds [lidar (% range), local velocity X (% range), local
+     velocity Y (% range), angular velocity (% range), reload counter (%
+     range)], values are clipped to their range since the simulator may
+     briefly exceed them
+  */
+
+  // Validate dimensions
+  auto [numTanks, observationSize] = getAllTankObservationsDimensions();
+  size_t lidarPoints = observationSize - 4;
+
+  // Compute normalization factors
+  float lidarScale = 1.0f / observationConfig.lidarRange;
+  double velocityRange = observationConfig.velocityRange;
+  double angularVelocityRange = observationConfig.angularVelocityRange;
+  double reloadRange = std::max(observationConfig.reloadRange, 1.0f);
+
+  // Populate each row of the buffer
+  const RayCastScene *rayCastScene = updateRayCastScene();
+  float *row = observationBuffer;
+  const float *reloadCounter = reloadCounters;
+
+  mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+    // Perform a lidar scan
+    b2Vec2 position = tank.getPosition();
+    tank.scanLidar(mThreadPool.get(), rayCastScene);
+
+    // Normalize lidar distances between 0.0 and 1.0
+    const std::vector<b2Vec2> &lidarData = tank.getLidarData();
+
+    for (size_t pointNum = 0; pointNum < lidarPoints; pointNum++) {
+      float distance = std::clamp(b2Distance(position, lidarData[pointNum]),
+                                  0.0f, observationConfig.lidarRange);
+      row[pointNum] = distance * lidarScale;
+    }
+
+    // Normalize velocities between -1.0 and 1.0
+    b2Vec2 velocity = tank.getLocalVelocity();
+    float angularVelocity = tank.getAngularVelocity();
+
+    row[lidarPoints] =
+        std::clamp<double>(velocity.x, -velocityRange, velocityRange) /
+        velocityRange;
+    row[lidarPoints + 1] =
+        std::clamp<double>(velocity.y, -velocityRange, velocityRange) /
+        velocityRange;
+    row[lidarPoints + 2] =
+        std::clamp<double>(angularVelocity, -angularVelocityRange,
+                           angularVelocityRange) /
+        angularVelocityRange;
+
+    // Normalize reload counter between 0.0 and 1.0
+    row[lidarPoints + 3] =
+        std::clamp<double>(*reloadCounter, 0.0, reloadRange) / reloadRange;
+
+    row += observationSize;
+    reloadCounter++;
+  });
+}
+
+std::pair<size_t, size_t> Engine::getAllTankObservationsDimensions() {
+  /* Get the dimensions of batched observations (num_tanks, lidar_points + 4)
+   */
+
+  // Lidar points followed by velocity, angular velocity and reload counter
+  auto [numTanks, lidarPoints] = getAllTanksLidarDimensions();
+
+  // Return dimensions
+  return std::make_pair(numTanks, lidarPoints + 4);
+}
+
+void Engine::getAllTankStates(float *stateBuffer) {
+  /* Write the state of every tank into a buffer
+     Input: buffer of shape (num_tanks, 9), see getAllTankStatesDimensions
+     Note: rows are ordered by ascending tank id, see getTankIds
+     Note: each row holds [position X, position Y (in meters), orientation (in
+     radians), world velocity X, world velocity Y, local velocity X, local
+     velocity Y (in meters per second), angular velocity (in radians per
+     second), gun angle (in radians)]
+  */
+
+  // Get dimensions
+  size_t stateSize = getAllTankStatesDimensions().second;
+
+  // Populate each row of the buffer
+  float *row = stateBuffer;
+
+  mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+    b2Vec2 position = tank.getPosition();
+    b2Vec2 worldVelocity = tank.getWorldVelocity();
+    b2Vec2 localVelocity = tank.getLocalVelocity();
+
+    row[0] = position.x;
+    row[1] = position.y;
+    row[2] = tank.getOrientation();
+    row[3] = worldVelocity.x;
+    row[4] = worldVelocity.y;
+    row[5] = localVelocity.x;
+    row[6] = localVelocity.y;
+    row[7] = tank.getAngularVelocity();
+    row[8] = tank.getGunAngle();
+
+    row += stateSize;
+  });
+}
+
+std::pair<size_t, size_t> Engine::getAllTankStatesDimensions() {
+  /* Get the dimensions of batched tank states (num_tanks, 9) */
+
+  // Position, orientation, world and local velocity, angular velocity and gun
+  // angle
+  return std::make_pair(mTankRegistry.size(), static_cast<size_t>(9));
+}
+
+std::vector<RegistryId> Engine::getTankIds() {
+  /* Get the (tagged) ids of all tanks, in ascending slot order
+     Note: tagged ids are only numerically ascending until a slot is reused
+  */
+
+  // Return ids
+  std::vector<RegistryId> tankIds = mTankRegistry.getIds();
+
+  for (RegistryId &tankId : tankIds) {
+    tankId = mTankRegistry.getTaggedId(tankId);
+  }
+
+  return tankIds;
+}
+
 float Engine::getTankGunAngle(RegistryId tankId) {
   /* Get the current angle of a tank gun */
 
   // Return angle (in radians)
-  return mTankRegistry.get(tankId).getGunAngle();
+  return mTankRegistry.getTagged(tankId).getGunAngle();
 }
 
 std::pair<float, float> Engine::getTankPosition(RegistryId tankId) {
   /* Get the current position of a tank */
 
-  b2Vec2 position = mTankRegistry.get(tankId).getPosition();
+  b2Vec2 position = mTankRegistry.getTagged(tankId).getPosition();
 
   // Return position (in meters)
   return std::make_pair(position.x, position.y);
@@ -168,13 +587,13 @@ float Engine::getTankOrientation(RegistryId tankId) {
   /* Get the current world angle of a tank */
 
   // Return angle (in radians [-pi, pi])
-  return mTankRegistry.get(tankId).getOrientation();
+  return mTankRegistry.getTagged(tankId).getOrientation();
 }
 
 std::pair<float, float> Engine::getTankWorldVelocity(RegistryId tankId) {
   /* Get the current world linear velocity of a tank */
 
-  b2Vec2 velocity = mTankRegistry.get(tankId).getWorldVelocity();
+  b2Vec2 velocity = mTankRegistry.getTagged(tankId).getWorldVelocity();
 
   // Return velocity (in meters per second)
   return std::make_pair(velocity.x, velocity.y);
@@ -183,7 +602,7 @@ std::pair<float, float> Engine::getTankWorldVelocity(RegistryId tankId) {
 std::pair<float, float> Engine::getTankLocalVelocity(RegistryId tankId) {
   /* Get the current local linear velocity of a tank */
 
-  b2Vec2 velocity = mTankRegistry.get(tankId).getLocalVelocity();
+  b2Vec2 velocity = mTankRegistry.getTagged(tankId).getLocalVelocity();
 
   // Return velocity (in meters per second)
   return std::make_pair(velocity.x, velocity.y);
@@ -193,115 +612,51 @@ float Engine::getTankAngularVelocity(RegistryId tankId) {
   /* Get the current angular velocity of a tank */
 
   // Return angular velocity (in radians per second)
-  return mTankRegistry.get(tankId).getAngularVelocity();
+  return mTankRegistry.getTagged(tankId).getAngularVelocity();
+}
+
+float Engine::getTankTreadMaxSpeed(RegistryId tankId) {
+  /* Get the maximum tread speed of a tank */
+
+  // Return speed (in meters per second)
+  return mTankRegistry.getTagged(tankId).getTreadMaxSpeed();
 }
 
 void Engine::clearImage() {
   /* Clear the image */
 
   // Clear the image
-  mRenderEngine.clearImage(mConfig.clearColor);
+  getRenderEngine().clearImage(mConfig.clearColor);
 }
 
 void Engine::renderObstacle(RegistryId obstacleId) {
-  /* Render all obstacles */
-
-  // Render obstacle shapes returned in vector
-  for (const std::pair<b2ShapeId, b2HexColor> &obstacleShapeIdAndColor :
-       mObstacleRegistry.get(obstacleId).getShapeIdsAndColors()) {
-
-    // Extract shapeId and color
-    b2ShapeId obstacleShapeId = obstacleShapeIdAndColor.first;
-    b2HexColor obstacleShapeColor = obstacleShapeIdAndColor.second;
-
-    // Get shape
-    b2Circle obstacleShapeCircle = b2Shape_GetCircle(obstacleShapeId);
+  /* Render a obstacle */
 
-    // Convert meters to pixels
-    b2Vec2 convertedCenter =
-        b2MulSV(mConfig.pixelDensity, obstacleShapeCircle.center);
-    float convertedRadius = mConfig.pixelDensity * obstacleShapeCircle.radius;
-
-    // Render the shape
-    mRenderEngine.renderCircle(convertedCenter, convertedRadius,
-                               obstacleShapeColor);
-  }
+  // Render in pixel coordinates
+  drawObstacle(getRenderEngine(), mConfig.pixelDensity,
+               mObstacleRegistry.untagId(obstacleId));
 }
 
 void Engine::renderProjectiles() {
   /* Render all projectiles */
 
-  // Render projectiles tracked in vector
-  for (const b2ShapeId &projectileShapeId : mProjectileShapeIdVector) {
-    // Get shape vertices and transform
-    b2Polygon projectileShapePolygon = b2Shape_GetPolygon(projectileShapeId);
-    b2Transform worldTransform =
-        b2Body_GetTransform(b2Shape_GetBody(projectileShapeId));
-
-    std::vector<b2Vec2> vertices;
-
-    for (int i = 0; i < projectileShapePolygon.count; i++) {
-      // Compute vertex location (meters)
-      b2Vec2 transformedVertex =
-          b2TransformPoint(worldTransform, projectileShapePolygon.vertices[i]);
-
-      // Convert meters to pixels
-      b2Vec2 convertedVertex = b2MulSV(mConfig.pixelDensity, transformedVertex);
-
-      // Add to vector
-      vertices.push_back(convertedVertex);
-    }
-
-    // Get source tank projectile color
-    TankId sourceTankId =
-        *static_cast<TankId *>(b2Shape_GetUserData(projectileShapeId));
-    b2HexColor projectileColor =
-        mTankRegistry.get(sourceTankId).getProjectileColor();
-
-    // Render the projectile
-    mRenderEngine.renderPolygon(vertices, projectileColor);
-  }
+  // Render in pixel coordinates
+  drawProjectiles(getRenderEngine(), mConfig.pixelDensity);
 }
 
 void Engine::renderTank(RegistryId tankId) {
   /* Render a tank */
 
-  // Render tank shapes returned in vector
-  for (const std::pair<b2ShapeId, b2HexColor> &tankShapeIdAndColor :
-       mTankRegistry.get(tankId).getShapeIdsAndColors()) {
-    // Extract shapeId and color
-    b2ShapeId tankShapeId = tankShapeIdAndColor.first;
-    b2HexColor tankShapeColor = tankShapeIdAndColor.second;
-
-    // Get shape vertices and transform
-    b2Polygon tankShapePolygon = b2Shape_GetPolygon(tankShapeId);
-    b2Transform worldTransform =
-        b2Body_GetTransform(b2Shape_GetBody(tankShapeId));
-
-    std::vector<b2Vec2> vertices;
-
-    for (int i = 0; i < tankShapePolygon.count; i++) {
-      // Compute vertex location (meters)
-      b2Vec2 transformedVertex =
-          b2TransformPoint(worldTransform, tankShapePolygon.vertices[i]);
-
-      // Convert meters to pixels
-      b2Vec2 convertedVertex = b2MulSV(mConfig.pixelDensity, transformedVertex);
-
-      // Add to vector
-      vertices.push_back(convertedVertex);
-    }
-
-    // Render the projectile
-    mRenderEngine.renderPolygon(vertices, tankShapeColor);
-  }
+  // Render in pixel coordinates
+  drawTank(getRenderEngine(), mConfig.pixelDensity,
+           mTankRegistry.untagId(tankId));
 }
 
 void Engine::renderTankLidar(RegistryId tankId) {
   /* Render a tank's latest lidar scan */
 
   // Get tank
-  Tank &tank = mTankRegistry.get(tankId);
+  Tank &tank = mTankRegistry.getTagged(tankId);
 
   // Get color
   b2HexColor color = tank.getLidarColor();
@@ -309,80 +664,623 @@ void Engine::renderTankLidar(RegistryId tankId) {
   // Get radius
   float radius = tank.getLidarRadius();
 
-  // Get and render lidar data buffer
-  for (const b2Vec2 &point : tank.getLidarData()) {
-    // Convert meters to pixels
-    b2Vec2 convertedPoint = b2MulSV(mConfig.pixelDensity, point);
+  // Convert lidar data buffer from meters to pixels
+  const std::vector<b2Vec2> &lidarData = tank.getLidarData();
+  mLidarPixelBuffer.resize(lidarData.size());
+
+  for (size_t pointNum = 0; pointNum < lidarData.size(); pointNum++) {
+    mLidarPixelBuffer[pointNum] =
+        b2MulSV(mConfig.pixelDensity, lidarData[pointNum]);
+  }
+
+  // Render all circles with a single fill
+  getRenderEngine().renderCircles(mLidarPixelBuffer, radius, color);
+}
+
+void Engine::renderScene() {
+  /* Render the whole scene (obstacles, every tank and its lidar, and
+     projectiles) */
+
+  // Render all tanks
+  renderScene(getTankIds());
+}
+
+void Engine::renderScene(const std::vector<RegistryId> &tankIds) {
+  /* Render the scene with a subset of tanks
+     Input: ids of the tanks (and their lidar) to render
+     Note: the static background (clear color and obstacles) is rasterized once
+     and cached, until obstacles are added or removed
+  */
 
-    // Render the circle
-    mRenderEngine.renderCircle(convertedPoint, radius, color);
+  // Render the background
+  if (mBackgroundValid) {
+    getRenderEngine().restoreBackground();
+  } else {
+    clearImage();
+
+    mObstacleRegistry.forEach([&](RegistryId obstacleId, Obstacle &obstacle) {
+      drawObstacle(getRenderEngine(), mConfig.pixelDensity, obstacleId);
+    });
+
+    getRenderEngine().saveBackground();
+    mBackgroundValid = true;
+  }
+
+  // Render tanks
+  for (RegistryId tankId : tankIds) {
+    renderTank(tankId);
+    renderTankLidar(tankId);
   }
+
+  // Render projectiles
+  renderProjectiles();
 }
 
 std::vector<unsigned char> Engine::getImageBuffer() {
   /* Return pixel buffer from render enging */
 
   // Return image
-  return mRenderEngine.getBuffer();
+  return getRenderEngine().getBuffer();
+}
+
+void Engine::copyImageToRGB(unsigned char *rgbBuffer) {
+  /* Convert image into a caller provided RGB pixel buffer
+     Input: buffer of shape (height, width, 3)
+  */
+
+  // Convert image
+  getRenderEngine().copyToRGB(rgbBuffer);
+}
+
+unsigned char *Engine::getImageData() {
+  /* Return the render engine surface memory (without copying), see
+     RenderEngine::getData
+  */
+
+  // Return surface memory
+  return getRenderEngine().getData();
+}
+
+int Engine::getImageStride() {
+  /* Return number of bytes between rows of the image surface */
+
+  // Return stride
+  return getRenderEngine().getStride();
 }
 
 std::pair<int, int> Engine::getImageDimensions() {
-  /* Return dimensions of the image */
+  /* Return dimensions of the image (without allocating the render engine) */
 
   // Return dimensions
-  return mRenderEngine.getDimensions();
+  return std::pair<int, int>(
+      std::ceil(mConfig.arenaWidth * mConfig.pixelDensity),
+      std::ceil(mConfig.arenaHeight * mConfig.pixelDensity));
 }
 
 int Engine::getImageChannels() {
   /* Return number of channels of the image */
 
   // Return channels
-  return mRenderEngine.getChannels();
+  return RenderEngine::getChannels();
+}
+
+void Engine::getAllTankPixelObservations(
+    const PixelObservationConfig &pixelObservationConfig,
+    unsigned char *pixelBuffer) {
+  /* Render a low resolution frame for every tank, directly at the observation
+     resolution (without the full size render surface)
+     Input: pixel observation config, buffer of shape (num_tanks, height,
+     width, channels), see getAllTankPixelObservationsDimensions
+     Note: rows are ordered by ascending tank id, see getTankIds
+     Note: egocentric frames are centered on the tank, which faces the top of
+     the frame, top-down frames show the whole arena (the same frame for every
+     tank)
+  */
+
+  // Validate dimensions
+  auto [numTanks, height, width, channels] =
+      getAllTankPixelObservationsDimensions(pixelObservationConfig);
+  size_t frameSize = height * width * channels;
+
+  // Create (or resize) the observation render engine
+  if (!mPixelRenderEngine || mPixelRenderEngine->getDimensions() !=
+                                 std::pair<int, int>(width, height)) {
+    mPixelRenderEngine = std::make_unique<RenderEngine>(width, height);
+  }
+
+  RenderEngine &renderEngine = *mPixelRenderEngine;
+
+  // Define frame rendering (in meters, scaled by the view transform)
+  auto renderFrame = [&](b2Vec2 center, float scale, float angle,
+                         unsigned char *frame) {
+    renderEngine.clearImage(mConfig.clearColor);
+    renderEngine.setTransform(center, scale, angle);
+
+    mObstacleRegistry.forEach([&](RegistryId obstacleId, Obstacle &obstacle) {
+      drawObstacle(renderEngine, 1.0f, obstacleId);
+    });
+
+    mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+      drawTank(renderEngine, 1.0f, tankId);
+    });
+
+    drawProjectiles(renderEngine, 1.0f);
+
+    renderEngine.resetTransform();
+
+    if (pixelObservationConfig.grayscale) {
+      renderEngine.copyToGray(frame);
+    } else {
+      renderEngine.copyToRGB(frame);
+    }
+  };
+
+  // Render frames
+  if (pixelObservationConfig.egocentric) {
+    float scale =
+        std::min(width, height) / (2.0f * pixelObservationConfig.viewRange);
+    unsigned char *frame = pixelBuffer;
+
+    mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+      renderFrame(tank.getPosition(), scale,
+                  -b2_pi / 2.0f - tank.getOrientation(), frame);
+      frame += frameSize;
+    });
+  } else if (numTanks > 0) {
+    float scale =
+        std::min(width / mConfig.arenaWidth, height / mConfig.arenaHeight);
+    b2Vec2 center = {mConfig.arenaWidth / 2.0f, mConfig.arenaHeight / 2.0f};
+
+    renderFrame(center, scale, 0.0f, pixelBuffer);
+
+    for (size_t row = 1; row < numTanks; row++) {
+      std::copy(pixelBuffer, pixelBuffer + frameSize,
+                pixelBuffer + row * frameSize);
+    }
+  }
+}
+
+std::tuple<size_t, size_t, size_t, size_t>
+Engine::getAllTankPixelObservationsDimensions(
+    const PixelObservationConfig &pixelObservationConfig) {
+  /* Get the dimensions of batched pixel observations
+     (num_tanks, height, width, channels)
+  */
+
+  // Check input
+  if (pixelObservationConfig.width <= 0 || pixelObservationConfig.height <= 0) {
+    throw std::invalid_argument(
+        "Pixel observations must have a positive size.");
+  }
+
+  // Return dimensions
+  return std::make_tuple(mTankRegistry.size(),
+                         static_cast<size_t>(pixelObservationConfig.height),
+                         static_cast<size_t>(pixelObservationConfig.width),
+                         pixelObservationConfig.grayscale ? 1 : 3);
 }
 
 void Engine::writeImageToPng(const std::filesystem::path &filePath) {
   /* Write the current image to disk as a .png */
 
   // Write .png to disk
-  mRenderEngine.writeToPng(filePath);
+  getRenderEngine().writeToPng(filePath);
 }
 
-std::vector<std::tuple<CategoryBits, RegistryId, RegistryId>> Engine::step() {
-  /* Step the engine forward */
+const std::vector<CollisionEvent> &Engine::step(uint32_t categoryMask,
+                                                bool unique) {
+  /* Step the engine forward
+     Returns the collision events of this step whose category is in
+     categoryMask, optionally with duplicate events removed
+     Note: the returned events are reused, and only valid until the next step
+  */
 
   // Step the physics engine
   b2World_Step(mWorldId, mConfig.timeStep, mConfig.subStep);
+  mTaskGroups.clear();
 
   // Resolve resultant collisions
-  return handleCollisions();
+  handleCollisions();
+
+  // Filter collision events
+  filterCollisionEvents(categoryMask, unique);
+
+  return mCollisionEvents;
 }
 
-std::vector<std::tuple<CategoryBits, RegistryId, RegistryId>>
-Engine::handleCollisions() {
-  /* Handle collisions
-     Returns a vector of tuples <CategoryBits, srcTankId, hitTankId>
-     If there is no collision with a tank, hitTankId is invalid
+std::vector<unsigned char> Engine::saveState() {
+  /* Capture the dynamic simulation state into a compact byte blob
+     Note: holds tank and projectile transforms and velocities, gun motor
+     targets, projectile owners, and the game rules state (if attached)
+     Note: walls, obstacles and configs are not included, so a state can only
+     be restored into an engine with the same tanks, see restoreState
+     Note: the engine draws no random numbers, so there is no RNG state
   */
 
-  // Retrieve contact events
-  b2ContactEvents contactEvents = b2World_GetContactEvents(mWorldId);
+  std::vector<unsigned char> state;
+
+  // Count projectiles (projectiles of removed tanks cannot be respawned)
+  uint32_t numProjectiles =
+      std::count_if(mActiveProjectiles.begin(), mActiveProjectiles.end(),
+                    [&](uint32_t slotIndex) {
+                      return mTankRegistry.containsTagged(
+                          mProjectileSlots[slotIndex].sourceTankId);
+                    });
 
-  // Define table
-  struct TableEntry : b2ShapeId {
-    bool operator<(const b2ShapeId &other) const {
-      return std::tie(index1, world0, revision) <
-             std::tie(other.index1, other.world0, other.revision);
+  state.reserve(
+      3 * sizeof(uint32_t) +
+      mTankRegistry.size() * (sizeof(RegistryId) + sizeof(TankState)) +
+      numProjectiles * (sizeof(TankId) + sizeof(BodyState)) + 16 +
+      (mGameRules ? mGameRules->getReloadCounters().size() * sizeof(float)
+                  : 0));
+
+  // Write header
+  writeState(state, STATE_MAGIC);
+
+  // Write tanks (in ascending id order)
+  writeState<uint32_t>(state, mTankRegistry.size());
+
+  mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+    writeState(state, tankId);
+    writeState(state, tank.getState());
+  });
+
+  // Write projectiles (in active order)
+  writeState(state, numProjectiles);
+
+  for (uint32_t slotIndex : mActiveProjectiles) {
+    const ProjectileSlot &slot = mProjectileSlots[slotIndex];
+
+    if (mTankRegistry.containsTagged(slot.sourceTankId)) {
+      writeState(state, getRegistryIndex(slot.sourceTankId));
+      writeState(state, getBodyState(b2Shape_GetBody(slot.shapeId)));
     }
-    bool operator==(const b2ShapeId &other) const {
-      return std::tie(index1, world0, revision) ==
-             std::tie(other.index1, other.world0, other.revision);
+  }
+
+  // Write game rules
+  writeState<uint8_t>(state, mGameRules != nullptr);
+
+  if (mGameRules) {
+    const std::vector<float> &reloadCounters = mGameRules->getReloadCounters();
+
+    writeState<int32_t>(state, mGameRules->getTimestep());
+    writeState<uint8_t>(state, mGameRules->isTerminated());
+    writeState<uint8_t>(state, mGameRules->isTruncated());
+    writeState<uint32_t>(state, reloadCounters.size());
+
+    for (float reloadCounter : reloadCounters) {
+      writeState(state, reloadCounter);
+    }
+  }
+
+  // Return state
+  return state;
+}
+
+void Engine::restoreState(const std::vector<unsigned char> &state) {
+  /* Restore a state captured by saveState, without rebuilding the world
+     Note: the engine must hold the same tanks as when the state was saved,
+     the state is validated before anything is modified
+     Note: solver state (contact and joint warm starting) is not captured, so
+     a restored engine closely follows, but is not bit-identical to, the
+     original one
+  */
+
+  size_t offset = 0;
+
+  // Read header
+  if (readState<uint32_t>(state, offset) != STATE_MAGIC) {
+    throw std::invalid_argument("Invalid engine state.");
+  }
+
+  // Read tanks
+  uint32_t numTanks = readState<uint32_t>(state, offset);
+
+  if (numTanks != mTankRegistry.size()) {
+    throw std::invalid_argument("Engine state holds differing tanks.");
+  }
+
+  std::vector<std::pair<RegistryId, TankState>> tankStates(numTanks);
+
+  for (auto &[tankId, tankState] : tankStates) {
+    tankId = readState<RegistryId>(state, offset);
+    tankState = readState<TankState>(state, offset);
+
+    if (!mTankRegistry.contains(tankId)) {
+      throw std::invalid_argument("Engine state holds differing tanks.");
+    }
+  }
+
+  // Read projectiles
+  uint32_t numProjectiles = readState<uint32_t>(state, offset);
+  std::vector<std::pair<TankId, BodyState>> projectileStates;
+  projectileStates.reserve(numProjectiles);
+
+  for (uint32_t projectileNum = 0; projectileNum < numProjectiles;
+       projectileNum++) {
+    TankId sourceTankId = readState<TankId>(state, offset);
+    BodyState projectileState = readState<BodyState>(state, offset);
+
+    if (!mTankRegistry.contains(sourceTankId)) {
+      throw std::invalid_argument("Engine state holds differing tanks.");
+    }
+
+    projectileStates.emplace_back(sourceTankId, projectileState);
+  }
+
+  // Read game rules
+  bool hasGameRules = readState<uint8_t>(state, offset);
+  int timestep = 0;
+  bool terminated = false;
+  bool truncated = false;
+  std::vector<float> reloadCounters;
+
+  if (hasGameRules) {
+    timestep = readState<int32_t>(state, offset);
+    terminated = readState<uint8_t>(state, offset);
+    truncated = readState<uint8_t>(state, offset);
+    reloadCounters.resize(readState<uint32_t>(state, offset));
+
+    for (float &reloadCounter : reloadCounters) {
+      reloadCounter = readState<float>(state, offset);
+    }
+  }
+
+  if (offset != state.size()) {
+    throw std::invalid_argument("Invalid engine state.");
+  }
+
+  // Restore tanks
+  for (const auto &[tankId, tankState] : tankStates) {
+    mTankRegistry.get(tankId).setState(tankState);
+  }
+
+  // Respawn projectiles
+  destroyProjectiles();
+
+  for (const auto &[sourceTankId, projectileState] : projectileStates) {
+    Tank &tank = mTankRegistry.get(sourceTankId);
+    ProjectileSlot &slot =
+        acquireProjectileSlot(mTankRegistry.getTaggedId(sourceTankId));
+    slot.shapeId = tank.spawnProjectile(&slot, projectileState);
+  }
+
+  // Restore game rules (when attached)
+  if (hasGameRules && mGameRules) {
+    mGameRules->restore(reloadCounters, timestep, terminated, truncated);
+  }
+}
+
+void Engine::prepareLookahead() {
+  /* Build or update the scratch engine used by simulateLookahead, when the
+     tanks, obstacles or game rules have changed
+     Note: building the scratch engine creates a physics world, see the
+     thread-safety contract
+  */
+
+  // Rebuild the scratch engine with the same tanks and game rules
+  if (!mLookaheadValid || !mLookaheadEngine) {
+    Config lookaheadConfig = mConfig;
+    lookaheadConfig.headless = true;
+    lookaheadConfig.verboseOutput = false;
+
+    mLookaheadEngine.reset();
+    mLookaheadEngine = std::make_unique<Engine>(lookaheadConfig);
+
+    // Add tanks with the same ids (placeholder tanks fill the id gaps, and
+    // are removed afterwards)
+    std::vector<RegistryId> placeholderIds;
+
+    mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+      RegistryId lookaheadTankId;
+
+      while (getRegistryIndex(lookaheadTankId = mLookaheadEngine->addTank(
+                                  tank.getConfig())) != tankId) {
+        placeholderIds.push_back(lookaheadTankId);
+      }
+    });
+
+    for (RegistryId placeholderId : placeholderIds) {
+      mLookaheadEngine->removeTank(placeholderId);
     }
+
+    // Without game rules, tanks fire whenever asked
+    GameRulesConfig gameRulesConfig;
+    gameRulesConfig.reloadDelay = 0;
+
+    mLookaheadEngine->setGameRules(mGameRules ? mGameRules->getConfig()
+                                              : gameRulesConfig);
+
+    mLookaheadValid = true;
+    mLookaheadObstaclesValid = false;
+  }
+
+  // Update differing obstacles, keeping the same ids (so obstacle collision
+  // events report the live obstacle ids)
+  if (!mLookaheadObstaclesValid) {
+    auto isMatch = [](const ObstacleConfig &a, const ObstacleConfig &b) {
+      return a.positionX == b.positionX && a.positionY == b.positionY &&
+             a.radius == b.radius && a.color == b.color;
+    };
+
+    // Remove obstacles that are no longer present, or have changed
+    std::vector<RegistryId> unmatchedIds;
+
+    mLookaheadEngine->mObstacleRegistry.forEach(
+        [&](RegistryId obstacleId, Obstacle &obstacle) {
+          if (!mObstacleRegistry.contains(obstacleId) ||
+              !isMatch(mObstacleRegistry.get(obstacleId).getConfig(),
+                       obstacle.getConfig())) {
+            unmatchedIds.push_back(obstacleId);
+          }
+        });
+
+    for (RegistryId obstacleId : unmatchedIds) {
+      mLookaheadEngine->mObstacleRegistry.remove(obstacleId);
+    }
+
+    // Add missing obstacles with the same ids (placeholder obstacles fill the
+    // id gaps, and are removed afterwards)
+    std::vector<RegistryId> placeholderIds;
+
+    mObstacleRegistry.forEach([&](RegistryId obstacleId, Obstacle &obstacle) {
+      if (mLookaheadEngine->mObstacleRegistry.contains(obstacleId)) {
+        return;
+      }
+
+      RegistryId lookaheadObstacleId;
+
+      while (
+          getRegistryIndex(lookaheadObstacleId = mLookaheadEngine->addObstacle(
+                               obstacle.getConfig())) != obstacleId) {
+        placeholderIds.push_back(lookaheadObstacleId);
+      }
+    });
+
+    for (RegistryId placeholderId : placeholderIds) {
+      mLookaheadEngine->removeObstacle(placeholderId);
+    }
+
+    mLookaheadObstaclesValid = true;
+  }
+}
+
+const std::vector<LookaheadEvent> &
+Engine::simulateLookahead(const float *actions, size_t numSteps, float *states,
+                          float *rewards) {
+  /* Predict the next steps on a scratch copy of the world, leaving this
+     engine untouched
+     Input: actions of shape (num_steps, num_tanks, 3), see applyActions,
+     state buffer of shape (num_steps, num_tanks, 9), see getAllTankStates,
+     reward buffer of shape (num_steps, num_tanks), see GameRules::step
+     Returns the collision events of every step
+     Note: the scratch engine plays under a copy of the game rules (or fires
+     whenever asked without game rules), see prepareLookahead
+  */
+
+  // Copy the current state into the scratch engine
+  prepareLookahead();
+
+  if (!mGameRules) {
+    mLookaheadEngine->getGameRules().reset();
+  }
+  mLookaheadEngine->restoreState(saveState());
+
+  // Simulate each step
+  auto [numTanks, actionSize] = getActionsDimensions();
+  size_t stateSize = getAllTankStatesDimensions().second;
+
+  mLookaheadEvents.clear();
+
+  // Tag event ids with the generations of this engine (the scratch engine
+  // holds the same slots, but its own generations)
+  auto tagTankId = [&](RegistryId tankId) {
+    return mTankRegistry.getTaggedId(getRegistryIndex(tankId));
   };
 
-  std::map<TableEntry, std::set<TableEntry>> table;
+  for (size_t step = 0; step < numSteps; step++) {
+    for (const CollisionEvent &event :
+         mLookaheadEngine->stepGame(actions + step * numTanks * actionSize,
+                                    rewards + step * numTanks)) {
+      RegistryId hitId = event.hitId;
+
+      if (event.categoryBits == CategoryBits::OBSTACLE) {
+        hitId = mObstacleRegistry.getTaggedId(getRegistryIndex(hitId));
+      } else if (event.categoryBits == CategoryBits::TANK_BODY ||
+                 event.categoryBits == CategoryBits::PROJECTILE) {
+        hitId = tagTankId(hitId);
+      }
+
+      mLookaheadEvents.push_back({static_cast<unsigned int>(step),
+                                  event.categoryBits, tagTankId(event.srcId),
+                                  hitId});
+    }
+
+    mLookaheadEngine->getAllTankStates(states + step * numTanks * stateSize);
+  }
+
+  // Return events
+  return mLookaheadEvents;
+}
+
+void Engine::setGameRules(const GameRulesConfig &gameRulesConfig) {
+  /* Attach game rules (replacing, in place, any attached rules) */
+
+  // Invalidate the lookahead engine
+  mLookaheadValid = false;
+
+  // Create or replace game rules
+  if (mGameRules) {
+    *mGameRules = GameRules(gameRulesConfig);
+  } else {
+    mGameRules = std::make_unique<GameRules>(gameRulesConfig);
+  }
+}
+
+GameRules &Engine::getGameRules() {
+  /* Get the attached game rules */
+
+  // Check game rules are attached
+  if (!mGameRules) {
+    throw std::runtime_error("No game rules have been set.");
+  }
+
+  // Return game rules
+  return *mGameRules;
+}
+
+const std::vector<CollisionEvent> &Engine::stepGame(const float *actions,
+                                                    float *rewards) {
+  /* Apply actions, and step the engine forward under the attached game rules
+     Input: actions of shape (num_tanks, 3), reward buffer of shape (num_tanks)
+     Returns the collision events of the step, see GameRules::step
+  */
+
+  // Step the game
+  return getGameRules().step(*this, actions, rewards);
+}
+
+void Engine::filterCollisionEvents(uint32_t categoryMask, bool unique) {
+  /* Filter the collision events in place (preserving their order) */
+
+  // Remove events outside the category mask
+  if (categoryMask != CategoryBits::ALL) {
+    mCollisionEvents.erase(
+        std::remove_if(mCollisionEvents.begin(), mCollisionEvents.end(),
+                       [categoryMask](const CollisionEvent &event) {
+                         return (event.categoryBits & categoryMask) == 0;
+                       }),
+        mCollisionEvents.end());
+  }
+
+  // Remove repeated events (there are only a few events per step)
+  if (unique) {
+    auto uniqueEnd = mCollisionEvents.begin();
+
+    for (auto event = mCollisionEvents.begin(); event != mCollisionEvents.end();
+         event++) {
+      if (std::find(mCollisionEvents.begin(), uniqueEnd, *event) == uniqueEnd) {
+        *uniqueEnd++ = *event;
+      }
+    }
+
+    mCollisionEvents.erase(uniqueEnd, mCollisionEvents.end());
+  }
+}
+
+void Engine::handleCollisions() {
+  /* Handle collisions
+     Fills the collision events buffer with <CategoryBits, srcTankId, hitId>
+     If there is no collision with a tank or obstacle, hitId is invalid
+  */
+
+  // Retrieve contact events
+  b2ContactEvents contactEvents = b2World_GetContactEvents(mWorldId);
+
+  // Gather projectile contacts into the scratch buffer
+  mProjectileContacts.clear();
 
-  // Populate table
-  for (size_t contactNum = 0; contactNum < contactEvents.beginCount;
+  for (int contactNum = 0; contactNum < contactEvents.beginCount;
        contactNum++) {
     // Retrieve contact event
     b2ContactBeginTouchEvent *contactEvent =
@@ -398,121 +1296,400 @@ Engine::handleCollisions() {
     CategoryBits categoryBitsB =
         static_cast<CategoryBits>(b2Shape_GetFilter(shapeIdB).categoryBits);
 
-    // Determine if a projectile was involved
-    if (categoryBitsA != CategoryBits::PROJECTILE &&
-        categoryBitsB != CategoryBits::PROJECTILE) {
-      continue;
-    }
-
     // Handle the first shape being a projectile
     if (categoryBitsA == CategoryBits::PROJECTILE) {
-      table[TableEntry{shapeIdA}].insert(TableEntry{shapeIdB});
+      mProjectileContacts.push_back({shapeIdA, shapeIdB, categoryBitsB});
     }
 
     // Handle the second shape being a projectile
     if (categoryBitsB == CategoryBits::PROJECTILE) {
-      table[TableEntry{shapeIdB}].insert(TableEntry{shapeIdA});
+      mProjectileContacts.push_back({shapeIdB, shapeIdA, categoryBitsA});
     }
   }
 
-  // Define output
-  std::vector<std::tuple<CategoryBits, RegistryId, RegistryId>> output;
+  // Order contacts by projectile, then by contacted shape, and remove
+  // duplicates
+  auto shapeKey = [](b2ShapeId shapeId) {
+    return std::make_tuple(shapeId.index1, shapeId.world0, shapeId.revision);
+  };
+  auto contactKey = [&](const ProjectileContact &contact) {
+    return std::make_tuple(shapeKey(contact.projectileShapeId),
+                           shapeKey(contact.contactShapeId));
+  };
+
+  std::sort(mProjectileContacts.begin(), mProjectileContacts.end(),
+            [&](const ProjectileContact &a, const ProjectileContact &b) {
+              return contactKey(a) < contactKey(b);
+            });
+  mProjectileContacts.erase(
+      std::unique(mProjectileContacts.begin(), mProjectileContacts.end(),
+                  [&](const ProjectileContact &a, const ProjectileContact &b) {
+                    return contactKey(a) == contactKey(b);
+                  }),
+      mProjectileContacts.end());
+
+  // Reuse the collision events buffer
+  mCollisionEvents.clear();
 
   // Handle collision effects
-  for (const std::pair<TableEntry, std::set<TableEntry>> &pair : table) {
-    b2ShapeId projectileShapeId = pair.first;
-    TankId sourceTankId =
-        *static_cast<TankId *>(b2Shape_GetUserData(projectileShapeId));
 
-    for (const b2ShapeId &contactShapeId : pair.second) {
-      CategoryBits contactCategoryBits = static_cast<CategoryBits>(
-          b2Shape_GetFilter(contactShapeId).categoryBits);
+  for (const ProjectileContact &contact : mProjectileContacts) {
+    b2ShapeId contactShapeId = contact.contactShapeId;
+    CategoryBits contactCategoryBits = contact.contactCategoryBits;
+    TankId sourceTankId = static_cast<ProjectileSlot *>(
+                              b2Shape_GetUserData(contact.projectileShapeId))
+                              ->sourceTankId;
+
+    switch (contactCategoryBits) {
+    case CategoryBits::OBSTACLE: {
+      ObstacleId obstacleId =
+          *static_cast<ObstacleId *>(b2Shape_GetUserData(contactShapeId));
+
+      if (mConfig.verboseOutput) {
+        std::cout << "projectile v obstacle : " << sourceTankId
+                  << " hit obstacle " << obstacleId << std::endl;
+      }
+
+      mCollisionEvents.push_back({contactCategoryBits, sourceTankId,
+                                  mObstacleRegistry.getTaggedId(obstacleId)});
+
+      break;
+    }
+
+    case CategoryBits::PROJECTILE: {
+      TankId otherTankId =
+          *static_cast<TankId *>(b2Shape_GetUserData(contactShapeId));
 
-      switch (contactCategoryBits) {
-      case CategoryBits::OBSTACLE: {
-        ObstacleId obstacleId =
-            *static_cast<ObstacleId *>(b2Shape_GetUserData(contactShapeId));
+      if (mConfig.verboseOutput) {
+        std::cout << "projectile v projectile : " << sourceTankId << " hit "
+                  << otherTankId << std::endl;
+      }
 
-        if (mConfig.verboseOutput) {
-          std::cout << "projectile v obstacle : " << sourceTankId
-                    << " hit obstacle " << obstacleId << std::endl;
-        }
+      mCollisionEvents.push_back(
+          {contactCategoryBits, sourceTankId, otherTankId});
 
-        output.push_back(
-            std::make_tuple(contactCategoryBits, sourceTankId, obstacleId));
+      break;
+    }
 
-        break;
+    case CategoryBits::WALL: {
+      if (mConfig.verboseOutput) {
+        std::cout << "projectile v wall : " << sourceTankId << " hit wall"
+                  << std::endl;
       }
 
-      case CategoryBits::PROJECTILE: {
-        TankId otherTankId =
-            *static_cast<TankId *>(b2Shape_GetUserData(contactShapeId));
+      mCollisionEvents.push_back({contactCategoryBits, sourceTankId, 0});
 
-        if (mConfig.verboseOutput) {
-          std::cout << "projectile v projectile : " << sourceTankId << " hit "
-                    << otherTankId << std::endl;
-        }
+      break;
+    }
 
-        output.push_back(
-            std::make_tuple(contactCategoryBits, sourceTankId, otherTankId));
+    case CategoryBits::TANK_BODY: {
+      TankId otherTankId =
+          *static_cast<TankId *>(b2Shape_GetUserData(contactShapeId));
 
-        break;
+      if (mConfig.verboseOutput) {
+        std::cout << "projectile v tank : " << sourceTankId << " hit "
+                  << otherTankId << std::endl;
       }
 
-      case CategoryBits::WALL: {
-        if (mConfig.verboseOutput) {
-          std::cout << "projectile v wall : " << sourceTankId << " hit wall"
-                    << std::endl;
-        }
+      mCollisionEvents.push_back({contactCategoryBits, sourceTankId,
+                                  mTankRegistry.getTaggedId(otherTankId)});
 
-        output.push_back(std::make_tuple(contactCategoryBits, sourceTankId, 0));
+      break;
+    }
 
-        break;
+    default: {
+      if (mConfig.verboseOutput) {
+        std::cout << "projectile v unknown" << sourceTankId << " hit unknown"
+                  << std::endl;
       }
 
-      case CategoryBits::TANK_BODY: {
-        TankId otherTankId =
-            *static_cast<TankId *>(b2Shape_GetUserData(contactShapeId));
+      break;
+    }
+    }
+  }
 
-        if (mConfig.verboseOutput) {
-          std::cout << "projectile v tank : " << sourceTankId << " hit "
-                    << otherTankId << std::endl;
-        }
+  // Destroy projectiles that hit something (contacts are grouped by
+  // projectile)
+  for (size_t contactNum = 0; contactNum < mProjectileContacts.size();
+       contactNum++) {
+    b2ShapeId projectileShapeId =
+        mProjectileContacts[contactNum].projectileShapeId;
 
-        output.push_back(
-            std::make_tuple(contactCategoryBits, sourceTankId, otherTankId));
+    if (contactNum + 1 < mProjectileContacts.size() &&
+        shapeKey(mProjectileContacts[contactNum + 1].projectileShapeId) ==
+            shapeKey(projectileShapeId)) {
+      continue;
+    }
 
-        break;
-      }
+    destroyProjectile(
+        static_cast<ProjectileSlot *>(b2Shape_GetUserData(projectileShapeId))
+            ->slotIndex);
+  }
+}
 
-      default: {
-        if (mConfig.verboseOutput) {
-          std::cout << "projectile v unknown" << sourceTankId << " hit unknown"
-                    << std::endl;
-        }
+void Engine::destroyProjectile(uint32_t slotIndex) {
+  /* Destroy a projectile, and release its slot */
 
-        break;
-      }
-      }
+  ProjectileSlot &slot = mProjectileSlots[slotIndex];
+
+  // Destroy the projectile body
+  b2DestroyBody(b2Shape_GetBody(slot.shapeId));
+
+  // Remove from the active projectiles (swap and pop)
+  uint32_t lastSlotIndex = mActiveProjectiles.back();
+  mActiveProjectiles[slot.activeIndex] = lastSlotIndex;
+  mProjectileSlots[lastSlotIndex].activeIndex = slot.activeIndex;
+  mActiveProjectiles.pop_back();
+
+  // Release the slot
+  mFreeProjectileSlots.push_back(slotIndex);
+}
+
+void Engine::destroyProjectiles() {
+  /* Destroy every projectile */
+
+  while (!mActiveProjectiles.empty()) {
+    destroyProjectile(mActiveProjectiles.back());
+  }
+}
+
+void Engine::drawObstacle(RenderEngine &renderEngine, float scale,
+                          RegistryId obstacleId) {
+  /* Draw a obstacle onto a render engine
+     Input: render engine, scale (pixels per meter), obstacle id
+  */
+
+  // Render obstacle shapes returned in vector
+  for (const std::pair<b2ShapeId, b2HexColor> &obstacleShapeIdAndColor :
+       mObstacleRegistry.get(obstacleId).getShapeIdsAndColors()) {
+
+    // Extract shapeId and color
+    b2ShapeId obstacleShapeId = obstacleShapeIdAndColor.first;
+    b2HexColor obstacleShapeColor = obstacleShapeIdAndColor.second;
+
+    // Get shape
+    b2Circle obstacleShapeCircle = b2Shape_GetCircle(obstacleShapeId);
+
+    // Convert meters to pixels
+    b2Vec2 convertedCenter = b2MulSV(scale, obstacleShapeCircle.center);
+    float convertedRadius = scale * obstacleShapeCircle.radius;
+
+    // Render the shape
+    renderEngine.renderCircle(convertedCenter, convertedRadius,
+                              obstacleShapeColor);
+  }
+}
+
+void Engine::drawProjectiles(RenderEngine &renderEngine, float scale) {
+  /* Draw all projectiles onto a render engine
+     Input: render engine, scale (pixels per meter)
+  */
+
+  // Render active projectiles
+  for (uint32_t slotIndex : mActiveProjectiles) {
+    b2ShapeId projectileShapeId = mProjectileSlots[slotIndex].shapeId;
+
+    // Get shape vertices and transform
+    b2Polygon projectileShapePolygon = b2Shape_GetPolygon(projectileShapeId);
+    b2Transform worldTransform =
+        b2Body_GetTransform(b2Shape_GetBody(projectileShapeId));
+
+    std::vector<b2Vec2> vertices;
+
+    for (int i = 0; i < projectileShapePolygon.count; i++) {
+      // Compute vertex location (meters)
+      b2Vec2 transformedVertex =
+          b2TransformPoint(worldTransform, projectileShapePolygon.vertices[i]);
+
+      // Convert meters to pixels
+      b2Vec2 convertedVertex = b2MulSV(scale, transformedVertex);
+
+      // Add to vector
+      vertices.push_back(convertedVertex);
     }
+
+    // Get source tank projectile color
+    TankId sourceTankId = mProjectileSlots[slotIndex].sourceTankId;
+    b2HexColor projectileColor =
+        mTankRegistry.get(getRegistryIndex(sourceTankId)).getProjectileColor();
+
+    // Render the projectile
+    renderEngine.renderPolygon(vertices, projectileColor);
   }
+}
 
-  // Destroy projectiles
-  for (const std::pair<TableEntry, std::set<TableEntry>> &pair : table) {
-    b2ShapeId projectileShapeId = pair.first;
+void Engine::drawTank(RenderEngine &renderEngine, float scale,
+                      RegistryId tankId) {
+  /* Draw a tank onto a render engine
+     Input: render engine, scale (pixels per meter), tank id
+  */
 
-    // Deallocate userData from projectile shape
-    delete static_cast<TankId *>(b2Shape_GetUserData(projectileShapeId));
+  // Render tank shapes returned in vector
+  for (const std::pair<b2ShapeId, b2HexColor> &tankShapeIdAndColor :
+       mTankRegistry.get(tankId).getShapeIdsAndColors()) {
+    // Extract shapeId and color
+    b2ShapeId tankShapeId = tankShapeIdAndColor.first;
+    b2HexColor tankShapeColor = tankShapeIdAndColor.second;
+
+    // Get shape vertices and transform
+    b2Polygon tankShapePolygon = b2Shape_GetPolygon(tankShapeId);
+    b2Transform worldTransform =
+        b2Body_GetTransform(b2Shape_GetBody(tankShapeId));
+
+    std::vector<b2Vec2> vertices;
+
+    for (int i = 0; i < tankShapePolygon.count; i++) {
+      // Compute vertex location (meters)
+      b2Vec2 transformedVertex =
+          b2TransformPoint(worldTransform, tankShapePolygon.vertices[i]);
+
+      // Convert meters to pixels
+      b2Vec2 convertedVertex = b2MulSV(scale, transformedVertex);
+
+      // Add to vector
+      vertices.push_back(convertedVertex);
+    }
 
-    // Remove projectile shape from vector
-    mProjectileShapeIdVector.erase(
-        std::remove_if(
-            mProjectileShapeIdVector.begin(), mProjectileShapeIdVector.end(),
-            [pair](b2ShapeId shapeId) { return pair.first == shapeId; }),
-        mProjectileShapeIdVector.end());
+    // Render the projectile
+    renderEngine.renderPolygon(vertices, tankShapeColor);
+  }
+}
+
+RenderEngine &Engine::getRenderEngine() {
+  /* Get the render engine, creating it on first use */
 
-    b2DestroyBody(b2Shape_GetBody(projectileShapeId));
+  // Create render engine
+  if (!mRenderEngine) {
+    auto [imageWidth, imageHeight] = getImageDimensions();
+    mRenderEngine = std::make_unique<RenderEngine>(imageWidth, imageHeight);
   }
 
-  return output;
+  // Return render engine
+  return *mRenderEngine;
+}
+
+std::map<std::string, size_t> Engine::getMemoryUsage() {
+  /* Get the memory used by engine owned buffers (in bytes)
+     Note: box2d world allocations are not included
+  */
+
+  std::map<std::string, size_t> memoryUsage;
+
+  // Render buffers (zero for a headless engine that has not rendered)
+  memoryUsage["render_surface"] =
+      mRenderEngine ? mRenderEngine->getSurfaceSize() : 0;
+  memoryUsage["render_background"] =
+      mRenderEngine ? mRenderEngine->getBackgroundSize() : 0;
+  memoryUsage["pixel_observation_surface"] =
+      mPixelRenderEngine ? mPixelRenderEngine->getSurfaceSize() : 0;
+
+  // Lidar buffers
+  size_t lidarSize = mLidarPixelBuffer.capacity() * sizeof(b2Vec2);
+  mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+    lidarSize += tank.getLidarMemoryUsage();
+  });
+  memoryUsage["lidar"] = lidarSize;
+
+  // Projectile pool and contact buffers
+  memoryUsage["projectiles"] =
+      mProjectileSlots.size() * sizeof(ProjectileSlot) +
+      (mFreeProjectileSlots.capacity() + mActiveProjectiles.capacity()) *
+          sizeof(uint32_t) +
+      mProjectileContacts.capacity() * sizeof(ProjectileContact);
+
+  // Total
+  size_t total = 0;
+  for (const auto &[name, size] : memoryUsage) {
+    total += size;
+  }
+  memoryUsage["total"] = total;
+
+  // Return memory usage
+  return memoryUsage;
+}
+
+const RayCastScene *Engine::updateRayCastScene() {
+  /* Rebuild the analytic ray cast scene from the current world state
+     Returns the scene, or nullptr if lidar uses box2d ray casts
+  */
+
+  // Check if analytic lidar is enabled
+  if (!mConfig.analyticLidar) {
+    return nullptr;
+  }
+
+  mRayCastScene.clear();
+
+  // Add walls
+  for (const b2ShapeId &wallShapeId : mWallShapeIds) {
+    mRayCastScene.addShape(wallShapeId);
+  }
+
+  // Add obstacles
+  mObstacleRegistry.forEach([&](RegistryId obstacleId, Obstacle &obstacle) {
+    mRayCastScene.addCircle(obstacle.getPosition(), obstacle.getRadius());
+  });
+
+  // Add tanks (tagged with tank id, so a tank does not see itself)
+  mTankRegistry.forEach([&](RegistryId tankId, Tank &tank) {
+    for (const auto &[shapeId, color] : tank.getShapeIdsAndColors()) {
+      mRayCastScene.addShape(shapeId, tankId);
+    }
+  });
+
+  // Add projectiles
+  for (uint32_t slotIndex : mActiveProjectiles) {
+    mRayCastScene.addShape(mProjectileSlots[slotIndex].shapeId);
+  }
+
+  // Return scene
+  return &mRayCastScene;
+}
+
+void *Engine::enqueueTask(b2TaskCallback *task, int32_t itemCount,
+                          int32_t minRange, void *taskContext,
+                          void *userContext) {
+  /* Run a box2d task on the engine thread pool
+     Returns a handle passed to finishTask
+     Note: box2d requires its solver tasks to run concurrently, so tasks are
+     always queued (never run inline), and the worker index passed to box2d is
+     the pool thread index, which is unique and less than workerCount
+  */
+
+  Engine *engine = static_cast<Engine *>(userContext);
+  ThreadPool &threadPool = *engine->mThreadPool;
+
+  // Compute number of ranges
+  minRange = std::max<int32_t>(minRange, 1);
+  int32_t rangeCount = std::min<int32_t>(threadPool.getThreadCount(),
+                                         (itemCount + minRange - 1) / minRange);
+  rangeCount = std::max<int32_t>(rangeCount, 1);
+
+  // Distribute items evenly across ranges
+  ThreadPool::TaskGroup &taskGroup = engine->mTaskGroups.emplace_back();
+  int32_t rangeSize = itemCount / rangeCount;
+  int32_t remainder = itemCount % rangeCount;
+  int32_t startIndex = 0;
+
+  for (int32_t rangeNum = 0; rangeNum < rangeCount; rangeNum++) {
+    int32_t endIndex = startIndex + rangeSize + (rangeNum < remainder ? 1 : 0);
+
+    threadPool.submit(taskGroup, [task, startIndex, endIndex,
+                                  taskContext](unsigned int workerIndex) {
+      task(startIndex, endIndex, workerIndex, taskContext);
+    });
+
+    startIndex = endIndex;
+  }
+
+  return &taskGroup;
+}
+
+void Engine::finishTask(void *userTask, void *userContext) {
+  /* Wait for a box2d task to finish */
+
+  Engine *engine = static_cast<Engine *>(userContext);
+
+  // Wait for task ranges
+  engine->mThreadPool->wait(*static_cast<ThreadPool::TaskGroup *>(userTask));
 }
@@ -0,0 +1,155 @@
+// Tank Game (@kennedyengineering)
+
+#include <algorithm>
+#include <cmath>
+
+#include "game_rules.hpp"
+
+using namespace TankGame;
+
+GameRules::GameRules(const GameRulesConfig &config) : mConfig(config) {
+  /* Create the game rules */
+}
+
+void GameRules::reset() {
+  /* Start a new game (reload counters are sized on the next step) */
+
+  // Reset game state
+  mReloadCounters.clear();
+  mTimestep = 0;
+  mTerminated = false;
+  mTruncated = false;
+}
+
+void GameRules::restore(const std::vector<float> &reloadCounters, int timestep,
+                        bool terminated, bool truncated) {
+  /* Restore game state (see Engine::restoreState) */
+
+  // Restore game state
+  mReloadCounters = reloadCounters;
+  mTimestep = timestep;
+  mTerminated = terminated;
+  mTruncated = truncated;
+}
+
+const std::vector<CollisionEvent> &
+GameRules::step(Engine &engine, const float *actions, float *rewards) {
+  /* Apply actions, step the engine forward, and score the step
+     Input: actions of shape (num_tanks, 3), see Engine::applyActions, reward
+     buffer of shape (num_tanks)
+     Returns the collision events of the step, see Engine::step
+     Note: rows are ordered by ascending tank id, see Engine::getTankIds
+     Note: a hit terminates the game, exceeding maxTimesteps truncates it
+  */
+
+  // Reset reload counters when tanks have been added or removed
+  auto [numTanks, stateSize] = engine.getAllTankStatesDimensions();
+
+  if (mReloadCounters.size() != numTanks) {
+    mReloadCounters.assign(numTanks, 0.0f);
+  }
+
+  // Apply actions, and handle reload counters
+  engine.applyActions(actions, mReloadCounters.data(), mConfig.reloadDelay);
+
+  // Step the engine
+  const std::vector<CollisionEvent> &events = engine.step();
+
+  // Penalize every step, and reward movement
+  mTankStates.resize(numTanks * stateSize);
+  engine.getAllTankStates(mTankStates.data());
+
+  double velocityRange = mConfig.velocityRange;
+
+  for (size_t row = 0; row < numTanks; row++) {
+    const float *state = mTankStates.data() + row * stateSize;
+
+    // Normalize local velocities between -1.0 and 1.0 (as in observations)
+    float velocityX =
+        std::clamp<double>(state[5], -velocityRange, velocityRange) /
+        velocityRange;
+    float velocityY =
+        std::clamp<double>(state[6], -velocityRange, velocityRange) /
+        velocityRange;
+
+    rewards[row] = -mConfig.timePenalty +
+                   mConfig.speedReward * std::abs(velocityX) +
+                   mConfig.lateralReward * velocityY;
+  }
+
+  // Gather unique tank hits (a tank may be hit multiple times)
+  mHits.clear();
+
+  for (const CollisionEvent &event : events) {
+    if (event.categoryBits == CategoryBits::TANK_BODY &&
+        std::find(mHits.begin(), mHits.end(), event) == mHits.end()) {
+      mHits.push_back(event);
+    }
+  }
+
+  // Reward the shooter, and penalize the hit tank
+  if (!mHits.empty()) {
+    mTankIds = engine.getTankIds();
+
+    // Tank ids are tagged ids in ascending slot order, a stale id (of a
+    // removed tank) matches no tank
+    auto rewardTank = [&](RegistryId tankId, float reward) {
+      auto tankIdIt =
+          std::lower_bound(mTankIds.begin(), mTankIds.end(), tankId,
+                           [](RegistryId a, RegistryId b) {
+                             return getRegistryIndex(a) < getRegistryIndex(b);
+                           });
+
+      if (tankIdIt != mTankIds.end() && *tankIdIt == tankId) {
+        rewards[tankIdIt - mTankIds.begin()] += reward;
+      }
+    };
+
+    for (const CollisionEvent &hit : mHits) {
+      rewardTank(hit.srcId, mConfig.hitReward);
+      rewardTank(hit.hitId, -mConfig.hitReward);
+    }
+  }
+
+  // Check termination (a tank was hit) and truncation conditions
+  mTerminated = !mHits.empty();
+  mTruncated = mConfig.maxTimesteps != -1 && mTimestep > mConfig.maxTimesteps;
+  mTimestep++;
+
+  return events;
+}
+
+const GameRulesConfig &GameRules::getConfig() {
+  /* Get the game rules config */
+
+  // Return config
+  return mConfig;
+}
+
+const std::vector<float> &GameRules::getReloadCounters() {
+  /* Get the reload counter of each tank (in steps) */
+
+  // Return reload counters
+  return mReloadCounters;
+}
+
+int GameRules::getTimestep() {
+  /* Get the number of steps played */
+
+  // Return timestep
+  return mTimestep;
+}
+
+bool GameRules::isTerminated() {
+  /* Check whether the latest step ended the game (a tank was hit) */
+
+  // Return termination
+  return mTerminated;
+}
+
+bool GameRules::isTruncated() {
+  /* Check whether the latest step exceeded the step limit */
+
+  // Return truncation
+  return mTruncated;
+}
@@ -57,6 +57,13 @@ float Obstacle::getRadius() {
   return b2Shape_GetCircle(mObstacleShapeId).radius;
 };
 
+const ObstacleConfig &Obstacle::getConfig() {
+  /* Get the config the obstacle was created with */
+
+  // Return config
+  return mObstacleConfig;
+};
+
 std::vector<std::pair<b2ShapeId, b2HexColor>> Obstacle::getShapeIdsAndColors() {
   /* Get shape and color of the obstacle (for rendering) */
 
@@ -0,0 +1,233 @@
+// Tank Game (@kennedyengineering)
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+
+#include "raycast.hpp"
+
+using namespace TankGame;
+
+void RayCastScene::clear() {
+  /* Remove all shapes from the scene */
+
+  // Clear circles
+  mCircleX.clear();
+  mCircleY.clear();
+  mCircleRadius.clear();
+  mCircleOwners.clear();
+
+  // Clear boxes
+  for (size_t edgeNum = 0; edgeNum < 4; edgeNum++) {
+    mBoxNormalX[edgeNum].clear();
+    mBoxNormalY[edgeNum].clear();
+    mBoxOffset[edgeNum].clear();
+  }
+  mBoxOwners.clear();
+}
+
+void RayCastScene::addCircle(b2Vec2 center, float radius, uint32_t owner) {
+  /* Add a circle (in world coordinates) to the scene
+     Input: owner tag, rays cast with a matching excludeOwner ignore the shape
+  */
+
+  // Append circle
+  mCircleX.push_back(center.x);
+  mCircleY.push_back(center.y);
+  mCircleRadius.push_back(radius);
+  mCircleOwners.push_back(owner);
+}
+
+void RayCastScene::addBox(const b2Polygon &polygon, b2Transform transform,
+                          uint32_t owner) {
+  /* Add a box to the scene
+     Input: four sided polygon (in local coordinates), transform to world
+     coordinates, owner tag (see addCircle)
+  */
+
+  // Check input
+  if (polygon.count != 4 || polygon.radius != 0.0f) {
+    throw std::invalid_argument("Ray cast scene only supports sharp boxes.");
+  }
+
+  // Store each edge as a world space plane (normal, offset)
+  for (size_t edgeNum = 0; edgeNum < 4; edgeNum++) {
+    b2Vec2 normal = b2RotateVector(transform.q, polygon.normals[edgeNum]);
+    b2Vec2 vertex = b2TransformPoint(transform, polygon.vertices[edgeNum]);
+
+    mBoxNormalX[edgeNum].push_back(normal.x);
+    mBoxNormalY[edgeNum].push_back(normal.y);
+    mBoxOffset[edgeNum].push_back(b2Dot(normal, vertex));
+  }
+  mBoxOwners.push_back(owner);
+}
+
+void RayCastScene::addShape(b2ShapeId shapeId, uint32_t owner) {
+  /* Add a box2d circle or box shape to the scene, at its current position */
+
+  // Get the shape transform
+  b2Transform transform = b2Body_GetTransform(b2Shape_GetBody(shapeId));
+
+  // Add the shape
+  switch (b2Shape_GetType(shapeId)) {
+  case b2_circleShape: {
+    b2Circle circle = b2Shape_GetCircle(shapeId);
+    addCircle(b2TransformPoint(transform, circle.center), circle.radius, owner);
+    break;
+  }
+
+  case b2_polygonShape: {
+    addBox(b2Shape_GetPolygon(shapeId), transform, owner);
+    break;
+  }
+
+  default: {
+    throw std::invalid_argument("Ray cast scene only supports circles and "
+                                "boxes.");
+  }
+  }
+}
+
+size_t RayCastScene::getCircleCount() const {
+  /* Get the number of circles in the scene */
+
+  // Return count
+  return mCircleOwners.size();
+}
+
+size_t RayCastScene::getBoxCount() const {
+  /* Get the number of boxes in the scene */
+
+  // Return count
+  return mBoxOwners.size();
+}
+
+static bool reportsCircleOverlap() {
+  /* Check if box2d reports rays starting inside a circle as hits at a
+     fraction of zero (box2d v3.1), rather than misses (box2d v3.0) */
+
+  static const bool reportsOverlap = [] {
+    b2Circle circle = {(b2Vec2){0.0f, 0.0f}, 1.0f};
+    b2RayCastInput input = {(b2Vec2){0.0f, 0.0f}, (b2Vec2){2.0f, 0.0f}, 1.0f};
+    return b2RayCastCircle(&input, &circle).hit;
+  }();
+
+  return reportsOverlap;
+}
+
+static bool reportsPolygonOverlap() {
+  /* Check if box2d reports rays starting inside a polygon as hits at a
+     fraction of zero (see reportsCircleOverlap) */
+
+  static const bool reportsOverlap = [] {
+    b2Polygon polygon = b2MakeBox(1.0f, 1.0f);
+    b2RayCastInput input = {(b2Vec2){0.0f, 0.0f}, (b2Vec2){2.0f, 0.0f}, 1.0f};
+    return b2RayCastPolygon(&input, &polygon).hit;
+  }();
+
+  return reportsOverlap;
+}
+
+float RayCastScene::castRay(b2Vec2 origin, b2Vec2 translation,
+                            uint32_t excludeOwner) const {
+  /* Cast a ray against every shape in the scene
+     Input: ray origin, ray translation, owner tag of shapes to ignore
+     (NO_OWNER ignores nothing)
+     Returns the fraction of the translation to the closest hit (1.0 if there
+     is no hit), or 0.0 if the ray starts on or inside a shape that box2d
+     reports as a hit at a fraction of zero
+     Note: follows the box2d ray cast rules (b2RayCastCircle and
+     b2RayCastPolygon), including whether the linked box2d version reports
+     rays starting inside a shape as hits
+  */
+
+  float closestFraction = 1.0f;
+
+  // Intersect circles (box2d b2RayCastCircle)
+  float length = b2Length(translation);
+
+  if (length > 0.0f) {
+    b2Vec2 direction = b2MulSV(1.0f / length, translation);
+    float maxDistance = length;
+    bool circleOverlap = reportsCircleOverlap();
+
+    for (size_t circleNum = 0; circleNum < mCircleOwners.size(); circleNum++) {
+      if (mCircleOwners[circleNum] == excludeOwner &&
+          excludeOwner != NO_OWNER) {
+        continue;
+      }
+
+      float sx = origin.x - mCircleX[circleNum];
+      float sy = origin.y - mCircleY[circleNum];
+      float t = -(sx * direction.x + sy * direction.y);
+      float cx = sx + t * direction.x;
+      float cy = sy + t * direction.y;
+      float rr = mCircleRadius[circleNum] * mCircleRadius[circleNum];
+      float cc = cx * cx + cy * cy;
+
+      if (cc > rr) {
+        continue;
+      }
+
+      float distance = t - std::sqrt(rr - cc);
+
+      // Check for a ray starting inside the circle, or on its boundary
+      if ((circleOverlap && sx * sx + sy * sy < rr) || distance == 0.0f) {
+        return 0.0f;
+      }
+
+      if (distance > 0.0f && distance <= maxDistance) {
+        maxDistance = distance;
+        closestFraction = distance / length;
+      }
+    }
+  }
+
+  // Intersect boxes (box2d b2RayCastPolygon)
+  bool polygonOverlap = reportsPolygonOverlap();
+
+  for (size_t boxNum = 0; boxNum < mBoxOwners.size(); boxNum++) {
+    if (mBoxOwners[boxNum] == excludeOwner && excludeOwner != NO_OWNER) {
+      continue;
+    }
+
+    float lower = 0.0f;
+    float upper = closestFraction;
+    bool entering = false;
+    bool miss = false;
+
+    for (size_t edgeNum = 0; edgeNum < 4; edgeNum++) {
+      float normalX = mBoxNormalX[edgeNum][boxNum];
+      float normalY = mBoxNormalY[edgeNum][boxNum];
+      float numerator = mBoxOffset[edgeNum][boxNum] -
+                        (normalX * origin.x + normalY * origin.y);
+      float denominator = normalX * translation.x + normalY * translation.y;
+
+      if (denominator == 0.0f) {
+        miss |= numerator < 0.0f;
+      } else if (denominator < 0.0f && numerator < lower * denominator) {
+        lower = numerator / denominator;
+        entering = true;
+      } else if (denominator > 0.0f && numerator < upper * denominator) {
+        upper = numerator / denominator;
+      }
+    }
+
+    if (miss || upper < lower) {
+      continue;
+    }
+
+    // Check for a ray starting inside the box, or on its boundary
+    if (!entering) {
+      if (polygonOverlap) {
+        return 0.0f;
+      }
+      continue;
+    }
+
+    closestFraction = lower;
+  }
+
+  // Return closest hit
+  return closestFraction;
+}
@@ -1,6 +1,7 @@
 // Tank Game (@kennedyengineering)
 
 #include <cmath>
+#include <cstring>
 #include <stdexcept>
 
 #include "render.hpp"
@@ -84,6 +85,78 @@ void RenderEngine::renderCircle(b2Vec2 center, float radius, b2HexColor color) {
   cairo_fill(mContext);
 }
 
+void RenderEngine::renderCircles(const std::vector<b2Vec2> &centers,
+                                 float radius, b2HexColor color) {
+  /* Render many circles of the same radius and color
+     Note: all circles are accumulated into one path, and filled once
+  */
+
+  // Check input
+  if (centers.empty()) {
+    return;
+  }
+
+  // Set color
+  RGB_t rgb = getRGB(color);
+  cairo_set_source_rgb(mContext, rgb[0], rgb[1], rgb[2]);
+
+  // Create path (one closed sub-path per circle)
+  for (const b2Vec2 &center : centers) {
+    cairo_new_sub_path(mContext);
+    cairo_arc(mContext, center.x, center.y, radius, 0, 2.0f * M_PIf);
+  }
+
+  // Fill color
+  cairo_fill(mContext);
+}
+
+void RenderEngine::saveBackground() {
+  /* Store a copy of the surface as the background */
+
+  // Get surface size
+  size_t size = getSurfaceSize();
+
+  // Copy surface into background
+  const unsigned char *data = getData();
+  mBackground.assign(data, data + size);
+}
+
+void RenderEngine::restoreBackground() {
+  /* Replace the surface with the stored background */
+
+  // Check if a background has been stored
+  if (mBackground.empty()) {
+    throw std::runtime_error("No background has been saved.");
+  }
+
+  // Copy background into surface
+  std::memcpy(getData(), mBackground.data(), mBackground.size());
+  cairo_surface_mark_dirty(mSurface);
+}
+
+void RenderEngine::setTransform(b2Vec2 center, float scale, float angle) {
+  /* Set the view transform applied to subsequent drawing
+     Input: point drawn at the center of the surface, scale (pixels per unit),
+     rotation (radians)
+  */
+
+  // Build transform (center of surface, scaled, rotated, about center point)
+  auto [width, height] = getDimensions();
+
+  cairo_identity_matrix(mContext);
+  cairo_translate(mContext, width / 2.0, height / 2.0);
+  cairo_scale(mContext, scale, scale);
+  cairo_rotate(mContext, angle);
+  cairo_translate(mContext, -center.x, -center.y);
+}
+
+void RenderEngine::resetTransform() {
+  /* Reset the view transform (drawing in pixel coordinates) */
+
+  // Reset transform
+  cairo_identity_matrix(mContext);
+}
+
 void RenderEngine::writeToPng(const std::filesystem::path &filePath) {
   /* Write the current image surface to disk */
 
@@ -100,27 +173,87 @@ std::vector<unsigned char> RenderEngine::getBuffer() {
   /* Get a copy of the surface as a RGB pixel buffer */
 
   // Get image dimensions
-  int height = cairo_image_surface_get_height(mSurface);
-  int stride = cairo_image_surface_get_stride(mSurface);
-  int size = height * stride;
+  auto [width, height] = getDimensions();
+
+  // Convert surface into pixel buffer
+  std::vector<unsigned char> pixelBuffer(width * height * getChannels());
+  copyToRGB(pixelBuffer.data());
+
+  // Return pixel buffer
+  return pixelBuffer;
+}
+
+void RenderEngine::copyToRGB(unsigned char *rgbBuffer) {
+  /* Convert the surface into a caller provided RGB pixel buffer
+     Input: buffer of shape (height, width, 3)
+  */
+
+  // Get image dimensions
+  auto [width, height] = getDimensions();
+  int stride = getStride();
 
   // Get data
-  cairo_surface_flush(mSurface);
-  unsigned char *data = cairo_image_surface_get_data(mSurface);
+  const unsigned char *data = getData();
+
+  // Swizzle each row from BGRX into RGB (removing the unused alpha channel)
+  for (int row = 0; row < height; row++) {
+    const unsigned char *src = data + row * stride;
+    unsigned char *dst = rgbBuffer + row * width * 3;
+
+    for (int col = 0; col < width; col++) {
+      dst[0] = src[2];
+      dst[1] = src[1];
+      dst[2] = src[0];
+      src += 4;
+      dst += 3;
+    }
+  }
+}
+
+void RenderEngine::copyToGray(unsigned char *grayBuffer) {
+  /* Convert the surface into a caller provided grayscale pixel buffer
+     Input: buffer of shape (height, width)
+     Note: uses integer ITU-R BT.601 luma weights
+  */
+
+  // Get image dimensions
+  auto [width, height] = getDimensions();
+  int stride = getStride();
+
+  // Get data
+  const unsigned char *data = getData();
 
-  // Copy data into vector and remove unused alpha channel
-  std::vector<unsigned char> pixelBuffer;
-  pixelBuffer.reserve(size);
+  // Convert each row from BGRX into luminance
+  for (int row = 0; row < height; row++) {
+    const unsigned char *src = data + row * stride;
+    unsigned char *dst = grayBuffer + row * width;
 
-  // Remove the unused alpha channel
-  for (int i = 0; i < size; i += 4) {
-    pixelBuffer.push_back(data[i + 2]);
-    pixelBuffer.push_back(data[i + 1]);
-    pixelBuffer.push_back(data[i]);
+    for (int col = 0; col < width; col++) {
+      dst[col] = (29 * src[0] + 150 * src[1] + 77 * src[2] + 128) >> 8;
+      src += 4;
+    }
   }
+}
 
-  // Return pixel buffer
-  return pixelBuffer;
+unsigned char *RenderEngine::getData() {
+  /* Get the surface memory (without copying)
+     Note: pixels are stored as 32 bit native endian XRGB words (BGRX bytes on
+     little endian machines), rows are getStride() bytes apart, and the memory
+     is owned by the render engine
+  */
+
+  // Flush pending drawing
+  cairo_surface_flush(mSurface);
+
+  // Return data
+  return cairo_image_surface_get_data(mSurface);
+}
+
+int RenderEngine::getStride() {
+  /* Get the number of bytes between rows of the surface */
+
+  // Return stride
+  return cairo_image_surface_get_stride(mSurface);
 }
 
 int RenderEngine::getChannels() {
@@ -130,6 +263,20 @@ int RenderEngine::getChannels() {
   return 3;
 }
 
+size_t RenderEngine::getSurfaceSize() {
+  /* Get the size of the surface memory (in bytes) */
+
+  // Return size
+  return cairo_image_surface_get_height(mSurface) * getStride();
+}
+
+size_t RenderEngine::getBackgroundSize() {
+  /* Get the size of the stored background (in bytes) */
+
+  // Return size
+  return mBackground.capacity();
+}
+
 std::pair<int, int> RenderEngine::getDimensions() {
   /* Get the dimensions of the surface */
 
@@ -1,6 +1,7 @@
 // Tank Game (@kennedyengineering)
 
 #include <algorithm>
+#include <cmath>
 
 #include "categories.hpp"
 #include "tank.hpp"
@@ -9,6 +10,26 @@ using namespace TankGame;
 
 // TODO: check for valid tankConfig values
 
+// Minimum number of lidar rays cast by each thread pool task
+static constexpr size_t LIDAR_MIN_RANGE = 64;
+
+BodyState TankGame::getBodyState(b2BodyId bodyId) {
+  /* Get the transform and velocity of a body */
+
+  // Return state
+  return {b2Body_GetPosition(bodyId), b2Body_GetRotation(bodyId),
+          b2Body_GetLinearVelocity(bodyId), b2Body_GetAngularVelocity(bodyId)};
+}
+
+void TankGame::setBodyState(b2BodyId bodyId, const BodyState &bodyState) {
+  /* Set the transform and velocity of a body */
+
+  // Apply state
+  b2Body_SetTransform(bodyId, bodyState.position, bodyState.rotation);
+  b2Body_SetLinearVelocity(bodyId, bodyState.linearVelocity);
+  b2Body_SetAngularVelocity(bodyId, bodyState.angularVelocity);
+}
+
 Tank::Tank(TankId tankId, const TankConfig &tankConfig, b2WorldId worldId)
     : mTankId(tankId), mTankConfig(tankConfig), mWorldId(worldId) {
   /* Create the tank */
@@ -95,6 +116,15 @@ Tank::Tank(TankId tankId, const TankConfig &tankConfig, b2WorldId worldId)
 
   mGunMotorJointId = b2CreateMotorJoint(mWorldId, &jointDef);
 
+  // Precompute lidar ray rotations (relative to the tank body)
+  float angleResolution = 2 * b2_pi / mTankConfig.lidarPoints;
+  mLidarRotations.reserve(mTankConfig.lidarPoints);
+
+  for (size_t pointNum = 0; pointNum < mTankConfig.lidarPoints; pointNum++) {
+    float angle = angleResolution * pointNum - b2_pi / 2.0f;
+    mLidarRotations.push_back(b2MakeRot(angle));
+  }
+
   // Reserve space in lidar data vector
   mLidarData.reserve(mTankConfig.lidarPoints);
 }
@@ -114,6 +144,80 @@ Tank::~Tank() {
   b2DestroyBody(mRightTreadBodyId);
 }
 
+void Tank::reset() {
+  /* Return the tank to its spawn pose, at rest with the gun centered */
+
+  // Move every body to the spawn pose, and stop it
+  b2Vec2 position = {mTankConfig.positionX, mTankConfig.positionY};
+  b2Rot rotation = b2MakeRot(mTankConfig.angle);
+
+  for (b2BodyId bodyId :
+       {mTankBodyId, mGunBodyId, mLeftTreadBodyId, mRightTreadBodyId}) {
+    b2Body_SetTransform(bodyId, position, rotation);
+    b2Body_SetLinearVelocity(bodyId, b2Vec2_zero);
+    b2Body_SetAngularVelocity(bodyId, 0.0f);
+  }
+
+  // Center the gun
+  b2Joint_WakeBodies(mGunMotorJointId);
+  b2MotorJoint_SetAngularOffset(mGunMotorJointId, 0.0f);
+
+  // Discard the previous lidar scan
+  mLidarData.clear();
+}
+
+void Tank::reset(const TankConfig &tankConfig) {
+  /* Move the tank to a new spawn pose, at rest with the gun centered
+     Note: only the pose (position and angle) is applied, other parameters
+     are kept
+  */
+
+  // Update spawn pose
+  mTankConfig.positionX = tankConfig.positionX;
+  mTankConfig.positionY = tankConfig.positionY;
+  mTankConfig.angle = tankConfig.angle;
+
+  // Reset the tank
+  reset();
+}
+
+const TankConfig &Tank::getConfig() {
+  /* Get the config of the tank (holding its latest spawn pose) */
+
+  // Return config
+  return mTankConfig;
+}
+
+TankState Tank::getState() {
+  /* Get the dynamic state of the tank (body transforms and velocities, and
+     the gun motor target)
+  */
+
+  // Return state
+  return {getBodyState(mTankBodyId), getBodyState(mGunBodyId),
+          getBodyState(mLeftTreadBodyId), getBodyState(mRightTreadBodyId),
+          b2MotorJoint_GetAngularOffset(mGunMotorJointId)};
+}
+
+void Tank::setState(const TankState &tankState) {
+  /* Restore the dynamic state of the tank, see getState
+     Note: the joint solver state (warm starting) is not restored
+  */
+
+  // Restore bodies
+  setBodyState(mTankBodyId, tankState.tankBody);
+  setBodyState(mGunBodyId, tankState.gunBody);
+  setBodyState(mLeftTreadBodyId, tankState.leftTreadBody);
+  setBodyState(mRightTreadBodyId, tankState.rightTreadBody);
+
+  // Restore the gun motor target
+  b2Joint_WakeBodies(mGunMotorJointId);
+  b2MotorJoint_SetAngularOffset(mGunMotorJointId, tankState.gunAngleOffset);
+
+  // Discard the previous lidar scan
+  mLidarData.clear();
+}
+
 void Tank::rotateGun(float angle) {
   /* Rotate the tank gun to a set angle (in radians) */
 
@@ -125,20 +229,39 @@ void Tank::rotateGun(float angle) {
   b2MotorJoint_SetAngularOffset(mGunMotorJointId, angle);
 }
 
-b2ShapeId Tank::fireGun() {
-  /* Fire the tank gun */
-
-  // Create the projectile body
-  b2BodyDef projectileBodyDef = b2DefaultBodyDef();
-  projectileBodyDef.type = b2_dynamicBody;
-  projectileBodyDef.position = b2Body_GetPosition(mGunBodyId);
-  projectileBodyDef.rotation = b2Body_GetRotation(mGunBodyId);
+b2ShapeId Tank::fireGun(void *projectileUserData) {
+  /* Fire the tank gun
+     Input: user data of the projectile shape, which must read as the source
+     TankId (see Engine::fireTankGun)
+  */
 
-  projectileBodyDef.linearVelocity =
+  // Launch the projectile from the gun
+  BodyState projectileState;
+  projectileState.position = b2Body_GetPosition(mGunBodyId);
+  projectileState.rotation = b2Body_GetRotation(mGunBodyId);
+  projectileState.linearVelocity =
       b2Body_GetWorldVector(mGunBodyId,
                             (b2Vec2){0, mTankConfig.projectileVelocity}) +
       b2Body_GetLinearVelocity(mTankBodyId);
+  projectileState.angularVelocity = 0.0f;
+
+  return spawnProjectile(projectileUserData, projectileState);
+}
+
+b2ShapeId Tank::spawnProjectile(void *projectileUserData,
+                                const BodyState &projectileState) {
+  /* Create a projectile of this tank in a given state
+     Input: user data of the projectile shape (see fireGun), projectile body
+     state
+  */
 
+  // Create the projectile body
+  b2BodyDef projectileBodyDef = b2DefaultBodyDef();
+  projectileBodyDef.type = b2_dynamicBody;
+  projectileBodyDef.position = projectileState.position;
+  projectileBodyDef.rotation = projectileState.rotation;
+  projectileBodyDef.linearVelocity = projectileState.linearVelocity;
+  projectileBodyDef.angularVelocity = projectileState.angularVelocity;
   projectileBodyDef.isBullet = true;
   b2BodyId projectileBodyId = b2CreateBody(mWorldId, &projectileBodyDef);
 
@@ -147,7 +270,7 @@ b2ShapeId Tank::fireGun() {
   projectileShapeDef.filter.categoryBits = CategoryBits::PROJECTILE;
   projectileShapeDef.filter.maskBits =
       CategoryBits::ALL & ~CategoryBits::TANK_GUN;
-  projectileShapeDef.userData = new TankId(mTankId);
+  projectileShapeDef.userData = projectileUserData;
 
   b2Polygon projectilePolygon = b2MakeOffsetBox(
       mTankConfig.gunWidth / 2.0f, mTankConfig.gunWidth / 2.0f,
@@ -184,24 +307,27 @@ void Tank::moveRightTread(float speed) {
   b2Body_SetLinearVelocity(mRightTreadBodyId, rightTreadWorldVelocity);
 }
 
-void Tank::scanLidar() {
+void Tank::scanLidar(ThreadPool *threadPool, const RayCastScene *rayCastScene) {
   /* Perform a lidar scan using default range */
 
-  scanLidar(mTankConfig.lidarRange);
+  scanLidar(mTankConfig.lidarRange, threadPool, rayCastScene);
 }
 
-void Tank::scanLidar(float range) {
+void Tank::scanLidar(float range, ThreadPool *threadPool,
+                     const RayCastScene *rayCastScene) {
   /* Perform a lidar scan using specified range
-     Input: range of the lidar scan (meters)
+     Input: range of the lidar scan (meters), optional thread pool to split the
+     rays across, optional analytic ray cast scene to use instead of box2d (the
+     tank shapes must be tagged with the tank id)
      Note: If no objects are within ~range~ distance, that point will be ~range~
      distance away
+     Note: the output is identical with or without a thread pool, as each ray
+     writes only its own point
   */
 
-  // Compute angle resolution (radians per point)
-  float angleResolution = 2 * b2_pi / mTankConfig.lidarPoints;
-
-  // Find start position
-  b2Vec2 startPosition = b2Body_GetPosition(mTankBodyId);
+  // Find start position (body transform is read once per scan)
+  b2Transform transform = b2Body_GetTransform(mTankBodyId);
+  b2Vec2 startPosition = transform.p;
 
   // Construct query filter
   b2QueryFilter viewFilter = {.categoryBits = CategoryBits::ALL,
@@ -235,8 +361,11 @@ void Tank::scanLidar(float range) {
       }
     }
 
-    // Update context if not colliding with self
-    if (fraction > 0.0f) {
+    // Update context if not colliding with self (a hit at a fraction of zero,
+    // a ray starting inside a shape, ends the ray cast)
+    if (fraction == 0.0f) {
+      ctx->fraction = 0.0f;
+    } else if (fraction > 0.0f) {
       if (ctx->fraction > fraction) {
         ctx->fraction = fraction;
         ctx->point = point;
@@ -246,42 +375,269 @@ void Tank::scanLidar(float range) {
     return fraction;
   };
 
-  // Clear vector
-  mLidarData.clear();
+  // Define raycast against a single culled shape (mirrors the box2d world ray
+  // cast and its callback, so results are bit-identical)
+  auto castLidarShape = [](const LidarShape &shape, b2Vec2 origin,
+                           b2Vec2 translation) -> b2CastOutput {
+    b2RayCastInput input;
+    input.origin = b2InvTransformPoint(shape.transform, origin);
+    input.translation = b2InvRotateVector(shape.transform.q, translation);
+    input.maxFraction = 1.0f;
+
+    b2CastOutput output = (shape.type == b2_circleShape)
+                              ? b2RayCastCircle(&input, &shape.circle)
+                              : b2RayCastPolygon(&input, &shape.polygon);
+    output.point = b2TransformPoint(shape.transform, output.point);
+
+    return output;
+  };
+
+  // Cull shapes into angular sectors
+  bool culling = rayCastScene == nullptr && mTankConfig.lidarCulling;
+
+  if (culling) {
+    cullLidarShapes(transform, range);
+  }
+
+  // Define scan of a range of points
+  auto scanRange = [&](size_t startIndex, size_t endIndex,
+                       unsigned int workerIndex) {
+    for (size_t pointNum = startIndex; pointNum < endIndex; pointNum++) {
+      // Compute translation vector
+      b2Vec2 endPosition =
+          b2TransformPoint(transform, b2RotateVector(mLidarRotations[pointNum],
+                                                     (b2Vec2){range, 0}));
+      b2Vec2 translation = b2Sub(endPosition, startPosition);
+
+      // Perform raycast
+      RayCastContext context = {
+          .point = endPosition, .fraction = 1.0f, .tankId = mTankId};
+
+      if (rayCastScene != nullptr) {
+        context.fraction =
+            rayCastScene->castRay(startPosition, translation, mTankId);
+        if (context.fraction < 1.0f) {
+          context.point =
+              b2MulAdd(startPosition, context.fraction, translation);
+        }
+      } else if (culling) {
+        // Test the walls, and only the shapes within this ray's sector
+        // (stopping at a hit at a fraction of zero, like the callback)
+        auto castShape = [&](const LidarShape &shape) {
+          b2CastOutput output =
+              castLidarShape(shape, startPosition, translation);
+          if (output.hit && output.fraction == 0.0f) {
+            context.fraction = 0.0f;
+          } else if (output.hit && output.fraction > 0.0f &&
+                     context.fraction > output.fraction) {
+            context.fraction = output.fraction;
+            context.point = output.point;
+          }
+        };
+
+        for (size_t wallNum = 0;
+             wallNum < mLidarWalls.size() && context.fraction > 0.0f;
+             wallNum++) {
+          castShape(mLidarWalls[wallNum]);
+        }
+
+        for (uint32_t offset = mLidarSectorOffsets[pointNum];
+             offset < mLidarSectorOffsets[pointNum + 1] &&
+             context.fraction > 0.0f;
+             offset++) {
+          castShape(mLidarCandidates[mLidarSectorCandidates[offset]]);
+        }
+      } else {
+        b2World_CastRay(mWorldId, startPosition, translation, viewFilter,
+                        rayCastCallback, &context);
+      }
+
+      // Rays starting inside a shape (reported by box2d as a hit at a fraction
+      // of zero) see nothing, whichever shapes were tested before
+      if (context.fraction == 0.0f) {
+        context.point = endPosition;
+      }
+
+      // Note: if you wanted to return a value of zero if no objects are within
+      // range, check for a fraction of 1.0f here and set the context.point to
+      // {0}.
+
+      // Update vector
+      mLidarData[pointNum] = context.point;
+    }
+  };
 
   // Populate vector
-  for (size_t pointNum = 0; pointNum < mTankConfig.lidarPoints; pointNum++) {
-    // Compute angle
-    float angle = angleResolution * pointNum - b2_pi / 2.0f;
+  mLidarData.resize(mTankConfig.lidarPoints);
+
+  if (threadPool != nullptr) {
+    threadPool->parallelFor(mTankConfig.lidarPoints, LIDAR_MIN_RANGE,
+                            scanRange);
+  } else {
+    scanRange(0, mTankConfig.lidarPoints, 0);
+  }
+}
+
+void Tank::cullLidarShapes(b2Transform transform, float range) {
+  /* Sort the shapes within lidar range into angular sectors
+     Input: tank body transform, range of the lidar scan (meters)
+     Note: walls are tested by every ray, other shapes are only tested by the
+     rays within the angle their bounding circle subtends (plus one ray of
+     margin on each side), the own tank shapes are never tested
+  */
+
+  b2Vec2 startPosition = transform.p;
+  size_t lidarPoints = mTankConfig.lidarPoints;
+
+  // Gather shapes within range (one broadphase query per scan)
+  mLidarWalls.clear();
+  mLidarCandidates.clear();
+
+  auto overlapCallback = [](b2ShapeId shapeId, void *context) -> bool {
+    Tank *tank = static_cast<Tank *>(context);
+    CategoryBits categoryBits =
+        static_cast<CategoryBits>(b2Shape_GetFilter(shapeId).categoryBits);
+
+    // Check if overlapping with self
+    TankId *otherTankIdPtr =
+        static_cast<TankId *>(b2Shape_GetUserData(shapeId));
+    if (otherTankIdPtr != nullptr && *otherTankIdPtr == tank->mTankId &&
+        (categoryBits == CategoryBits::TANK_BODY ||
+         categoryBits == CategoryBits::TANK_GUN)) {
+      return true;
+    }
+
+    // Store the shape
+    LidarShape shape;
+    shape.transform = b2Body_GetTransform(b2Shape_GetBody(shapeId));
+    shape.type = b2Shape_GetType(shapeId);
+
+    if (shape.type == b2_circleShape) {
+      shape.circle = b2Shape_GetCircle(shapeId);
+    } else if (shape.type == b2_polygonShape) {
+      shape.polygon = b2Shape_GetPolygon(shapeId);
+    } else {
+      return true;
+    }
 
-    // Compute translation vector
-    b2Rot rotation = b2MakeRot(angle);
-    b2Vec2 endPosition = b2Body_GetWorldPoint(
-        mTankBodyId, b2RotateVector(rotation, (b2Vec2){range, 0}));
-    b2Vec2 translation = b2Sub(endPosition, startPosition);
+    if (categoryBits == CategoryBits::WALL) {
+      tank->mLidarWalls.push_back(shape);
+    } else {
+      tank->mLidarCandidates.push_back(shape);
+    }
+
+    return true;
+  };
+
+  b2Vec2 extent = {range + 1.0f, range + 1.0f}; // (with margin)
+  b2AABB aabb = {b2Sub(startPosition, extent), b2Add(startPosition, extent)};
+  b2QueryFilter viewFilter = {.categoryBits = CategoryBits::ALL,
+                              .maskBits = CategoryBits::ALL};
+  b2World_OverlapAABB(mWorldId, aabb, viewFilter, overlapCallback, this);
+
+  // Compute the sector (range of ray indices) of each candidate
+  float angleResolution = 2 * b2_pi / lidarPoints;
+  float bodyAngle = b2Rot_GetAngle(transform.q);
+  std::vector<std::pair<long long, long long>> sectors;
+  sectors.reserve(mLidarCandidates.size());
+
+  for (const LidarShape &shape : mLidarCandidates) {
+    // Compute bounding circle
+    b2Vec2 center;
+    float radius;
+
+    if (shape.type == b2_circleShape) {
+      center = b2TransformPoint(shape.transform, shape.circle.center);
+      radius = shape.circle.radius;
+    } else {
+      center = b2TransformPoint(shape.transform, shape.polygon.centroid);
+      radius = 0.0f;
+      for (int vertexNum = 0; vertexNum < shape.polygon.count; vertexNum++) {
+        radius =
+            std::max(radius, b2Distance(shape.polygon.centroid,
+                                        shape.polygon.vertices[vertexNum]));
+      }
+      radius += shape.polygon.radius;
+    }
+
+    // Compute sector (all rays if the tank is inside the bounding circle)
+    float distance = b2Distance(startPosition, center);
+
+    if (distance - radius > range + 1.0f) {
+      sectors.emplace_back(0, 0);
+    } else if (distance <= radius + 1e-3f) {
+      sectors.emplace_back(0, lidarPoints);
+    } else {
+      float halfAngle = std::asin(radius / distance);
+      float angle =
+          std::atan2(center.y - startPosition.y, center.x - startPosition.x) -
+          bodyAngle + b2_pi / 2.0f;
+      float centerIndex = angle / angleResolution;
+      float halfWidth = halfAngle / angleResolution + 1.0f;
+
+      long long startIndex = std::floor(centerIndex - halfWidth);
+      long long endIndex = std::ceil(centerIndex + halfWidth) + 1;
+      long long count = std::min<long long>(endIndex - startIndex, lidarPoints);
+      sectors.emplace_back(startIndex, count);
+    }
+  }
+
+  // Build per ray candidate lists (compressed rows)
+  auto wrapIndex = [lidarPoints](long long index) -> size_t {
+    long long points = lidarPoints;
+    return ((index % points) + points) % points;
+  };
+
+  mLidarSectorOffsets.assign(lidarPoints + 1, 0);
 
-    // Perform raycast
-    RayCastContext context = {
-        .point = endPosition, .fraction = 1.0f, .tankId = mTankId};
-    b2World_CastRay(mWorldId, startPosition, translation, viewFilter,
-                    rayCastCallback, &context);
+  for (const auto &[startIndex, count] : sectors) {
+    for (long long index = startIndex; index < startIndex + count; index++) {
+      mLidarSectorOffsets[wrapIndex(index) + 1]++;
+    }
+  }
+
+  for (size_t pointNum = 0; pointNum < lidarPoints; pointNum++) {
+    mLidarSectorOffsets[pointNum + 1] += mLidarSectorOffsets[pointNum];
+  }
 
-    // Note: if you wanted to return a value of zero if no objects are within
-    // range, check for a fraction of 1.0f here and set the context.point to
-    // {0}.
+  mLidarSectorCandidates.resize(mLidarSectorOffsets[lidarPoints]);
+  std::vector<uint32_t> cursors(mLidarSectorOffsets.begin(),
+                                mLidarSectorOffsets.end() - 1);
 
-    // Update vector
-    mLidarData.push_back(context.point);
+  for (size_t candidateNum = 0; candidateNum < sectors.size(); candidateNum++) {
+    const auto &[startIndex, count] = sectors[candidateNum];
+    for (long long index = startIndex; index < startIndex + count; index++) {
+      mLidarSectorCandidates[cursors[wrapIndex(index)]++] = candidateNum;
+    }
   }
 }
 
-std::vector<b2Vec2> Tank::getLidarData() {
+const std::vector<b2Vec2> &Tank::getLidarData() {
   /* Get the lidar data vector */
 
   // Return data
   return mLidarData;
 }
 
+unsigned int Tank::getLidarPoints() {
+  /* Get the number of points in a lidar scan */
+
+  // Return number of points
+  return mTankConfig.lidarPoints;
+}
+
+size_t Tank::getLidarMemoryUsage() {
+  /* Get the memory used by lidar buffers (in bytes) */
+
+  // Return size of lidar buffers
+  return mLidarRotations.capacity() * sizeof(b2Rot) +
+         mLidarData.capacity() * sizeof(b2Vec2) +
+         (mLidarWalls.capacity() + mLidarCandidates.capacity()) *
+             sizeof(LidarShape) +
+         (mLidarSectorOffsets.capacity() + mLidarSectorCandidates.capacity()) *
+             sizeof(uint32_t);
+}
+
 float Tank::getGunAngle() {
   /* Get the current angle of the gun */
 
@@ -290,6 +646,13 @@ float Tank::getGunAngle() {
                          b2Body_GetTransform(mTankBodyId).q);
 }
 
+float Tank::getTreadMaxSpeed() {
+  /* Get the maximum speed of the treads */
+
+  // Return speed (in meters per second)
+  return mTankConfig.treadMaxSpeed;
+}
+
 b2Vec2 Tank::getPosition() {
   /* Get the center of the tank position */
 
@@ -0,0 +1,166 @@
+// Tank Game (@kennedyengineering)
+
+#include <algorithm>
+#include <stdexcept>
+
+#include "thread_pool.hpp"
+
+using namespace TankGame;
+
+ThreadPool::ThreadPool(unsigned int threadCount) : mStopping(false) {
+  /* Create the thread pool */
+
+  // Check input
+  if (threadCount == 0) {
+    throw std::invalid_argument("Thread pool must have at least one thread.");
+  }
+
+  // Launch worker threads
+  mThreads.reserve(threadCount);
+
+  for (unsigned int workerIndex = 0; workerIndex < threadCount; workerIndex++) {
+    mThreads.emplace_back(&ThreadPool::workerLoop, this, workerIndex);
+  }
+}
+
+ThreadPool::~ThreadPool() {
+  /* Destroy the thread pool */
+
+  // Signal worker threads to stop
+  {
+    std::lock_guard<std::mutex> lock(mMutex);
+    mStopping = true;
+  }
+  mTaskCondition.notify_all();
+
+  // Wait for worker threads to finish
+  for (std::thread &thread : mThreads) {
+    thread.join();
+  }
+}
+
+unsigned int ThreadPool::getThreadCount() {
+  /* Get the number of worker threads */
+
+  // Return thread count
+  return mThreads.size();
+}
+
+void ThreadPool::submit(TaskGroup &taskGroup, Task task) {
+  /* Queue a task to run on a worker thread
+     Note: the task receives the index of the worker running it, in
+     [0, getThreadCount())
+  */
+
+  // Queue the task
+  {
+    std::lock_guard<std::mutex> lock(mMutex);
+    taskGroup.pendingTasks++;
+    mTaskQueue.emplace_back(&taskGroup, std::move(task));
+  }
+
+  // Wake a worker
+  mTaskCondition.notify_one();
+}
+
+void ThreadPool::wait(TaskGroup &taskGroup) {
+  /* Block until every task in the group has finished
+     Note: rethrows the first exception raised by a task in the group
+  */
+
+  // Wait for pending tasks
+  std::unique_lock<std::mutex> lock(mMutex);
+  mFinishedCondition.wait(lock,
+                          [&taskGroup] { return taskGroup.pendingTasks == 0; });
+
+  // Propagate task failures
+  if (taskGroup.exception) {
+    std::exception_ptr exception = taskGroup.exception;
+    taskGroup.exception = nullptr;
+    std::rethrow_exception(exception);
+  }
+}
+
+void ThreadPool::parallelFor(size_t itemCount, size_t minRange,
+                             const RangeTask &rangeTask) {
+  /* Split [0, itemCount) into ranges and run them across the worker threads
+     Input: number of items, minimum number of items per range
+     Note: blocks until every range has finished, small workloads run inline
+     on the calling thread with a worker index of 0
+  */
+
+  // Compute number of ranges
+  minRange = std::max<size_t>(minRange, 1);
+  size_t rangeCount =
+      std::min<size_t>(getThreadCount(), (itemCount + minRange - 1) / minRange);
+
+  // Run small workloads inline
+  if (rangeCount <= 1) {
+    if (itemCount > 0) {
+      rangeTask(0, itemCount, 0);
+    }
+    return;
+  }
+
+  // Distribute items evenly across ranges
+  TaskGroup taskGroup;
+  size_t rangeSize = itemCount / rangeCount;
+  size_t remainder = itemCount % rangeCount;
+  size_t startIndex = 0;
+
+  for (size_t rangeNum = 0; rangeNum < rangeCount; rangeNum++) {
+    size_t endIndex = startIndex + rangeSize + (rangeNum < remainder ? 1 : 0);
+
+    submit(taskGroup,
+           [&rangeTask, startIndex, endIndex](unsigned int workerIndex) {
+             rangeTask(startIndex, endIndex, workerIndex);
+           });
+
+    startIndex = endIndex;
+  }
+
+  // Wait for all ranges
+  wait(taskGroup);
+}
+
+void ThreadPool::workerLoop(unsigned int workerIndex) {
+  /* Run queued tasks until the pool is destroyed */
+
+  while (true) {
+    // Retrieve the next task
+    std::pair<TaskGroup *, Task> entry;
+    {
+      std::unique_lock<std::mutex> lock(mMutex);
+      mTaskCondition.wait(lock,
+                          [this] { return mStopping || !mTaskQueue.empty(); });
+
+      if (mTaskQueue.empty()) {
+        return;
+      }
+
+      entry = std::move(mTaskQueue.front());
+      mTaskQueue.pop_front();
+    }
+
+    // Run the task, capturing any failure for the waiting thread
+    std::exception_ptr exception;
+    try {
+      entry.second(workerIndex);
+    } catch (...) {
+      exception = std::current_exception();
+    }
+
+    // Mark the task as finished
+    {
+      std::lock_guard<std::mutex> lock(mMutex);
+      TaskGroup &taskGroup = *entry.first;
+
+      if (exception && !taskGroup.exception) {
+        taskGroup.exception = exception;
+      }
+
+      taskGroup.pendingTasks--;
+    }
+    mFinishedCondition.notify_all();
+  }
+}
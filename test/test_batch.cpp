@@ -0,0 +1,177 @@
+// Tank Game (@kennedyengineering)
+
+#include <algorithm>
+#include <gtest/gtest.h>
+#include <memory>
+#include <vector>
+
+#include "batch.hpp"
+#include "config.hpp"
+#include "engine.hpp"
+#include "game_rules.hpp"
+
+static void addTanks(TankGame::Engine &engine, const TankGame::Config &config) {
+  // Add two facing tanks to an engine
+
+  TankGame::TankConfig tankConfig1;
+  tankConfig1.positionX = config.arenaWidth / 3.0f;
+  tankConfig1.positionY = config.arenaHeight / 2.0f;
+  tankConfig1.angle = -b2_pi / 2.0f;
+  engine.addTank(tankConfig1);
+
+  TankGame::TankConfig tankConfig2;
+  tankConfig2.positionX = 2.0f * config.arenaWidth / 3.0f;
+  tankConfig2.positionY = config.arenaHeight / 2.0f;
+  tankConfig2.angle = b2_pi / 2.0f;
+  engine.addTank(tankConfig2);
+}
+
+TEST(BatchEngineTest, Initialization) {
+  // Ensure BatchEngine initializes correctly
+
+  // Create configs
+  TankGame::Config config;
+  TankGame::BatchConfig batchConfig;
+  batchConfig.engineCount = 3;
+  batchConfig.threadCount = 2;
+
+  // Create batch engine
+  TankGame::BatchEngine batch(config, batchConfig);
+  ASSERT_EQ(batch.getEngineCount(), 3);
+
+  // Batch must have engines
+  batchConfig.engineCount = 0;
+  ASSERT_THROW(TankGame::BatchEngine(config, batchConfig),
+               std::invalid_argument);
+}
+
+TEST(BatchEngineTest, StepMatchesStandaloneEngines) {
+  // Ensure batched stepping matches stepping engines one at a time
+
+  // Create configs
+  TankGame::Config config;
+  TankGame::BatchConfig batchConfig;
+  batchConfig.engineCount = 4;
+  batchConfig.threadCount = 2;
+
+  // Create batch engine, and standalone engines
+  TankGame::BatchEngine batch(config, batchConfig);
+  std::vector<std::unique_ptr<TankGame::Engine>> engines;
+
+  for (size_t i = 0; i < batchConfig.engineCount; i++) {
+    addTanks(*batch.getEngine(i), config);
+    engines.push_back(std::make_unique<TankGame::Engine>(config));
+    addTanks(*engines.back(), config);
+  }
+
+  auto [numEngines, numTanks, observationSize] =
+      batch.getObservationDimensions();
+  ASSERT_EQ(numEngines, 4);
+  ASSERT_EQ(numTanks, 2);
+
+  // Step with per-engine actions
+  std::vector<float> actions(numEngines * numTanks * 3);
+  std::vector<float> observations(numEngines * numTanks * observationSize);
+  std::vector<float> expected(numTanks * observationSize);
+  std::vector<std::vector<float>> reloadCounters(
+      numEngines, std::vector<float>(numTanks, 0.0f));
+  std::vector<float> rewards(numEngines * numTanks);
+  bool dones[4];
+
+  for (size_t i = 0; i < numEngines; i++) {
+    for (size_t row = 0; row < numTanks; row++) {
+      float *action = actions.data() + (i * numTanks + row) * 3;
+      action[0] = 0.25f * i;
+      action[1] = -0.25f * row;
+      action[2] = 0.0f;
+    }
+  }
+
+  for (int step = 0; step < 10; step++) {
+    batch.step(actions.data(), observations.data(), rewards.data(), dones);
+
+    for (size_t i = 0; i < numEngines; i++) {
+      // Step the standalone engine by hand
+      TankGame::Engine &engine = *engines[i];
+      std::vector<TankGame::RegistryId> tankIds = engine.getTankIds();
+
+      for (size_t row = 0; row < numTanks; row++) {
+        const float *action = actions.data() + (i * numTanks + row) * 3;
+        float treadMaxSpeed = engine.getTankTreadMaxSpeed(tankIds[row]);
+        engine.moveLeftTankTread(tankIds[row], action[0] * treadMaxSpeed);
+        engine.moveRightTankTread(tankIds[row], action[1] * treadMaxSpeed);
+      }
+
+      for (float &reloadCounter : reloadCounters[i]) {
+        reloadCounter = (reloadCounter == 0.0f)
+                            ? batchConfig.gameRulesConfig.reloadDelay
+                            : reloadCounter - 1.0f;
+      }
+
+      engine.step();
+      engine.getAllTankObservations(batchConfig.observationConfig,
+                                    reloadCounters[i].data(), expected.data());
+
+      // Compare observations
+      for (size_t j = 0; j < expected.size(); j++) {
+        ASSERT_EQ(observations[i * expected.size() + j], expected[j]);
+      }
+      ASSERT_FALSE(dones[i]);
+    }
+  }
+}
+
+TEST(BatchEngineTest, StepDoneOnHit) {
+  // Ensure an engine is done once a tank is hit
+
+  // Create configs
+  TankGame::Config config;
+  TankGame::BatchConfig batchConfig;
+  batchConfig.engineCount = 2;
+
+  // Create batch engine
+  TankGame::BatchEngine batch(config, batchConfig);
+
+  for (size_t i = 0; i < batchConfig.engineCount; i++) {
+    addTanks(*batch.getEngine(i), config);
+  }
+
+  auto [numEngines, numTanks, observationSize] =
+      batch.getObservationDimensions();
+
+  // Only the first engine's first tank fires
+  std::vector<float> actions(numEngines * numTanks * 3, 0.0f);
+  std::vector<float> observations(numEngines * numTanks * observationSize);
+  std::vector<float> rewards(numEngines * numTanks);
+  bool dones[2] = {false, false};
+  actions[2] = 1.0f;
+
+  for (int step = 0; step < 200 && !dones[0]; step++) {
+    batch.step(actions.data(), observations.data(), rewards.data(), dones);
+    ASSERT_FALSE(dones[1]);
+  }
+
+  // Check hit event (the shooter is rewarded, and the hit tank penalized)
+  ASSERT_TRUE(dones[0]);
+  ASSERT_GT(rewards[0], 0.0f);
+  ASSERT_LT(rewards[1], 0.0f);
+
+  bool hit = false;
+  for (const TankGame::BatchEvent &event : batch.getEvents()) {
+    if (event.engineIndex == 0 &&
+        event.categoryBits == TankGame::CategoryBits::TANK_BODY) {
+      hit = true;
+    }
+  }
+  ASSERT_TRUE(hit);
+
+  // Reset engine (tanks are kept, and the game restarts)
+  batch.resetEngine(0);
+  ASSERT_EQ(batch.getEngine(0)->getTankIds().size(), numTanks);
+  ASSERT_EQ(batch.getEngine(0)->getGameRules().getTimestep(), 0);
+  ASSERT_FALSE(batch.getEngine(0)->getGameRules().isTerminated());
+
+  std::fill(actions.begin(), actions.end(), 0.0f);
+  batch.step(actions.data(), observations.data(), rewards.data(), dones);
+  ASSERT_FALSE(dones[0]);
+}
@@ -1,10 +1,17 @@
 // Tank Game (@kennedyengineering)
 
+#include <algorithm>
 #include <gtest/gtest.h>
+#include <limits>
+#include <map>
+#include <memory>
+#include <stdexcept>
+#include <string>
 #include <vector>
 
 #include "config.hpp"
 #include "engine.hpp"
+#include "game_rules.hpp"
 
 TEST(EngineTest, Initialization) {
   // Ensure Engine initializes correctly
@@ -192,3 +199,1084 @@ TEST(EngineTest, SetAndGetTankGunAngle) {
   // Check
   ASSERT_FLOAT_EQ(desiredAngle, measuredAngle);
 }
+
+TEST(EngineTest, ScanAllTanksLidar) {
+  // Ensure batched lidar scans match individual lidar scans
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create tanks
+  TankGame::TankConfig tankConfig1;
+  tankConfig1.positionX = config.arenaWidth / 3.0f;
+  tankConfig1.positionY = config.arenaHeight / 2.0f;
+  TankGame::RegistryId id1 = eng.addTank(tankConfig1);
+
+  TankGame::TankConfig tankConfig2;
+  tankConfig2.positionX = 2.0f * config.arenaWidth / 3.0f;
+  tankConfig2.positionY = config.arenaHeight / 2.0f;
+  TankGame::RegistryId id2 = eng.addTank(tankConfig2);
+
+  // Check dimensions
+  auto [numTanks, lidarPoints] = eng.getAllTanksLidarDimensions();
+  ASSERT_EQ(numTanks, 2);
+  ASSERT_EQ(lidarPoints, tankConfig1.lidarPoints);
+
+  // Check row order
+  std::vector<TankGame::RegistryId> tankIds = eng.getTankIds();
+  ASSERT_EQ(tankIds, (std::vector<TankGame::RegistryId>{id1, id2}));
+
+  // Scan all tanks
+  std::vector<float> buffer(numTanks * lidarPoints);
+  eng.scanAllTanksLidar(buffer.data());
+
+  // Compare against individual scans
+  for (size_t row = 0; row < numTanks; row++) {
+    std::vector<float> scan = eng.scanTankLidar(tankIds[row]);
+    ASSERT_EQ(scan.size(), lidarPoints);
+
+    for (size_t pointNum = 0; pointNum < lidarPoints; pointNum++) {
+      ASSERT_FLOAT_EQ(buffer[row * lidarPoints + pointNum], scan[pointNum]);
+    }
+  }
+}
+
+TEST(EngineTest, ScanAllTanksLidarMismatchedPoints) {
+  // Ensure batched lidar scans reject tanks with differing point counts
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create tanks
+  TankGame::TankConfig tankConfig1;
+  tankConfig1.positionX = config.arenaWidth / 3.0f;
+  tankConfig1.positionY = config.arenaHeight / 2.0f;
+  eng.addTank(tankConfig1);
+
+  TankGame::TankConfig tankConfig2;
+  tankConfig2.positionX = 2.0f * config.arenaWidth / 3.0f;
+  tankConfig2.positionY = config.arenaHeight / 2.0f;
+  tankConfig2.lidarPoints = tankConfig1.lidarPoints / 2;
+  eng.addTank(tankConfig2);
+
+  // Check dimensions are rejected
+  ASSERT_ANY_THROW(eng.getAllTanksLidarDimensions());
+}
+
+TEST(EngineTest, GetAllTankObservations) {
+  // Ensure batched observations are normalized correctly
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create tanks
+  TankGame::TankConfig tankConfig1;
+  tankConfig1.positionX = config.arenaWidth / 3.0f;
+  tankConfig1.positionY = config.arenaHeight / 2.0f;
+  TankGame::RegistryId id1 = eng.addTank(tankConfig1);
+
+  TankGame::TankConfig tankConfig2;
+  tankConfig2.positionX = 2.0f * config.arenaWidth / 3.0f;
+  tankConfig2.positionY = config.arenaHeight / 2.0f;
+  eng.addTank(tankConfig2);
+
+  // Drive a tank forward
+  for (int i = 0; i < 30; i++) {
+    eng.moveLeftTankTread(id1, tankConfig1.treadMaxSpeed);
+    eng.moveRightTankTread(id1, tankConfig1.treadMaxSpeed);
+    eng.step();
+  }
+
+  // Check dimensions
+  auto [numTanks, observationSize] = eng.getAllTankObservationsDimensions();
+  ASSERT_EQ(numTanks, 2);
+  ASSERT_EQ(observationSize, tankConfig1.lidarPoints + 4);
+
+  // Compute observations
+  TankGame::ObservationConfig observationConfig;
+  observationConfig.lidarRange = tankConfig1.lidarRange;
+  observationConfig.velocityRange = tankConfig1.treadMaxSpeed;
+  observationConfig.reloadRange = 10.0f;
+
+  std::vector<float> reloadCounters = {5.0f, 20.0f};
+  std::vector<float> observations(numTanks * observationSize);
+  eng.getAllTankObservations(observationConfig, reloadCounters.data(),
+                             observations.data());
+
+  // Compare against individual queries
+  std::vector<TankGame::RegistryId> tankIds = eng.getTankIds();
+
+  for (size_t row = 0; row < numTanks; row++) {
+    const float *observation = observations.data() + row * observationSize;
+
+    std::vector<float> scan = eng.scanTankLidar(tankIds[row]);
+    for (size_t pointNum = 0; pointNum < scan.size(); pointNum++) {
+      ASSERT_FLOAT_EQ(observation[pointNum],
+                      std::min(scan[pointNum], observationConfig.lidarRange) /
+                          observationConfig.lidarRange);
+    }
+
+    auto [velocityX, velocityY] = eng.getTankLocalVelocity(tankIds[row]);
+    ASSERT_NEAR(observation[scan.size()],
+                velocityX / observationConfig.velocityRange, 1e-6);
+    ASSERT_NEAR(observation[scan.size() + 1],
+                velocityY / observationConfig.velocityRange, 1e-6);
+    ASSERT_NEAR(observation[scan.size() + 2],
+                eng.getTankAngularVelocity(tankIds[row]) /
+                    observationConfig.angularVelocityRange,
+                1e-6);
+
+    // Ensure every value lies in the observation space
+    for (size_t i = 0; i < observationSize; i++) {
+      ASSERT_GE(observation[i], -1.0f);
+      ASSERT_LE(observation[i], 1.0f);
+    }
+  }
+
+  // Check reload counters are normalized and clipped
+  ASSERT_FLOAT_EQ(observations[observationSize - 1], 0.5f);
+  ASSERT_FLOAT_EQ(observations[2 * observationSize - 1], 1.0f);
+}
+
+TEST(EngineTest, GetAllTankStates) {
+  // Ensure batched tank states match individual queries
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create tanks
+  TankGame::TankConfig tankConfig1;
+  tankConfig1.positionX = config.arenaWidth / 3.0f;
+  tankConfig1.positionY = config.arenaHeight / 2.0f;
+  TankGame::RegistryId id1 = eng.addTank(tankConfig1);
+
+  TankGame::TankConfig tankConfig2;
+  tankConfig2.positionX = 2.0f * config.arenaWidth / 3.0f;
+  tankConfig2.positionY = config.arenaHeight / 2.0f;
+  tankConfig2.angle = 1.0f;
+  eng.addTank(tankConfig2);
+
+  // Drive and turn a tank
+  eng.rotateTankGun(id1, 0.5f);
+  for (int i = 0; i < 30; i++) {
+    eng.moveLeftTankTread(id1, tankConfig1.treadMaxSpeed);
+    eng.moveRightTankTread(id1, tankConfig1.treadMaxSpeed / 2.0f);
+    eng.step();
+  }
+
+  // Check dimensions
+  auto [numTanks, stateSize] = eng.getAllTankStatesDimensions();
+  ASSERT_EQ(numTanks, 2);
+  ASSERT_EQ(stateSize, 9);
+
+  // Get states
+  std::vector<float> states(numTanks * stateSize);
+  eng.getAllTankStates(states.data());
+
+  // Compare against individual queries
+  std::vector<TankGame::RegistryId> tankIds = eng.getTankIds();
+
+  for (size_t row = 0; row < numTanks; row++) {
+    const float *state = states.data() + row * stateSize;
+    TankGame::RegistryId tankId = tankIds[row];
+
+    auto [positionX, positionY] = eng.getTankPosition(tankId);
+    auto [worldVelocityX, worldVelocityY] = eng.getTankWorldVelocity(tankId);
+    auto [localVelocityX, localVelocityY] = eng.getTankLocalVelocity(tankId);
+
+    ASSERT_EQ(state[0], positionX);
+    ASSERT_EQ(state[1], positionY);
+    ASSERT_EQ(state[2], eng.getTankOrientation(tankId));
+    ASSERT_EQ(state[3], worldVelocityX);
+    ASSERT_EQ(state[4], worldVelocityY);
+    ASSERT_EQ(state[5], localVelocityX);
+    ASSERT_EQ(state[6], localVelocityY);
+    ASSERT_EQ(state[7], eng.getTankAngularVelocity(tankId));
+    ASSERT_EQ(state[8], eng.getTankGunAngle(tankId));
+  }
+}
+
+TEST(EngineTest, MultithreadedStep) {
+  // Ensure the multithreaded solver matches the single threaded solver
+
+  std::vector<std::vector<float>> observations;
+
+  for (unsigned int workerCount : {1, 4}) {
+    // Create config
+    TankGame::Config config;
+    config.workerCount = workerCount;
+
+    // Create engine
+    TankGame::Engine eng(config);
+
+    // Create tanks
+    std::vector<TankGame::RegistryId> ids;
+
+    for (int i = 0; i < 6; i++) {
+      TankGame::TankConfig tankConfig;
+      tankConfig.positionX = config.arenaWidth * (i + 1) / 7.0f;
+      tankConfig.positionY = config.arenaHeight / 2.0f;
+      tankConfig.angle = i * b2_pi / 3.0f;
+      ids.push_back(eng.addTank(tankConfig));
+    }
+
+    // Step engine
+    for (int step = 0; step < 120; step++) {
+      for (TankGame::RegistryId id : ids) {
+        eng.moveLeftTankTread(id, 10.0f);
+        eng.moveRightTankTread(id, 5.0f);
+
+        if (step % 20 == 0) {
+          eng.fireTankGun(id);
+        }
+      }
+
+      eng.step();
+    }
+
+    // Get observations
+    TankGame::ObservationConfig observationConfig;
+    std::vector<float> reloadCounters(ids.size(), 0.0f);
+    auto [numTanks, observationSize] = eng.getAllTankObservationsDimensions();
+
+    observations.emplace_back(numTanks * observationSize);
+    eng.getAllTankObservations(observationConfig, reloadCounters.data(),
+                               observations.back().data());
+  }
+
+  // Check observations
+  ASSERT_EQ(observations[0], observations[1]);
+}
+
+TEST(EngineTest, ParallelLidarScan) {
+  // Ensure parallel lidar scans match serial lidar scans
+
+  std::vector<std::vector<float>> scans;
+
+  for (unsigned int workerCount : {1, 4}) {
+    // Create config
+    TankGame::Config config;
+    config.workerCount = workerCount;
+
+    // Create engine
+    TankGame::Engine eng(config);
+
+    // Create obstacles
+    for (int i = 0; i < 4; i++) {
+      TankGame::ObstacleConfig obstacleConfig;
+      obstacleConfig.positionX = config.arenaWidth * (i + 1) / 5.0f;
+      obstacleConfig.positionY = config.arenaHeight / 4.0f;
+      eng.addObstacle(obstacleConfig);
+    }
+
+    // Create high resolution lidar tanks
+    for (int i = 0; i < 3; i++) {
+      TankGame::TankConfig tankConfig;
+      tankConfig.positionX = config.arenaWidth * (i + 1) / 4.0f;
+      tankConfig.positionY = config.arenaHeight / 2.0f;
+      tankConfig.angle = i * 0.7f;
+      tankConfig.lidarPoints = 1440;
+      tankConfig.lidarRange = 60.0f;
+      eng.addTank(tankConfig);
+    }
+
+    // Scan lidar
+    auto [numTanks, lidarPoints] = eng.getAllTanksLidarDimensions();
+
+    scans.emplace_back(numTanks * lidarPoints);
+    eng.scanAllTanksLidar(scans.back().data());
+  }
+
+  // Check scans
+  ASSERT_EQ(scans[0], scans[1]);
+}
+
+TEST(EngineTest, LidarCulling) {
+  // Ensure culled lidar scans are identical to unculled lidar scans
+
+  std::vector<std::vector<float>> scans;
+
+  for (bool lidarCulling : {false, true}) {
+    // Create config
+    TankGame::Config config;
+
+    // Create engine
+    TankGame::Engine eng(config);
+
+    // Create obstacles
+    for (int i = 0; i < 6; i++) {
+      TankGame::ObstacleConfig obstacleConfig;
+      obstacleConfig.positionX = config.arenaWidth * (i + 1) / 7.0f;
+      obstacleConfig.positionY = config.arenaHeight * ((i % 2) ? 0.25f : 0.75f);
+      eng.addObstacle(obstacleConfig);
+    }
+
+    // Create tanks
+    std::vector<TankGame::RegistryId> ids;
+
+    for (int i = 0; i < 4; i++) {
+      TankGame::TankConfig tankConfig;
+      tankConfig.positionX = config.arenaWidth * (i + 1) / 5.0f;
+      tankConfig.positionY = config.arenaHeight / 2.0f;
+      tankConfig.angle = i * 1.1f;
+      tankConfig.lidarRange = 40.0f;
+      tankConfig.lidarCulling = lidarCulling;
+      ids.push_back(eng.addTank(tankConfig));
+    }
+
+    // Move tanks, fire projectiles, and scan lidar
+    auto [numTanks, lidarPoints] = eng.getAllTanksLidarDimensions();
+    std::vector<float> scan(numTanks * lidarPoints);
+    scans.emplace_back();
+
+    for (int step = 0; step < 100; step++) {
+      for (TankGame::RegistryId id : ids) {
+        eng.moveLeftTankTread(id, 12.0f);
+        eng.moveRightTankTread(id, 3.0f);
+
+        if (step % 15 == 0) {
+          eng.fireTankGun(id);
+        }
+      }
+
+      eng.step();
+      eng.scanAllTanksLidar(scan.data());
+      scans.back().insert(scans.back().end(), scan.begin(), scan.end());
+    }
+  }
+
+  // Check scans (bit-identical)
+  ASSERT_EQ(scans[0], scans[1]);
+}
+
+TEST(EngineTest, RenderScene) {
+  // Ensure renderScene matches rendering each object individually
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create obstacle
+  TankGame::ObstacleConfig obstacleConfig;
+  obstacleConfig.positionX = config.arenaWidth / 4.0f;
+  obstacleConfig.positionY = config.arenaHeight / 4.0f;
+  TankGame::RegistryId obstacleId1 = eng.addObstacle(obstacleConfig);
+
+  // Create tanks
+  std::vector<TankGame::RegistryId> tankIds;
+
+  for (int i = 0; i < 2; i++) {
+    TankGame::TankConfig tankConfig;
+    tankConfig.positionX = config.arenaWidth * (i + 1) / 3.0f;
+    tankConfig.positionY = config.arenaHeight / 2.0f;
+    tankIds.push_back(eng.addTank(tankConfig));
+  }
+
+  eng.scanAllTanksLidar(
+      std::vector<float>(2 * TankGame::TankConfig().lidarPoints).data());
+  eng.fireTankGun(tankIds[0]);
+  eng.step();
+
+  // Define individual rendering
+  auto renderIndividually =
+      [&](const std::vector<TankGame::RegistryId> &obstacleIds,
+          const std::vector<TankGame::RegistryId> &ids) {
+        eng.clearImage();
+        for (TankGame::RegistryId obstacleId : obstacleIds) {
+          eng.renderObstacle(obstacleId);
+        }
+        for (TankGame::RegistryId id : ids) {
+          eng.renderTank(id);
+          eng.renderTankLidar(id);
+        }
+        eng.renderProjectiles();
+        return eng.getImageBuffer();
+      };
+
+  // Render scene twice (second render uses the cached background)
+  std::vector<unsigned char> expected =
+      renderIndividually({obstacleId1}, tankIds);
+
+  eng.renderScene();
+  ASSERT_EQ(eng.getImageBuffer(), expected);
+
+  eng.renderScene();
+  ASSERT_EQ(eng.getImageBuffer(), expected);
+
+  // Render a subset of tanks
+  expected = renderIndividually({obstacleId1}, {tankIds[1]});
+  eng.renderScene({tankIds[1]});
+  ASSERT_EQ(eng.getImageBuffer(), expected);
+
+  // Adding an obstacle invalidates the cached background
+  obstacleConfig.positionX = 3.0f * config.arenaWidth / 4.0f;
+  TankGame::RegistryId obstacleId2 = eng.addObstacle(obstacleConfig);
+
+  expected = renderIndividually({obstacleId1, obstacleId2}, tankIds);
+  eng.renderScene();
+  ASSERT_EQ(eng.getImageBuffer(), expected);
+
+  // Removing an obstacle invalidates the cached background
+  eng.removeObstacle(obstacleId1);
+
+  expected = renderIndividually({obstacleId2}, tankIds);
+  eng.renderScene();
+  ASSERT_EQ(eng.getImageBuffer(), expected);
+}
+
+TEST(EngineTest, Headless) {
+  // Ensure headless engines defer allocating the render surface
+
+  // Create config
+  TankGame::Config config;
+  config.headless = true;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create tank
+  TankGame::TankConfig tankConfig;
+  tankConfig.positionX = config.arenaWidth / 2.0f;
+  tankConfig.positionY = config.arenaHeight / 2.0f;
+  eng.addTank(tankConfig);
+
+  // No render surface before the first render
+  ASSERT_EQ(eng.getMemoryUsage()["render_surface"], 0);
+  ASSERT_EQ(eng.getImageDimensions(),
+            std::make_pair(
+                static_cast<int>(config.arenaWidth * config.pixelDensity),
+                static_cast<int>(config.arenaHeight * config.pixelDensity)));
+
+  // Render surface is allocated by the first render
+  eng.renderScene();
+
+  std::map<std::string, size_t> memoryUsage = eng.getMemoryUsage();
+  ASSERT_GE(memoryUsage["render_surface"], eng.getImageDimensions().first *
+                                               eng.getImageDimensions().second *
+                                               4);
+  ASSERT_GT(memoryUsage["lidar"], 0);
+  ASSERT_GE(memoryUsage["total"], memoryUsage["render_surface"] +
+                                      memoryUsage["render_background"] +
+                                      memoryUsage["lidar"]);
+
+  // Rendered image matches a non-headless engine
+  config.headless = false;
+  TankGame::Engine otherEng(config);
+  otherEng.addTank(tankConfig);
+  ASSERT_GT(otherEng.getMemoryUsage()["render_surface"], 0);
+
+  otherEng.renderScene();
+  ASSERT_EQ(eng.getImageBuffer(), otherEng.getImageBuffer());
+}
+
+TEST(EngineTest, PixelObservations) {
+  // Ensure pixel observations are rendered at the requested resolution
+
+  // Create config
+  TankGame::Config config;
+  config.headless = true;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create tanks
+  for (int i = 0; i < 3; i++) {
+    TankGame::TankConfig tankConfig;
+    tankConfig.positionX = config.arenaWidth * (i + 1) / 4.0f;
+    tankConfig.positionY = config.arenaHeight / 2.0f;
+    tankConfig.angle = i * b2_pi / 3.0f;
+    eng.addTank(tankConfig);
+  }
+
+  // Check dimensions
+  TankGame::PixelObservationConfig pixelConfig;
+  ASSERT_EQ(eng.getAllTankPixelObservationsDimensions(pixelConfig),
+            std::make_tuple(3, 84, 84, 1));
+
+  pixelConfig.grayscale = false;
+  pixelConfig.width = 64;
+  ASSERT_EQ(eng.getAllTankPixelObservationsDimensions(pixelConfig),
+            std::make_tuple(3, 84, 64, 3));
+
+  pixelConfig.width = 0;
+  ASSERT_THROW(eng.getAllTankPixelObservationsDimensions(pixelConfig),
+               std::invalid_argument);
+  pixelConfig.width = 64;
+
+  // Egocentric frames fill each row
+  size_t frameSize = 84 * 64 * 3;
+  std::vector<unsigned char> observations(3 * frameSize, 7);
+  eng.getAllTankPixelObservations(pixelConfig, observations.data());
+  ASSERT_EQ(std::count(observations.begin(), observations.end(), 7), 0);
+
+  // Top-down frames are shared by every tank
+  pixelConfig.egocentric = false;
+  eng.getAllTankPixelObservations(pixelConfig, observations.data());
+
+  for (int row = 1; row < 3; row++) {
+    ASSERT_TRUE(std::equal(observations.begin(),
+                           observations.begin() + frameSize,
+                           observations.begin() + row * frameSize));
+  }
+
+  // The full size render surface is never allocated
+  std::map<std::string, size_t> memoryUsage = eng.getMemoryUsage();
+  ASSERT_EQ(memoryUsage["render_surface"], 0);
+  ASSERT_GE(memoryUsage["pixel_observation_surface"], 84 * 64 * 4);
+}
+
+TEST(EngineTest, Reset) {
+  // Ensure a reset engine behaves like a freshly built one
+
+  // Create config
+  TankGame::Config config;
+
+  // Define engine setup
+  std::vector<TankGame::TankConfig> tankConfigs(2);
+  tankConfigs[0].positionX = config.arenaWidth / 3.0f;
+  tankConfigs[1].positionX = 2.0f * config.arenaWidth / 3.0f;
+  for (TankGame::TankConfig &tankConfig : tankConfigs) {
+    tankConfig.positionY = config.arenaHeight / 2.0f;
+  }
+  tankConfigs[0].angle = -b2_pi / 2.0f;
+  tankConfigs[1].angle = b2_pi / 2.0f;
+
+  std::vector<TankGame::ObstacleConfig> obstacleConfigs(2);
+  obstacleConfigs[0].positionX = config.arenaWidth / 2.0f;
+  obstacleConfigs[0].positionY = config.arenaHeight / 4.0f;
+  obstacleConfigs[1].positionX = config.arenaWidth / 2.0f;
+  obstacleConfigs[1].positionY = 3.0f * config.arenaHeight / 4.0f;
+
+  // Define simulation (returns every step's observations)
+  auto simulate = [&](TankGame::Engine &eng, int numSteps) {
+    std::vector<TankGame::RegistryId> tankIds = eng.getTankIds();
+    std::vector<float> reloadCounters(tankIds.size(), 0.0f);
+    auto [numTanks, observationSize] = eng.getAllTankObservationsDimensions();
+    std::vector<float> observations(numSteps * numTanks * observationSize);
+
+    for (int step = 0; step < numSteps; step++) {
+      for (TankGame::RegistryId tankId : tankIds) {
+        eng.moveLeftTankTread(tankId, 10.0f);
+        eng.moveRightTankTread(tankId, 5.0f + tankId);
+        eng.rotateTankGun(tankId, 0.01f * step);
+        if (step % 15 == 0) {
+          eng.fireTankGun(tankId);
+        }
+      }
+      eng.step();
+      eng.getAllTankObservations(
+          TankGame::ObservationConfig(), reloadCounters.data(),
+          observations.data() + step * numTanks * observationSize);
+    }
+
+    return observations;
+  };
+
+  // Simulate a fresh engine
+  TankGame::Engine freshEng(config);
+  for (const TankGame::TankConfig &tankConfig : tankConfigs) {
+    freshEng.addTank(tankConfig);
+  }
+  freshEng.updateObstacles(obstacleConfigs);
+  std::vector<float> expected = simulate(freshEng, 100);
+
+  // Simulate an engine with a different layout, then reset it
+  TankGame::Engine eng(config);
+  std::vector<TankGame::RegistryId> tankIds;
+  for (const TankGame::TankConfig &tankConfig : tankConfigs) {
+    TankGame::TankConfig otherTankConfig = tankConfig;
+    otherTankConfig.positionY = config.arenaHeight / 3.0f;
+    tankIds.push_back(eng.addTank(otherTankConfig));
+  }
+  TankGame::ObstacleConfig otherObstacleConfig;
+  otherObstacleConfig.positionX = config.arenaWidth / 4.0f;
+  otherObstacleConfig.positionY = config.arenaHeight / 4.0f;
+  TankGame::RegistryId otherObstacleId = eng.addObstacle(otherObstacleConfig);
+  TankGame::RegistryId sharedObstacleId = eng.addObstacle(obstacleConfigs[1]);
+  simulate(eng, 50);
+
+  eng.reset();
+  for (size_t tankNum = 0; tankNum < tankIds.size(); tankNum++) {
+    eng.resetTank(tankIds[tankNum], tankConfigs[tankNum]);
+  }
+
+  // Only differing obstacles are replaced
+  std::vector<TankGame::RegistryId> obstacleIds =
+      eng.updateObstacles(obstacleConfigs);
+  ASSERT_EQ(obstacleIds.size(), 2);
+  ASSERT_EQ(obstacleIds[1], sharedObstacleId);
+  ASSERT_NE(obstacleIds[0], otherObstacleId); // reuses the freed slot
+  ASSERT_EQ(TankGame::getRegistryIndex(obstacleIds[0]),
+            TankGame::getRegistryIndex(otherObstacleId));
+
+  // Tanks are at rest in their new pose
+  for (size_t tankNum = 0; tankNum < tankIds.size(); tankNum++) {
+    ASSERT_EQ(eng.getTankPosition(tankIds[tankNum]),
+              std::make_pair(tankConfigs[tankNum].positionX,
+                             tankConfigs[tankNum].positionY));
+    ASSERT_EQ(eng.getTankWorldVelocity(tankIds[tankNum]),
+              std::make_pair(0.0f, 0.0f));
+    ASSERT_EQ(eng.getTankAngularVelocity(tankIds[tankNum]), 0.0f);
+  }
+
+  // Reset engine closely follows the fresh engine (not bit-identical, solver
+  // warm starting and ordering depend on the world history)
+  std::vector<float> observations = simulate(eng, 100);
+  for (size_t i = 0; i < expected.size(); i++) {
+    ASSERT_NEAR(observations[i], expected[i], 1e-3f);
+  }
+}
+
+TEST(EngineTest, ProjectilePool) {
+  // Ensure projectile slots are reused once projectiles are destroyed
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create tank (facing a wall)
+  TankGame::TankConfig tankConfig;
+  tankConfig.positionX = config.arenaWidth / 2.0f;
+  tankConfig.positionY = config.arenaHeight / 2.0f;
+  TankGame::RegistryId tankId = eng.addTank(tankConfig);
+
+  // Define volley (fires every step, until every projectile hit the wall)
+  auto fireVolley = [&](int numProjectiles) {
+    int numHits = 0;
+
+    for (int step = 0; step < 1000 && numHits < numProjectiles; step++) {
+      if (step < numProjectiles) {
+        eng.fireTankGun(tankId);
+      }
+
+      for (const auto &[categoryBits, srcId, hitId] : eng.step()) {
+        ASSERT_EQ(categoryBits, TankGame::CategoryBits::WALL);
+        ASSERT_EQ(srcId, tankId);
+        numHits++;
+      }
+    }
+
+    ASSERT_EQ(numHits, numProjectiles);
+  };
+
+  // Fire more projectiles than are preallocated
+  fireVolley(200);
+  size_t projectileMemory = eng.getMemoryUsage()["projectiles"];
+
+  // Firing again reuses the pool
+  fireVolley(200);
+  ASSERT_EQ(eng.getMemoryUsage()["projectiles"], projectileMemory);
+}
+
+TEST(EngineTest, StaleIds) {
+  // Ensure ids of removed tanks and obstacles are rejected, even once their
+  // slots are reused
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create tanks, the second fires before it is removed
+  TankGame::TankConfig tankConfig;
+  tankConfig.positionX = config.arenaWidth / 4.0f;
+  tankConfig.positionY = config.arenaHeight / 2.0f;
+  TankGame::RegistryId tankId = eng.addTank(tankConfig);
+
+  tankConfig.positionX = 3.0f * config.arenaWidth / 4.0f;
+  TankGame::RegistryId removedTankId = eng.addTank(tankConfig);
+
+  eng.fireTankGun(removedTankId);
+  for (int step = 0; step < 5; step++) {
+    ASSERT_TRUE(eng.step().empty());
+  }
+
+  // Replace the second tank, reusing its slot
+  eng.removeTank(removedTankId);
+  TankGame::RegistryId reusedTankId = eng.addTank(tankConfig);
+  ASSERT_NE(reusedTankId, removedTankId);
+  ASSERT_EQ(TankGame::getRegistryIndex(reusedTankId),
+            TankGame::getRegistryIndex(removedTankId));
+  ASSERT_EQ(eng.getTankIds(),
+            (std::vector<TankGame::RegistryId>{tankId, reusedTankId}));
+
+  // The removed tank id is rejected by every method taking a tank id
+  ASSERT_THROW(eng.getTankPosition(removedTankId), std::out_of_range);
+  ASSERT_THROW(eng.rotateTankGun(removedTankId, 1.0f), std::out_of_range);
+  ASSERT_THROW(eng.fireTankGun(removedTankId), std::out_of_range);
+  ASSERT_THROW(eng.scanTankLidar(removedTankId), std::out_of_range);
+  ASSERT_THROW(eng.renderTank(removedTankId), std::out_of_range);
+  ASSERT_THROW(eng.removeTank(removedTankId), std::out_of_range);
+  ASSERT_NO_THROW(eng.getTankPosition(reusedTankId));
+
+  // The projectile of the removed tank is not attributed to the reusing tank
+  std::vector<TankGame::CollisionEvent> events;
+  for (int step = 0; step < 1000 && events.empty(); step++) {
+    events = eng.step();
+  }
+  ASSERT_EQ(events.size(), 1);
+  ASSERT_EQ(events[0].srcId, removedTankId);
+
+  // Lookahead events report the ids of this engine
+  std::vector<float> actions = {0.0f, 0.0f, 0.0f, 0.0f, 0.0f, 1.0f};
+  actions.resize(1000 * 2 * 3);
+  std::vector<float> states(1000 * 2 * 9);
+  std::vector<float> rewards(1000 * 2);
+
+  const std::vector<TankGame::LookaheadEvent> &predictedEvents =
+      eng.simulateLookahead(actions.data(), 1000, states.data(),
+                            rewards.data());
+  ASSERT_EQ(predictedEvents.size(), 1);
+  ASSERT_EQ(predictedEvents[0].srcId, reusedTankId);
+
+  // The removed obstacle id is rejected, once its slot is reused
+  TankGame::ObstacleConfig obstacleConfig;
+  obstacleConfig.positionX = config.arenaWidth / 2.0f;
+  obstacleConfig.positionY = config.arenaHeight / 4.0f;
+  obstacleConfig.radius = 5.0f;
+  TankGame::RegistryId removedObstacleId = eng.addObstacle(obstacleConfig);
+
+  eng.removeObstacle(removedObstacleId);
+  TankGame::RegistryId reusedObstacleId = eng.addObstacle(obstacleConfig);
+  ASSERT_NE(reusedObstacleId, removedObstacleId);
+
+  ASSERT_THROW(eng.renderObstacle(removedObstacleId), std::out_of_range);
+  ASSERT_THROW(eng.removeObstacle(removedObstacleId), std::out_of_range);
+  ASSERT_NO_THROW(eng.removeObstacle(reusedObstacleId));
+}
+
+TEST(EngineTest, CollisionEventFiltering) {
+  // Ensure step filters collision events by category, and removes duplicates
+
+  // Create config
+  TankGame::Config config;
+
+  // Define simulation (fires two overlapping projectiles on the same step, and
+  // gathers the events)
+  auto simulate = [&](uint32_t categoryMask, bool unique) {
+    TankGame::Engine eng(config);
+
+    TankGame::TankConfig tankConfig;
+    tankConfig.positionX = config.arenaWidth / 2.0f;
+    tankConfig.positionY = config.arenaHeight / 2.0f;
+    TankGame::RegistryId tankId = eng.addTank(tankConfig);
+
+    eng.fireTankGun(tankId);
+    eng.fireTankGun(tankId);
+
+    std::vector<TankGame::CollisionEvent> events;
+    for (int step = 0; step < 1000; step++) {
+      const std::vector<TankGame::CollisionEvent> &stepEvents =
+          eng.step(categoryMask, unique);
+      events.insert(events.end(), stepEvents.begin(), stepEvents.end());
+    }
+
+    return events;
+  };
+
+  // Both projectiles report hitting each other
+  std::vector<TankGame::CollisionEvent> events =
+      simulate(TankGame::CategoryBits::ALL, false);
+  ASSERT_EQ(events.size(), 2);
+  ASSERT_EQ(events[0], events[1]);
+  ASSERT_EQ(events[0].categoryBits, TankGame::CategoryBits::PROJECTILE);
+
+  // Duplicate events are removed
+  ASSERT_EQ(simulate(TankGame::CategoryBits::ALL, true).size(), 1);
+
+  // Events outside the category mask are removed
+  ASSERT_EQ(simulate(TankGame::CategoryBits::PROJECTILE |
+                         TankGame::CategoryBits::TANK_BODY,
+                     false)
+                .size(),
+            2);
+  ASSERT_TRUE(simulate(TankGame::CategoryBits::WALL, false).empty());
+}
+
+TEST(EngineTest, ApplyActions) {
+  // Ensure batched actions match individual commands
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engines (one driven by batched actions, one by commands)
+  TankGame::Engine batchEng(config);
+  TankGame::Engine eng(config);
+
+  std::vector<TankGame::RegistryId> tankIds;
+  for (float positionX :
+       {config.arenaWidth / 3.0f, 2.0f * config.arenaWidth / 3.0f}) {
+    TankGame::TankConfig tankConfig;
+    tankConfig.positionX = positionX;
+    tankConfig.positionY = config.arenaHeight / 2.0f;
+    batchEng.addTank(tankConfig);
+    tankIds.push_back(eng.addTank(tankConfig));
+  }
+
+  // Check dimensions
+  auto [numTanks, actionSize] = batchEng.getActionsDimensions();
+  ASSERT_EQ(numTanks, 2);
+  ASSERT_EQ(actionSize, TankGame::Engine::ACTION_SIZE);
+
+  // Drive both tanks, firing whenever possible (the second tank stops acting
+  // halfway, keeping its tread speeds)
+  const float reloadDelay = 5.0f;
+  std::vector<float> reloadCounters(numTanks, 0.0f);
+  float treadMaxSpeed = TankGame::TankConfig().treadMaxSpeed;
+  int numShots = 0;
+
+  for (int step = 0; step < 40; step++) {
+    float nan = std::numeric_limits<float>::quiet_NaN();
+    std::vector<float> actions = {1.5f, 0.5f, 1.0f, -0.25f, 0.75f, 0.0f};
+    if (step >= 20) {
+      actions[3] = actions[4] = actions[5] = nan;
+    }
+
+    if (reloadCounters[0] == 0.0f) {
+      eng.fireTankGun(tankIds[0]);
+      numShots++;
+    }
+    eng.moveLeftTankTread(tankIds[0], treadMaxSpeed);
+    eng.moveRightTankTread(tankIds[0], 0.5f * treadMaxSpeed);
+    if (step < 20) {
+      eng.moveLeftTankTread(tankIds[1], -0.25f * treadMaxSpeed);
+      eng.moveRightTankTread(tankIds[1], 0.75f * treadMaxSpeed);
+    }
+
+    batchEng.applyActions(actions.data(), reloadCounters.data(), reloadDelay);
+
+    // Reload counters count down from the delay after firing
+    ASSERT_EQ(reloadCounters[0], reloadDelay - step % 6);
+
+    batchEng.step();
+    eng.step();
+  }
+
+  // Ensure the first tank fired every reload
+  ASSERT_EQ(numShots, 7);
+
+  // Compare engines
+  std::vector<TankGame::RegistryId> batchTankIds = batchEng.getTankIds();
+  for (size_t row = 0; row < numTanks; row++) {
+    ASSERT_EQ(batchEng.getTankPosition(batchTankIds[row]),
+              eng.getTankPosition(tankIds[row]));
+    ASSERT_EQ(batchEng.getTankOrientation(batchTankIds[row]),
+              eng.getTankOrientation(tankIds[row]));
+  }
+}
+
+TEST(EngineTest, SaveRestoreState) {
+  // Ensure a restored engine continues from the saved state
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engines with the same tanks
+  auto createEngine = [&]() {
+    auto eng = std::make_unique<TankGame::Engine>(config);
+
+    for (float positionX :
+         {config.arenaWidth / 3.0f, 2.0f * config.arenaWidth / 3.0f}) {
+      TankGame::TankConfig tankConfig;
+      tankConfig.positionX = positionX;
+      tankConfig.positionY = config.arenaHeight / 2.0f;
+      eng->addTank(tankConfig);
+    }
+
+    TankGame::GameRulesConfig gameRulesConfig;
+    gameRulesConfig.reloadDelay = 7;
+    eng->setGameRules(gameRulesConfig);
+
+    return eng;
+  };
+
+  std::unique_ptr<TankGame::Engine> eng = createEngine();
+
+  // Drive the tanks around, firing
+  std::vector<float> actions = {1.0f, 0.5f, 1.0f, -0.5f, 0.25f, 1.0f};
+  std::vector<float> rewards(2);
+
+  auto simulate = [&](TankGame::Engine &engine, int numSteps) {
+    std::vector<float> states(2 * 9);
+
+    engine.rotateTankGun(engine.getTankIds()[0], 0.3f);
+    for (int step = 0; step < numSteps; step++) {
+      engine.stepGame(actions.data(), rewards.data());
+    }
+    engine.getAllTankStates(states.data());
+
+    return states;
+  };
+
+  std::vector<float> savedStates = simulate(*eng, 30);
+  std::vector<unsigned char> state = eng->saveState();
+  std::vector<float> reloadCounters = eng->getGameRules().getReloadCounters();
+
+  // Continue the original engine
+  std::vector<float> expected = simulate(*eng, 20);
+  int expectedTimestep = eng->getGameRules().getTimestep();
+
+  // Restore into the same engine, and into a fresh one
+  std::unique_ptr<TankGame::Engine> freshEng = createEngine();
+
+  for (TankGame::Engine *engine : {eng.get(), freshEng.get()}) {
+    engine->restoreState(state);
+
+    // The saved state is restored exactly
+    std::vector<float> states(2 * 9);
+    engine->getAllTankStates(states.data());
+    ASSERT_EQ(states, savedStates);
+    ASSERT_EQ(engine->getGameRules().getReloadCounters(), reloadCounters);
+    ASSERT_EQ(engine->getGameRules().getTimestep(), 30);
+    ASSERT_EQ(engine->saveState(), state);
+
+    // Continuing closely follows the original engine (not bit-identical,
+    // solver warm starting is not captured)
+    std::vector<float> observations = simulate(*engine, 20);
+    for (size_t i = 0; i < expected.size(); i++) {
+      ASSERT_NEAR(observations[i], expected[i], 1e-3f);
+    }
+    ASSERT_EQ(engine->getGameRules().getTimestep(), expectedTimestep);
+  }
+
+  // Invalid states are rejected, leaving the engine untouched
+  std::vector<unsigned char> truncatedState(state.begin(), state.end() - 1);
+  ASSERT_THROW(eng->restoreState(truncatedState), std::invalid_argument);
+
+  TankGame::Engine otherEng(config);
+  ASSERT_THROW(otherEng.restoreState(state), std::invalid_argument);
+}
+
+TEST(EngineTest, Lookahead) {
+  // Ensure lookaheads predict the next steps, leaving the engine untouched
+
+  // Create config
+  TankGame::Config config;
+
+  // Create engine (the middle tank is removed, leaving an id gap)
+  TankGame::Engine eng(config);
+
+  std::vector<TankGame::RegistryId> tankIds;
+  for (float positionX : {config.arenaWidth / 4.0f, config.arenaWidth / 2.0f,
+                          3.0f * config.arenaWidth / 4.0f}) {
+    TankGame::TankConfig tankConfig;
+    tankConfig.positionX = positionX;
+    tankConfig.positionY = config.arenaHeight / 2.0f;
+    tankIds.push_back(eng.addTank(tankConfig));
+  }
+  eng.removeTank(tankIds[1]);
+
+  // Create obstacles (the first is removed, leaving an id gap)
+  TankGame::ObstacleConfig obstacleConfig;
+  obstacleConfig.positionX = config.arenaWidth / 2.0f;
+  obstacleConfig.positionY = 3.0f * config.arenaHeight / 4.0f;
+  obstacleConfig.radius = 5.0f;
+  TankGame::RegistryId removedObstacleId = eng.addObstacle(obstacleConfig);
+
+  obstacleConfig.positionY = config.arenaHeight / 4.0f;
+  TankGame::RegistryId obstacleId = eng.addObstacle(obstacleConfig);
+  eng.removeObstacle(removedObstacleId);
+
+  TankGame::GameRulesConfig gameRulesConfig;
+  gameRulesConfig.reloadDelay = 5;
+  eng.setGameRules(gameRulesConfig);
+
+  // Play a few steps
+  const size_t numTanks = 2;
+  const size_t numSteps = 200;
+  std::vector<float> actions(numSteps * numTanks * 3);
+  for (size_t step = 0; step < numSteps; step++) {
+    float *action = actions.data() + step * numTanks * 3;
+    action[0] = 1.0f;
+    action[1] = 0.5f;
+    action[2] = 1.0f;
+    action[3] = -0.5f;
+    action[4] = 1.0f;
+    action[5] = step % 2;
+  }
+
+  std::vector<float> rewards(numTanks);
+  for (int step = 0; step < 10; step++) {
+    eng.stepGame(actions.data(), rewards.data());
+  }
+
+  // Simulate a lookahead
+  std::vector<unsigned char> state = eng.saveState();
+  std::vector<float> predictedStates(numSteps * numTanks * 9);
+  std::vector<float> predictedRewards(numSteps * numTanks);
+
+  std::vector<TankGame::LookaheadEvent> predictedEvents =
+      eng.simulateLookahead(actions.data(), numSteps, predictedStates.data(),
+                            predictedRewards.data());
+  size_t numEvents = predictedEvents.size();
+  ASSERT_GT(numEvents, 0);
+
+  // Obstacle hits report the live obstacle id
+  ASSERT_TRUE(std::any_of(predictedEvents.begin(), predictedEvents.end(),
+                          [&](const TankGame::LookaheadEvent &event) {
+                            return event.categoryBits ==
+                                       TankGame::CategoryBits::OBSTACLE &&
+                                   event.hitId == obstacleId;
+                          }));
+
+  // The engine is untouched
+  ASSERT_EQ(eng.saveState(), state);
+
+  // Repeated lookaheads reuse the scratch engine, and agree
+  std::vector<float> repeatedStates(predictedStates.size());
+  std::vector<float> repeatedRewards(predictedRewards.size());
+  ASSERT_EQ(eng.simulateLookahead(actions.data(), numSteps,
+                                  repeatedStates.data(), repeatedRewards.data())
+                .size(),
+            numEvents);
+
+  for (size_t i = 0; i < predictedStates.size(); i++) {
+    ASSERT_NEAR(repeatedStates[i], predictedStates[i], 1e-3f);
+  }
+
+  // Playing the actions closely follows the prediction (not bit-identical,
+  // solver warm starting is not captured)
+  std::vector<float> states(numTanks * 9);
+  size_t eventIndex = 0;
+  for (size_t step = 0; step < numSteps; step++) {
+    const std::vector<TankGame::CollisionEvent> &events =
+        eng.stepGame(actions.data() + step * numTanks * 3, rewards.data());
+    eng.getAllTankStates(states.data());
+
+    // Events are predicted on the step they occur
+    for (const TankGame::CollisionEvent &event : events) {
+      ASSERT_LT(eventIndex, numEvents);
+      const TankGame::LookaheadEvent &predictedEvent =
+          predictedEvents[eventIndex++];
+      ASSERT_EQ(predictedEvent.step, step);
+      ASSERT_EQ(predictedEvent.categoryBits, event.categoryBits);
+      ASSERT_EQ(predictedEvent.srcId, event.srcId);
+      ASSERT_EQ(predictedEvent.hitId, event.hitId);
+    }
+
+    for (size_t i = 0; i < states.size(); i++) {
+      ASSERT_NEAR(states[i], predictedStates[step * numTanks * 9 + i], 1e-3f);
+    }
+    for (size_t row = 0; row < numTanks; row++) {
+      ASSERT_NEAR(rewards[row], predictedRewards[step * numTanks + row], 1e-3f);
+    }
+  }
+  ASSERT_EQ(eventIndex, numEvents);
+}
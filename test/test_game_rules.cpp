@@ -0,0 +1,153 @@
+// Tank Game (@kennedyengineering)
+
+#include <cmath>
+#include <gtest/gtest.h>
+#include <stdexcept>
+#include <vector>
+
+#include "config.hpp"
+#include "engine.hpp"
+#include "game_rules.hpp"
+
+static void addTanks(TankGame::Engine &engine, const TankGame::Config &config) {
+  // Add two facing tanks to an engine
+
+  TankGame::TankConfig tankConfig1;
+  tankConfig1.positionX = config.arenaWidth / 3.0f;
+  tankConfig1.positionY = config.arenaHeight / 2.0f;
+  tankConfig1.angle = -b2_pi / 2.0f;
+  engine.addTank(tankConfig1);
+
+  TankGame::TankConfig tankConfig2;
+  tankConfig2.positionX = 2.0f * config.arenaWidth / 3.0f;
+  tankConfig2.positionY = config.arenaHeight / 2.0f;
+  tankConfig2.angle = b2_pi / 2.0f;
+  engine.addTank(tankConfig2);
+}
+
+TEST(GameRulesTest, NoGameRules) {
+  // Ensure stepping a game requires game rules
+
+  // Create engine
+  TankGame::Config config;
+  TankGame::Engine eng(config);
+  addTanks(eng, config);
+
+  // Step without game rules
+  std::vector<float> actions(2 * 3, 0.0f);
+  std::vector<float> rewards(2);
+  ASSERT_THROW(eng.stepGame(actions.data(), rewards.data()),
+               std::runtime_error);
+}
+
+TEST(GameRulesTest, MovementRewards) {
+  // Ensure rewards follow the linear reward terms
+
+  // Create engine
+  TankGame::Config config;
+  TankGame::Engine eng(config);
+  addTanks(eng, config);
+
+  TankGame::GameRulesConfig gameRulesConfig;
+  gameRulesConfig.timePenalty = 2.0f;
+  gameRulesConfig.speedReward = 3.0f;
+  gameRulesConfig.lateralReward = 0.25f;
+  eng.setGameRules(gameRulesConfig);
+
+  // Drive the first tank, while the second one stays still
+  std::vector<float> actions = {1.0f, 1.0f, 0.0f, 0.0f, 0.0f, 0.0f};
+  std::vector<float> rewards(2);
+  std::vector<float> states(2 * 9);
+
+  for (int step = 0; step < 30; step++) {
+    eng.stepGame(actions.data(), rewards.data());
+
+    // Compare against the reward terms
+    eng.getAllTankStates(states.data());
+
+    for (size_t row = 0; row < 2; row++) {
+      float velocityX = std::clamp(states[row * 9 + 5] / 20.0f, -1.0f, 1.0f);
+      float velocityY = std::clamp(states[row * 9 + 6] / 20.0f, -1.0f, 1.0f);
+      ASSERT_NEAR(rewards[row],
+                  -2.0f + 3.0f * std::abs(velocityX) + 0.25f * velocityY,
+                  1e-5f);
+    }
+
+    ASSERT_FALSE(eng.getGameRules().isTerminated());
+  }
+
+  // The moving tank is rewarded
+  ASSERT_GT(rewards[0], rewards[1]);
+  ASSERT_FLOAT_EQ(rewards[1], -2.0f);
+}
+
+TEST(GameRulesTest, HitAndReload) {
+  // Ensure a hit terminates the game, and reload delays firing
+
+  // Create engine
+  TankGame::Config config;
+  TankGame::Engine eng(config);
+  addTanks(eng, config);
+
+  TankGame::GameRulesConfig gameRulesConfig;
+  gameRulesConfig.reloadDelay = 3;
+  eng.setGameRules(gameRulesConfig);
+  TankGame::GameRules &gameRules = eng.getGameRules();
+
+  // The first tank keeps firing
+  std::vector<float> actions = {0.0f, 0.0f, 1.0f, 0.0f, 0.0f, 0.0f};
+  std::vector<float> rewards(2);
+
+  int step = 0;
+  for (; step < 200 && !gameRules.isTerminated(); step++) {
+    eng.stepGame(actions.data(), rewards.data());
+
+    // Reload counters count down from the delay after firing
+    ASSERT_EQ(gameRules.getReloadCounters()[0], 3.0f - step % 4);
+    ASSERT_EQ(gameRules.getTimestep(), step + 1);
+  }
+
+  // The shooter is rewarded, and the hit tank penalized (once per step, the
+  // hit tank is slightly pushed)
+  ASSERT_TRUE(gameRules.isTerminated());
+  ASSERT_NEAR(rewards[0], -1.0f + 100.0f, 1e-2f);
+  ASSERT_NEAR(rewards[1], -1.0f - 100.0f, 1e-2f);
+
+  // Resetting the engine restarts the game
+  eng.reset();
+  ASSERT_EQ(gameRules.getTimestep(), 0);
+  ASSERT_TRUE(gameRules.getReloadCounters().empty());
+  ASSERT_FALSE(gameRules.isTerminated());
+}
+
+TEST(GameRulesTest, Truncation) {
+  // Ensure the game is truncated after maxTimesteps
+
+  // Create engine
+  TankGame::Config config;
+  TankGame::Engine eng(config);
+  addTanks(eng, config);
+
+  TankGame::GameRulesConfig gameRulesConfig;
+  gameRulesConfig.maxTimesteps = 10;
+  eng.setGameRules(gameRulesConfig);
+
+  // Step until truncated
+  std::vector<float> actions(2 * 3, 0.0f);
+  std::vector<float> rewards(2);
+
+  for (int step = 0; step <= 10; step++) {
+    eng.stepGame(actions.data(), rewards.data());
+    ASSERT_FALSE(eng.getGameRules().isTruncated());
+  }
+
+  eng.stepGame(actions.data(), rewards.data());
+  ASSERT_TRUE(eng.getGameRules().isTruncated());
+
+  // Replacing the game rules keeps the same instance
+  TankGame::GameRules *gameRules = &eng.getGameRules();
+  eng.setGameRules(TankGame::GameRulesConfig());
+  ASSERT_EQ(&eng.getGameRules(), gameRules);
+  ASSERT_EQ(gameRules->getConfig().maxTimesteps, -1);
+  ASSERT_EQ(gameRules->getTimestep(), 0);
+}
@@ -0,0 +1,232 @@
+// Tank Game (@kennedyengineering)
+
+#include <cmath>
+#include <gtest/gtest.h>
+#include <random>
+#include <vector>
+
+#include "config.hpp"
+#include "engine.hpp"
+#include "raycast.hpp"
+
+TEST(RayCastSceneTest, CircleHit) {
+  // Ensure rays hit the near side of a circle
+
+  // Create scene
+  TankGame::RayCastScene scene;
+  scene.addCircle((b2Vec2){10.0f, 0.0f}, 2.0f);
+  ASSERT_EQ(scene.getCircleCount(), 1);
+
+  // Cast rays
+  ASSERT_FLOAT_EQ(scene.castRay((b2Vec2){0.0f, 0.0f}, (b2Vec2){20.0f, 0.0f}),
+                  0.4f);
+  ASSERT_FLOAT_EQ(scene.castRay((b2Vec2){0.0f, 0.0f}, (b2Vec2){5.0f, 0.0f}),
+                  1.0f);
+  ASSERT_FLOAT_EQ(scene.castRay((b2Vec2){0.0f, 5.0f}, (b2Vec2){20.0f, 0.0f}),
+                  1.0f);
+
+  // Rays starting inside the circle follow box2d (a hit at a fraction of
+  // zero, or a miss, depending on the box2d version)
+  b2Circle circle = {(b2Vec2){10.0f, 0.0f}, 2.0f};
+  b2RayCastInput input = {(b2Vec2){10.0f, 0.0f}, (b2Vec2){20.0f, 0.0f}, 1.0f};
+  float expectedFraction = b2RayCastCircle(&input, &circle).hit ? 0.0f : 1.0f;
+
+  ASSERT_FLOAT_EQ(scene.castRay((b2Vec2){10.0f, 0.0f}, (b2Vec2){20.0f, 0.0f}),
+                  expectedFraction);
+}
+
+TEST(RayCastSceneTest, BoxHit) {
+  // Ensure rays hit the near side of a rotated box
+
+  // Create scene
+  TankGame::RayCastScene scene;
+  b2Polygon box = b2MakeBox(1.0f, 1.0f);
+  b2Transform transform = {(b2Vec2){10.0f, 0.0f}, b2MakeRot(b2_pi / 4.0f)};
+  scene.addBox(box, transform);
+  ASSERT_EQ(scene.getBoxCount(), 1);
+
+  // Cast rays
+  float expectedFraction = (10.0f - std::sqrt(2.0f)) / 20.0f;
+  ASSERT_NEAR(scene.castRay((b2Vec2){0.0f, 0.0f}, (b2Vec2){20.0f, 0.0f}),
+              expectedFraction, 1e-6f);
+  ASSERT_FLOAT_EQ(scene.castRay((b2Vec2){0.0f, 2.0f}, (b2Vec2){20.0f, 0.0f}),
+                  1.0f);
+}
+
+TEST(RayCastSceneTest, ExcludeOwner) {
+  // Ensure rays ignore shapes owned by the caster
+
+  // Create scene
+  TankGame::RayCastScene scene;
+  scene.addCircle((b2Vec2){5.0f, 0.0f}, 1.0f, 7);
+  scene.addCircle((b2Vec2){10.0f, 0.0f}, 1.0f);
+
+  // Cast rays
+  ASSERT_FLOAT_EQ(scene.castRay((b2Vec2){0.0f, 0.0f}, (b2Vec2){20.0f, 0.0f}),
+                  0.2f);
+  ASSERT_FLOAT_EQ(scene.castRay((b2Vec2){0.0f, 0.0f}, (b2Vec2){20.0f, 0.0f}, 7),
+                  0.45f);
+}
+
+static std::vector<float> scanRandomGame(unsigned int seed, bool analyticLidar,
+                                         bool lidarCulling) {
+  /* Play a random game, and return the lidar scans of every step
+     Note: obstacles and tanks are placed at random, one tank spawns inside an
+     obstacle and one against a wall, tanks drive, turn their guns and fire at
+     random (so projectiles are in flight)
+  */
+
+  std::mt19937 rng(seed);
+  std::uniform_real_distribution<float> unit(0.0f, 1.0f);
+
+  // Create config
+  TankGame::Config config;
+  config.analyticLidar = analyticLidar;
+
+  // Create engine
+  TankGame::Engine eng(config);
+
+  // Create obstacles
+  std::vector<TankGame::ObstacleConfig> obstacleConfigs(6);
+
+  for (TankGame::ObstacleConfig &obstacleConfig : obstacleConfigs) {
+    obstacleConfig.positionX = config.arenaWidth * unit(rng);
+    obstacleConfig.positionY = config.arenaHeight * unit(rng);
+    obstacleConfig.radius = 2.0f + 8.0f * unit(rng);
+    eng.addObstacle(obstacleConfig);
+  }
+
+  // Create tanks
+  std::vector<TankGame::RegistryId> ids;
+
+  for (int i = 0; i < 4; i++) {
+    TankGame::TankConfig tankConfig;
+    tankConfig.positionX = config.arenaWidth * unit(rng);
+    tankConfig.positionY = config.arenaHeight * unit(rng);
+    tankConfig.angle = 2.0f * b2_pi * unit(rng);
+    tankConfig.lidarRange = 40.0f;
+    tankConfig.lidarCulling = lidarCulling;
+
+    if (i == 0) {
+      // Spawn inside an obstacle
+      tankConfig.positionX = obstacleConfigs[0].positionX;
+      tankConfig.positionY = obstacleConfigs[0].positionY;
+    } else if (i == 1) {
+      // Spawn against a wall
+      tankConfig.positionX = tankConfig.bodyHeight / 2.0f;
+    }
+
+    ids.push_back(eng.addTank(tankConfig));
+  }
+
+  // Move tanks, fire projectiles, and scan lidar
+  auto [numTanks, lidarPoints] = eng.getAllTanksLidarDimensions();
+  std::vector<float> scan(numTanks * lidarPoints);
+  std::vector<float> scans;
+
+  for (int step = 0; step < 100; step++) {
+    eng.scanAllTanksLidar(scan.data());
+    scans.insert(scans.end(), scan.begin(), scan.end());
+
+    for (TankGame::RegistryId id : ids) {
+      eng.moveLeftTankTread(id, 40.0f * unit(rng) - 20.0f);
+      eng.moveRightTankTread(id, 40.0f * unit(rng) - 20.0f);
+      eng.rotateTankGun(id, 0.5f * unit(rng) - 0.25f);
+
+      if (unit(rng) < 0.1f) {
+        eng.fireTankGun(id);
+      }
+    }
+
+    eng.step();
+  }
+
+  return scans;
+}
+
+TEST(RayCastSceneTest, RandomConformanceWithBox2D) {
+  // Ensure analytic lidar scans match box2d lidar scans in random games
+
+  for (unsigned int seed = 0; seed < 8; seed++) {
+    std::vector<float> scans = scanRandomGame(seed, false, false);
+    std::vector<float> analyticScans = scanRandomGame(seed, true, false);
+
+    ASSERT_EQ(scans.size(), analyticScans.size());
+    for (size_t pointNum = 0; pointNum < scans.size(); pointNum++) {
+      ASSERT_NEAR(scans[pointNum], analyticScans[pointNum], 1e-3f)
+          << "seed " << seed << ", point " << pointNum;
+    }
+  }
+}
+
+TEST(RayCastSceneTest, RandomLidarCulling) {
+  // Ensure culled lidar scans are identical to unculled lidar scans in random
+  // games (including rays starting inside a shape)
+
+  for (unsigned int seed = 0; seed < 8; seed++) {
+    ASSERT_EQ(scanRandomGame(seed, false, false),
+              scanRandomGame(seed, false, true))
+        << "seed " << seed;
+  }
+}
+
+TEST(RayCastSceneTest, ConformanceWithBox2D) {
+  // Ensure analytic lidar scans match box2d lidar scans
+
+  std::vector<std::vector<float>> scans;
+
+  for (bool analyticLidar : {false, true}) {
+    // Create config
+    TankGame::Config config;
+    config.analyticLidar = analyticLidar;
+
+    // Create engine
+    TankGame::Engine eng(config);
+
+    // Create obstacles
+    for (int i = 0; i < 5; i++) {
+      TankGame::ObstacleConfig obstacleConfig;
+      obstacleConfig.positionX = config.arenaWidth * (i + 1) / 6.0f;
+      obstacleConfig.positionY = config.arenaHeight * ((i % 2) ? 0.2f : 0.8f);
+      obstacleConfig.radius = 2.0f + i;
+      eng.addObstacle(obstacleConfig);
+    }
+
+    // Create tanks
+    std::vector<TankGame::RegistryId> ids;
+
+    for (int i = 0; i < 4; i++) {
+      TankGame::TankConfig tankConfig;
+      tankConfig.positionX = config.arenaWidth * (i + 1) / 5.0f;
+      tankConfig.positionY = config.arenaHeight / 2.0f;
+      tankConfig.angle = i * 0.9f;
+      tankConfig.lidarRange = 60.0f;
+      ids.push_back(eng.addTank(tankConfig));
+    }
+
+    // Move tanks, and fire projectiles
+    for (int step = 0; step < 30; step++) {
+      for (TankGame::RegistryId id : ids) {
+        eng.moveLeftTankTread(id, 10.0f);
+        eng.moveRightTankTread(id, 4.0f);
+
+        if (step % 10 == 0) {
+          eng.fireTankGun(id);
+        }
+      }
+
+      eng.step();
+    }
+
+    // Scan lidar
+    auto [numTanks, lidarPoints] = eng.getAllTanksLidarDimensions();
+
+    scans.emplace_back(numTanks * lidarPoints);
+    eng.scanAllTanksLidar(scans.back().data());
+  }
+
+  // Check scans
+  for (size_t pointNum = 0; pointNum < scans[0].size(); pointNum++) {
+    ASSERT_NEAR(scans[0][pointNum], scans[1][pointNum], 1e-3f);
+  }
+}
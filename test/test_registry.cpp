@@ -1,6 +1,7 @@
 // Tank Game (@kennedyengineering)
 
 #include <gtest/gtest.h>
+#include <vector>
 
 #include "registry.hpp"
 
@@ -217,3 +218,109 @@ TEST(RegistryTest, ComplexTypeEmplaceWithId) {
   // Check destructor count
   ASSERT_EQ(TestType::getDestructorCount(), 2);
 }
+
+TEST(RegistryTest, PrimitiveTypeIteration) {
+  // Ensure registry iterates in ascending id order
+
+  // Construct with char type
+  TankGame::Registry<char> reg;
+
+  // Emplace chars
+  TankGame::RegistryId id1 = reg.emplace(1);
+  TankGame::RegistryId id2 = reg.emplace(2);
+  TankGame::RegistryId id3 = reg.emplace(3);
+
+  reg.remove(id2);
+
+  // Check size and ids
+  ASSERT_EQ(reg.size(), 2);
+  ASSERT_EQ(reg.getIds(), (std::vector<TankGame::RegistryId>{id1, id3}));
+
+  // Check visited objects
+  std::vector<char> values;
+  reg.forEach([&](TankGame::RegistryId id, char &val) {
+    ASSERT_EQ(reg.get(id), val);
+    values.push_back(val);
+  });
+  ASSERT_EQ(values, (std::vector<char>{1, 3}));
+}
+
+TEST(RegistryTest, Generations) {
+  // Ensure generation counters detect reused ids
+
+  // Construct with char type
+  TankGame::Registry<char> reg;
+
+  // Emplace char
+  TankGame::RegistryId id1 = reg.emplace(1);
+  unsigned int generation1 = reg.getGeneration(id1);
+  ASSERT_TRUE(reg.contains(id1));
+
+  // Removing increments the generation
+  reg.remove(id1);
+  ASSERT_FALSE(reg.contains(id1));
+  ASSERT_EQ(reg.getGeneration(id1), generation1 + 1);
+
+  // Reused ids keep the incremented generation
+  TankGame::RegistryId id2 = reg.emplace(2);
+  ASSERT_EQ(id2, id1);
+  ASSERT_NE(reg.getGeneration(id2), generation1);
+
+  // Ids outside the registry are checked
+  ASSERT_FALSE(reg.contains(5));
+  ASSERT_ANY_THROW(reg.getGeneration(5));
+}
+
+TEST(RegistryTest, TaggedIds) {
+  // Ensure tagged ids reject freed and reused slots
+
+  // Construct with char type
+  TankGame::Registry<char> reg;
+
+  // Tagged ids of slots that were never reused equal the ids
+  TankGame::RegistryId id1 = reg.emplace(1);
+  TankGame::RegistryId taggedId1 = reg.getTaggedId(id1);
+  ASSERT_EQ(taggedId1, id1);
+  ASSERT_EQ(reg.getTagged(taggedId1), 1);
+
+  // Freed slots reject their tagged ids
+  reg.remove(id1);
+  ASSERT_FALSE(reg.containsTagged(taggedId1));
+  ASSERT_THROW(reg.getTagged(taggedId1), std::out_of_range);
+  ASSERT_THROW(reg.getTaggedId(id1), std::out_of_range);
+
+  // Reused slots reject the tagged ids of their previous objects
+  TankGame::RegistryId id2 = reg.emplace(2);
+  TankGame::RegistryId taggedId2 = reg.getTaggedId(id2);
+  ASSERT_EQ(id2, id1);
+  ASSERT_NE(taggedId2, taggedId1);
+  ASSERT_EQ(TankGame::getRegistryIndex(taggedId2), id2);
+
+  ASSERT_FALSE(reg.containsTagged(taggedId1));
+  ASSERT_THROW(reg.getTagged(taggedId1), std::out_of_range);
+  ASSERT_THROW(reg.removeTagged(taggedId1), std::out_of_range);
+  ASSERT_EQ(reg.untagId(taggedId2), id2);
+  ASSERT_EQ(reg.getTagged(taggedId2), 2);
+
+  reg.removeTagged(taggedId2);
+  ASSERT_EQ(reg.size(), 0);
+}
+
+TEST(RegistryTest, ComplexTypeStableAddresses) {
+  // Ensure objects stay at the same address as the registry grows
+
+  // Construct with TestType type
+  TankGame::Registry<TestType> reg;
+
+  // Emplace TestType, and keep its address
+  TankGame::RegistryId id = reg.emplace(1);
+  TestType *address = &reg.get(id);
+
+  // Grow the registry
+  for (int i = 0; i < 1000; i++) {
+    reg.emplace(i);
+  }
+
+  ASSERT_EQ(&reg.get(id), address);
+  ASSERT_EQ(reg.size(), 1001);
+}
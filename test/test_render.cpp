@@ -1,6 +1,7 @@
 // Tank Game (@kennedyengineering)
 
 #include <box2d/box2d.h>
+#include <cmath>
 #include <gtest/gtest.h>
 #include <vector>
 
@@ -116,6 +117,66 @@ TEST(RenderTest, ClearAndGetBufferBlue) {
   }
 }
 
+TEST(RenderTest, GetDataAndCopyToRGB) {
+  // Ensure RenderEngine getData and copyToRGB methods work correctly
+
+  // Construct render engine
+  TankGame::RenderEngine reng(100, 200);
+
+  // Fill with red, and draw a blue circle
+  reng.clearImage(b2_colorRed);
+  reng.renderCircle((b2Vec2){50.0f, 100.0f}, 20.0f, b2_colorBlue);
+
+  // Get surface data (BGRX)
+  const unsigned char *data = reng.getData();
+  int stride = reng.getStride();
+  ASSERT_GE(stride, 100 * 4);
+
+  // Convert into a RGB buffer, and validate against the surface data
+  std::vector<unsigned char> buff(100 * 200 * 3);
+  reng.copyToRGB(buff.data());
+  ASSERT_EQ(buff, reng.getBuffer());
+
+  for (int row = 0; row < 200; row++) {
+    for (int col = 0; col < 100; col++) {
+      const unsigned char *pixel = data + row * stride + col * 4;
+      const unsigned char *rgb = buff.data() + (row * 100 + col) * 3;
+      ASSERT_EQ(rgb[0], pixel[2]);
+      ASSERT_EQ(rgb[1], pixel[1]);
+      ASSERT_EQ(rgb[2], pixel[0]);
+    }
+  }
+}
+
+TEST(RenderTest, CopyToGray) {
+  // Ensure RenderEngine copyToGray method works correctly
+
+  // Construct render engine
+  TankGame::RenderEngine reng(100, 200);
+
+  // Fill with red, and draw a blue circle
+  reng.clearImage(b2_colorRed);
+  reng.renderCircle((b2Vec2){50.0f, 100.0f}, 20.0f, b2_colorBlue);
+
+  // Convert into a grayscale buffer, and validate against the RGB buffer
+  std::vector<unsigned char> gray(100 * 200);
+  reng.copyToGray(gray.data());
+
+  std::vector<unsigned char> rgb = reng.getBuffer();
+
+  for (size_t i = 0; i < gray.size(); i++) {
+    int luma =
+        (77 * rgb[3 * i] + 150 * rgb[3 * i + 1] + 29 * rgb[3 * i + 2] + 128) >>
+        8;
+    ASSERT_EQ(gray[i], luma);
+  }
+
+  // White maps to full intensity
+  reng.clearImage(b2_colorWhite);
+  reng.copyToGray(gray.data());
+  ASSERT_EQ(gray, std::vector<unsigned char>(100 * 200, 255));
+}
+
 TEST(RenderTest, PolygonToPNG) {
   // Ensure RenderEngine correctly draws polygons
 
@@ -221,3 +282,31 @@ TEST(RenderTest, CircleOutOfBoundsToPNG) {
   // Save to PNG
   reng.writeToPng("RenderTest_CircleOutOfBoundsToPNG.png");
 }
+
+TEST(RenderTest, CirclesToPNG) {
+  // Ensure RenderEngine correctly draws batches of circles
+
+  // Construct render engine
+  TankGame::RenderEngine reng(100, 200);
+
+  // Fill with blue
+  reng.clearImage(b2_colorBlue);
+
+  // Render an empty batch (no change)
+  std::vector<unsigned char> buff = reng.getBuffer();
+  reng.renderCircles({}, 3.0f, b2_colorRed);
+  ASSERT_EQ(reng.getBuffer(), buff);
+
+  // Render a ring of overlapping circles, some partially observable
+  std::vector<b2Vec2> centers;
+  for (int i = 0; i < 90; i++) {
+    float angle = i * 2.0f * b2_pi / 90.0f;
+    centers.push_back(
+        {50.0f + 60.0f * std::cos(angle), 100.0f + 60.0f * std::sin(angle)});
+  }
+
+  reng.renderCircles(centers, 3.0f, b2_colorRed);
+
+  // Save to PNG
+  reng.writeToPng("RenderTest_CirclesToPNG.png");
+}
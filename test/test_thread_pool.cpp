@@ -0,0 +1,93 @@
+// Tank Game (@kennedyengineering)
+
+#include <atomic>
+#include <gtest/gtest.h>
+#include <stdexcept>
+#include <vector>
+
+#include "thread_pool.hpp"
+
+TEST(ThreadPoolTest, Initialization) {
+  // Ensure ThreadPool initializes correctly
+
+  // Create thread pool
+  TankGame::ThreadPool pool(4);
+  ASSERT_EQ(pool.getThreadCount(), 4);
+
+  // Thread pool must have threads
+  ASSERT_THROW(TankGame::ThreadPool(0), std::invalid_argument);
+}
+
+TEST(ThreadPoolTest, ParallelForCoversAllItems) {
+  // Ensure every item is visited exactly once, with valid worker indices
+
+  // Create thread pool
+  TankGame::ThreadPool pool(4);
+
+  // Visit items
+  std::vector<int> visits(1000, 0);
+  std::atomic<bool> validWorkers = true;
+
+  pool.parallelFor(
+      visits.size(), 10,
+      [&](size_t startIndex, size_t endIndex, unsigned int workerIndex) {
+        if (workerIndex >= pool.getThreadCount()) {
+          validWorkers = false;
+        }
+
+        for (size_t i = startIndex; i < endIndex; i++) {
+          visits[i]++;
+        }
+      });
+
+  // Check visits
+  ASSERT_TRUE(validWorkers);
+
+  for (int count : visits) {
+    ASSERT_EQ(count, 1);
+  }
+}
+
+TEST(ThreadPoolTest, ParallelForSmallWorkloadInline) {
+  // Ensure small workloads run as a single range on worker index 0
+
+  // Create thread pool
+  TankGame::ThreadPool pool(4);
+
+  // Visit items
+  int rangeCount = 0;
+
+  pool.parallelFor(
+      5, 10, [&](size_t startIndex, size_t endIndex, unsigned int workerIndex) {
+        ASSERT_EQ(startIndex, 0);
+        ASSERT_EQ(endIndex, 5);
+        ASSERT_EQ(workerIndex, 0);
+        rangeCount++;
+      });
+
+  ASSERT_EQ(rangeCount, 1);
+}
+
+TEST(ThreadPoolTest, ExceptionPropagation) {
+  // Ensure task failures are rethrown on the waiting thread
+
+  // Create thread pool
+  TankGame::ThreadPool pool(2);
+
+  // Run failing tasks
+  ASSERT_THROW(pool.parallelFor(100, 1,
+                                [](size_t startIndex, size_t endIndex,
+                                   unsigned int workerIndex) {
+                                  throw std::runtime_error("Task failure.");
+                                }),
+               std::runtime_error);
+
+  // Thread pool remains usable
+  std::atomic<size_t> itemCount = 0;
+  pool.parallelFor(
+      100, 1,
+      [&](size_t startIndex, size_t endIndex, unsigned int workerIndex) {
+        itemCount += endIndex - startIndex;
+      });
+  ASSERT_EQ(itemCount, 100);
+}